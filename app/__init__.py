@@ -4,6 +4,10 @@ from flask_migrate import Migrate
 from flask_cors import CORS
 from .routes import routes_blueprint
 from .extensions import db, limiter
+from .encoding import init_json_provider, init_compression
+from .commands import register_commands
+from .profiling import init_profiling
+from .querycount import init_query_counter
 from config import DevelopmentConfig
 
 
@@ -13,6 +17,14 @@ def create_app(config_class=DevelopmentConfig):
     app.config.from_object(config_class)
     config_class.init_app(app)
 
+    # Fast JSON encoding and compressed responses
+    init_json_provider(app)
+    init_compression(app)
+
+    # Opt-in request profiling
+    init_profiling(app)
+    init_query_counter(app)
+
     # Enable CORS
     CORS(app, resources={r"/api/*": {"origins": config_class.allowed_origins()}})
 
@@ -27,4 +39,7 @@ def create_app(config_class=DevelopmentConfig):
     with app.app_context():
         app.register_blueprint(routes_blueprint)
 
+    # Register CLI commands
+    register_commands(app)
+
     return app
@@ -0,0 +1,240 @@
+# asgi.py
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.wsgi import WsgiToAsgi
+from .extensions import limiter
+from .scraping import FILM, NEXT_PAGE, PAGE_DONE, stream_page_async
+from .services import SyncChunk, UpstreamWork, get_base_url, get_url, upstream_work
+from .upstream import UpstreamUnavailable, upstream_get_async
+
+FIND_PATH = "/api/find"
+SYNC_PATH = "/api/sync"
+
+
+def create_asgi_app(app, transport=None):
+    """Serves the Flask app over ASGI.
+
+    Views run on a pool of ASGI_THREADS threads. /api/find and /api/sync pass
+    through Flask twice: once for the rate limits and validation, then, after
+    their Letterboxd requests (profile checks, watchlist pages) were awaited on
+    the event loop, for the response. Slow upstream responses thus wait without
+    holding a thread, and rejected requests cause no upstream calls.
+    `transport` replaces the network for the upstream client (tests).
+    """
+    executor = ThreadPoolExecutor(app.config["ASGI_THREADS"], thread_name_prefix="asgi")
+    wsgi = ThreadedWsgiToAsgi(app, executor)
+    clients = []
+
+    def upstream_client():
+        if not clients:
+            clients.append(
+                httpx.AsyncClient(
+                    transport=transport,
+                    timeout=app.config["UPSTREAM_REQUEST_TIMEOUT"],
+                    limits=httpx.Limits(
+                        max_connections=app.config["ASGI_UPSTREAM_CONNECTIONS"]
+                    ),
+                    follow_redirects=True,
+                )
+            )
+        return clients[0]
+
+    async def application(scope, receive, send):
+        if scope["type"] == "lifespan":
+            await lifespan(receive, send, clients)
+        elif (
+            scope["type"] == "http"
+            and scope["method"] == "POST"
+            and scope["path"] in (FIND_PATH, SYNC_PATH)
+        ):
+            await with_upstream_work(scope, receive, send)
+        else:
+            await wsgi(scope, receive, send)
+
+    async def with_upstream_work(scope, receive, send):
+        body = await read_body(receive)
+        work = UpstreamWork()
+        token = upstream_work.set(work)
+        try:
+            admission = []
+            await wsgi(scope, replay(body), collect(admission))
+            if not work.admitted:
+                # Rejected by a rate limit or validation: nothing was fetched
+                for message in admission:
+                    await send(message)
+                return
+            with app.app_context():
+                if scope["path"] == FIND_PATH:
+                    work.profiles = await check_profiles(upstream_client(), work.usernames)
+                else:
+                    await sync_watchlists(run_step, upstream_client(), work)
+            await wsgi(scope, replay(body), send)
+        finally:
+            upstream_work.reset(token)
+
+    async def run_step(function, *args):
+        """Runs a short database step on the pool, in an app context of its own."""
+
+        def step():
+            with app.app_context():
+                return function(*args)
+
+        return await asyncio.get_running_loop().run_in_executor(executor, step)
+
+    return application
+
+
+@limiter.request_filter
+def admitted_request():
+    """The second pass of a request whose admission pass was already counted."""
+    work = upstream_work.get()
+    return work is not None and work.admitted
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi runs every request on one shared thread; this uses a pool.
+
+    Each request enters the adapter through async_to_sync on a pool thread, and
+    asgiref runs thread-sensitive code (the WSGI call) on the thread that
+    entered async_to_sync.
+    """
+
+    def __init__(self, wsgi_application, executor):
+        super().__init__(wsgi_application)
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send):
+        adapter = async_to_sync(super().__call__)
+        await sync_to_async(adapter, thread_sensitive=False, executor=self.executor)(
+            scope, receive, send
+        )
+
+
+async def lifespan(receive, send, clients):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            for client in clients:
+                await client.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+def replay(body):
+    """A receive callable that hands the already-read body to the view."""
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return receive
+
+
+def collect(messages):
+    """A send callable that keeps the response instead of sending it."""
+
+    async def send(message):
+        messages.append(message)
+
+    return send
+
+
+async def check_profiles(client, usernames):
+    """Maps profile URLs to whether they exist, checking all of them concurrently."""
+    urls = [get_url(name) for name in dict.fromkeys(usernames)]
+    results = await asyncio.gather(*(profile_exists(client, url) for url in urls))
+    return {url: found for url, found in zip(urls, results) if found is not None}
+
+
+async def profile_exists(client, url, max_attempts=3, delay=1):
+    """Async counterpart of fetch_page for existence checks.
+
+    Returns None when Letterboxd is unavailable; find_user then falls back to
+    fetch_page, which reports it.
+    """
+    for attempt in range(max_attempts):
+        try:
+            response = await upstream_get_async(client, url)
+            response.raise_for_status()
+            return True
+        except UpstreamUnavailable:
+            return None
+        except httpx.HTTPError as e:
+            logging.error("Request failed. URL: [%s] Error: [%s]", url, e)
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if status is not None and status < 500 and status != 429:
+                # A missing profile will not appear on a retry
+                return False
+            if attempt < max_attempts - 1 and status != 429:
+                await asyncio.sleep(delay)
+    logging.error("Failed to fetch page after %d attempts.", max_attempts)
+    return False
+
+
+async def sync_watchlists(run_step, client, work):
+    """Syncs the admitted users concurrently, recording each outcome on `work`."""
+    usernames = dict.fromkeys(work.usernames)
+    await asyncio.gather(
+        *(sync_watchlist(run_step, client, work, username) for username in usernames)
+    )
+
+
+async def sync_watchlist(run_step, client, work, username):
+    """One sync_user chunk with its watchlist pages awaited on the event loop.
+
+    Locking, page saves and publishing are short database steps on the pool,
+    so a sync holds a thread only while it writes, not while Letterboxd answers.
+    """
+    try:
+        chunk = await run_step(SyncChunk.open, username)
+        if chunk is None:
+            # Unknown users are reported by the view
+            return
+        try:
+            while chunk.cursor and chunk.pages < chunk.max_pages:
+                films, next_page = await stream_films(client, chunk.cursor)
+                if films is None:
+                    logging.warning(f"Page failed, sync of {username} will resume there")
+                    break
+                await run_step(chunk.save_page, films, next_page)
+            await run_step(chunk.end)
+        finally:
+            await run_step(chunk.release)
+    except Exception as e:
+        # The view raises it again, so errors are reported as for a blocking sync
+        work.syncs[username] = e
+    else:
+        work.syncs[username] = None
+
+
+async def stream_films(client, url):
+    """services.stream_films over the async client."""
+    films = []
+    next_page = None
+    done = False
+    async for kind, value in stream_page_async(client, url):
+        if kind == FILM:
+            films.append(value)
+        elif kind == NEXT_PAGE:
+            next_page = f"{get_base_url()}{value}"
+        elif kind == PAGE_DONE:
+            done = True
+    return (films, next_page) if done else (None, None)
@@ -0,0 +1,81 @@
+# changes.py
+import logging
+from sqlalchemy import func, insert, select
+from .extensions import db
+from .models import User, UserMovie, UserMovieChange
+
+ADDED = "added"
+REMOVED = "removed"
+# PostgreSQL advisory lock held by each transaction that appends changes
+CHANGE_LOG_LOCK_ID = 0x5EE1C4A
+
+
+def get_movie_ids(user, generation=None):
+    """Returns the ids of every movie in a watchlist generation (default: active)."""
+    if generation is None:
+        generation = user.active_generation
+    query = db.session.query(UserMovie.movie_id).filter(
+        UserMovie.user_id == user.id, UserMovie.generation == generation
+    )
+    return {movie_id for (movie_id,) in query}
+
+
+def record_changes(user, old_ids, new_ids):
+    """Appends add/remove events for the difference between two watchlists.
+
+    Runs in the transaction that activates the new generation, so events become
+    visible together with the rows they describe. Call it last before the
+    commit: it holds the change log lock until then.
+    """
+    rows = [
+        {"user_id": user.id, "movie_id": movie_id, "change": ADDED}
+        for movie_id in sorted(new_ids - old_ids)
+    ] + [
+        {"user_id": user.id, "movie_id": movie_id, "change": REMOVED}
+        for movie_id in sorted(old_ids - new_ids)
+    ]
+    if rows:
+        lock_change_log()
+        db.session.execute(insert(UserMovieChange), rows)
+    logging.info(f"Recorded {len(rows)} watchlist changes for {user.username}")
+    return len(rows)
+
+
+def lock_change_log():
+    """Serializes change log writers until the current transaction ends.
+
+    Pollers advance `since` past the highest seq they saw, so seqs must become
+    visible in order. PostgreSQL assigns seqs at insert time and concurrent
+    transactions may commit out of order, which would let a poller skip a
+    lower seq committed later; under this lock each writer allocates and
+    commits its seqs before the next one starts. SQLite already allows only
+    one writer at a time.
+    """
+    if db.engine.dialect.name == "postgresql":
+        db.session.execute(select(func.pg_advisory_xact_lock(CHANGE_LOG_LOCK_ID)))
+
+
+def get_changes(usernames, since=0, limit=1000):
+    """Returns changes with seq > since for the given users, oldest first.
+
+    Seqs are visible in commit order (see lock_change_log), so a change with a
+    seq at or below one already returned never appears later.
+    Returns (users, changes, has_more) where users maps username to User (or None)
+    and changes holds at most `limit` (change, username) pairs.
+    """
+    users = {
+        user.username: user
+        for user in User.query.filter(User.username.in_(usernames)).all()
+    }
+    user_ids = {user.id: user.username for user in users.values()}
+    rows = (
+        UserMovieChange.query.filter(
+            UserMovieChange.user_id.in_(user_ids), UserMovieChange.seq > since
+        )
+        .order_by(UserMovieChange.seq)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    changes = [(row, user_ids[row.user_id]) for row in rows[:limit]]
+    return {name: users.get(name) for name in usernames}, changes, has_more
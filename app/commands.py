@@ -0,0 +1,62 @@
+# commands.py
+import sys
+import click
+from .enrichment import enrich_movies, run_enrichment_loop
+from .export import EXPORT_FORMATS, export_chunks, gzip_chunks
+from .services import prune_generations
+from .similarity import rebuild_index
+from .upstream import upstream_status
+
+
+def register_commands(app):
+    """Registers the app's Flask CLI commands."""
+
+    @app.cli.command("enrich-movies")
+    @click.option("--limit", type=int, default=None, help="Films to process.")
+    @click.option("--loop", is_flag=True, help="Keep running in the background.")
+    def enrich_movies_command(limit, loop):
+        """Fetch year, poster and runtime for films missing metadata."""
+        if loop:
+            run_enrichment_loop()
+        else:
+            click.echo(f"Enriched {enrich_movies(limit=limit)} movies")
+
+    @app.cli.command("prune-generations")
+    def prune_generations_command():
+        """Delete watchlist rows from superseded sync generations."""
+        click.echo(f"Pruned {prune_generations()} rows")
+
+    @app.cli.command("index-similarity")
+    def index_similarity_command():
+        """Rebuild every user's MinHash buckets from their active watchlist."""
+        click.echo(f"Indexed {rebuild_index()} users")
+
+    @app.cli.command("upstream-status")
+    def upstream_status_command():
+        """Show the shared upstream concurrency limit and breaker state."""
+        status = upstream_status()
+        if status is None:
+            click.echo("Upstream guard state unavailable (Redis down?)")
+            return
+        for name, value in status.items():
+            click.echo(f"{name}: {value}")
+
+    @app.cli.command("export-watchlists")
+    @click.argument("usernames", nargs=-1)
+    @click.option(
+        "--format",
+        "export_format",
+        type=click.Choice(sorted(EXPORT_FORMATS)),
+        default="csv",
+    )
+    @click.option("--gzip", "compress", is_flag=True, help="Write a .gz stream.")
+    @click.option("--output", type=click.File("wb"), help="Defaults to stdout.")
+    def export_watchlists_command(usernames, export_format, compress, output):
+        """Export watchlists (all users, or USERNAMES) as CSV or JSON Lines."""
+        chunks = export_chunks(list(usernames) or None, export_format)
+        if compress:
+            chunks = gzip_chunks(chunks)
+        output = output or sys.stdout.buffer
+        for chunk in chunks:
+            output.write(chunk)
+        output.flush()
@@ -0,0 +1,241 @@
+# compare.py
+import hashlib
+import json
+import logging
+import time
+from itertools import combinations
+from flask import current_app
+from redis.exceptions import RedisError
+from sqlalchemy import func, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import aliased
+from werkzeug.exceptions import BadRequest
+from .extensions import db, redis_client
+from .models import Movie, User, UserMovie
+from .services import (
+    get_metadata_version,
+    get_usernames,
+    parse_request_data,
+    sync_version,
+    user_details,
+)
+from .watchlists import movie_details
+
+# Group results embed film metadata, so they are also keyed by its version;
+# pair overlaps hold only movie ids and survive enrichment
+COMPARE_KEY = "compare:group:{metadata}:{digest}"
+# v2: integer movie ids
+PAIR_KEY = "compare:pair:v2:{digest}"
+# Cache entries by last use, and their sizes, for size-aware eviction
+INDEX_KEY = "compare:index"
+SIZES_KEY = "compare:sizes"
+TOTAL_KEY = "compare:bytes"
+
+
+def handle_compare_request():
+    """Compares watchlists, serving repeated comparisons from the cache."""
+    try:
+        data = parse_request_data()
+        usernames = sorted(set(get_usernames(data)))
+        users = {
+            user.username: user
+            for user in User.query.filter(User.username.in_(usernames)).all()
+        }
+        versions = [(name, version_of(users.get(name))) for name in usernames]
+        key = COMPARE_KEY.format(
+            metadata=get_metadata_version(), digest=digest(versions)
+        )
+        body = cache_get(key)
+        if body is None:
+            body = current_app.json.dumps(compare_users(usernames, users))
+            cache_put(key, body)
+        return current_app.response_class(body, mimetype="application/json"), 200
+    except (BadRequest, SQLAlchemyError) as e:
+        logging.error(f"Error in handle_compare_request: {e}", exc_info=True)
+        raise
+
+
+def compare_users(usernames, users):
+    """Films on at least two of the users' watchlists, grouped by how many share them."""
+    found = [users[name] for name in usernames if name in users]
+    overlaps = pair_overlaps(found)
+    shared = {}
+    for (first, second), movie_ids in overlaps.items():
+        for movie_id in movie_ids:
+            shared.setdefault(movie_id, set()).update((first, second))
+    movies = {
+        movie.id: movie for movie in Movie.query.filter(Movie.id.in_(shared)).all()
+    }
+    counts = movie_counts(found)
+    by_degree = {}
+    for movie_id, names in shared.items():
+        info = {**movie_details(movies[movie_id]), "users": sorted(names)}
+        by_degree.setdefault(len(names), []).append(info)
+    return {
+        "movies": {
+            str(degree): sorted(by_degree[degree], key=lambda item: item["title"])
+            for degree in sorted(by_degree, reverse=True)
+        },
+        "user_details": {
+            name: (
+                user_details(users[name], movie_count=counts.get(users[name].id, 0))
+                if name in users
+                else None
+            )
+            for name in usernames
+        },
+    }
+
+
+def pair_overlaps(users):
+    """Maps each (username, username) pair to the movie ids both users saved.
+
+    Pairs are cached separately, so a group that gains a member only computes
+    the pairs involving the newcomer.
+    """
+    pairs = list(combinations(users, 2))
+    keys = [
+        PAIR_KEY.format(
+            digest=digest([(user.username, version_of(user)) for user in pair])
+        )
+        for pair in pairs
+    ]
+    overlaps = {}
+    missing = {}
+    for pair, key, value in zip(pairs, keys, cache_get_many(keys)):
+        if value is None:
+            missing[pair] = key
+        else:
+            overlaps[pair] = json.loads(value)
+    while missing:
+        # Anchor on whoever appears in the most missing pairs: one query each
+        anchor = max(users, key=lambda user: sum(anchor_in(user, p) for p in missing))
+        anchored = [pair for pair in missing if anchor_in(anchor, pair)]
+        others = [second if first is anchor else first for first, second in anchored]
+        shared = shared_movies(anchor, others)
+        for pair, other in zip(anchored, others):
+            overlaps[pair] = sorted(shared.get(other.id, ()))
+            cache_put(missing.pop(pair), json.dumps(overlaps[pair]))
+    return {
+        (first.username, second.username): movie_ids
+        for (first, second), movie_ids in overlaps.items()
+    }
+
+
+def anchor_in(user, pair):
+    return user is pair[0] or user is pair[1]
+
+
+def loaded_generations(model, users):
+    """Rows of the generations active when `users` were loaded.
+
+    The cache key is built from those same User rows, so a sync published
+    during the request cannot put a newer snapshot under an older key.
+    """
+    return tuple_(model.user_id, model.generation).in_(
+        [(user.id, user.active_generation) for user in users]
+    )
+
+
+def shared_movies(user, others):
+    """Maps each other user's id to the movie ids they share with `user`."""
+    mine = aliased(UserMovie)
+    theirs = aliased(UserMovie)
+    rows = (
+        db.session.query(theirs.user_id, mine.movie_id)
+        .join(theirs, theirs.movie_id == mine.movie_id)
+        .filter(
+            loaded_generations(mine, [user]),
+            loaded_generations(theirs, others),
+        )
+    )
+    shared = {}
+    for user_id, movie_id in rows:
+        shared.setdefault(user_id, []).append(movie_id)
+    return shared
+
+
+def movie_counts(users):
+    """Maps user id to the size of the user's active watchlist, in one query."""
+    rows = (
+        db.session.query(UserMovie.user_id, func.count())
+        .filter(loaded_generations(UserMovie, users))
+        .group_by(UserMovie.user_id)
+    )
+    return dict(rows.all())
+
+
+def version_of(user):
+    return sync_version(user) if user else "missing"
+
+
+def digest(versions):
+    """Stable key for a set of (username, sync version) members."""
+    text = "\n".join(f"{name}@{version}" for name, version in versions)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def cache_get(key):
+    return cache_get_many([key])[0]
+
+
+def cache_get_many(keys):
+    """Returns cached values (None for misses) and marks hits as recently used."""
+    if not keys:
+        return []
+    try:
+        values = redis_client.mget(keys)
+        hits = {key: score() for key, value in zip(keys, values) if value is not None}
+        if hits:
+            redis_client.zadd(INDEX_KEY, hits, xx=True)
+        return [value.decode() if value is not None else None for value in values]
+    except RedisError as e:
+        logging.warning(f"Comparison cache unavailable: {e}")
+        return [None] * len(keys)
+
+
+def cache_put(key, value):
+    """Stores a result, then evicts least recently used entries over the byte budget.
+
+    Bookkeeping is not transactional across workers; the total is approximate
+    and TTLs bound any drift.
+    """
+    config = current_app.config
+    size = len(value.encode())
+    if size > config["COMPARE_CACHE_MAX_ENTRY_BYTES"]:
+        return
+    try:
+        pipeline = redis_client.pipeline()
+        pipeline.set(key, value, ex=config["COMPARE_CACHE_TTL"])
+        pipeline.zadd(INDEX_KEY, {key: score()})
+        pipeline.hget(SIZES_KEY, key)
+        pipeline.hset(SIZES_KEY, key, size)
+        previous = pipeline.execute()[2]
+        total = redis_client.incrby(TOTAL_KEY, size - int(previous or 0))
+        if total > config["COMPARE_CACHE_MAX_BYTES"]:
+            evict(total - config["COMPARE_CACHE_MAX_BYTES"])
+    except RedisError as e:
+        logging.warning(f"Failed to cache comparison {key}: {e}")
+
+
+def evict(excess):
+    """Deletes least recently used entries until `excess` bytes are freed."""
+    freed = 0
+    while freed < excess:
+        oldest = redis_client.zpopmin(INDEX_KEY)
+        if not oldest:
+            break
+        keys = [key for key, _ in oldest]
+        sizes = redis_client.hmget(SIZES_KEY, keys)
+        pipeline = redis_client.pipeline()
+        pipeline.delete(*keys)
+        pipeline.hdel(SIZES_KEY, *keys)
+        released = sum(int(size or 0) for size in sizes)
+        pipeline.decrby(TOTAL_KEY, released)
+        pipeline.execute()
+        freed += released
+    logging.info(f"Evicted {freed} bytes from the comparison cache")
+
+
+def score():
+    return time.time()
@@ -0,0 +1,82 @@
+# encoding.py
+import gzip
+import logging
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional encoding
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/html", "text/plain", "text/csv"}
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson; decodes to the same documents as the default."""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def init_json_provider(app):
+    """Swaps in the orjson provider when orjson is installed."""
+    if orjson is None:
+        logging.info("orjson not installed, using the default JSON provider")
+        return
+    app.json = ORJSONProvider(app)
+
+
+def init_compression(app):
+    """Compresses large responses with brotli or gzip, as the client accepts."""
+    app.after_request(compress_response)
+
+
+def compress_response(response):
+    """Encodes the response body if it is large enough and worth compressing."""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+    data = response.get_data()
+    if len(data) < current_app.config["COMPRESSION_MIN_SIZE"]:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding == "br":
+        data = brotli.compress(
+            data, quality=current_app.config["COMPRESSION_BROTLI_QUALITY"]
+        )
+    elif encoding == "gzip":
+        data = gzip.compress(
+            data, compresslevel=current_app.config["COMPRESSION_GZIP_LEVEL"], mtime=0
+        )
+    else:
+        return response
+    response.set_data(data)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def choose_encoding(accept_encodings):
+    """Picks the best supported encoding from an Accept-Encoding header."""
+    supported = ["br", "gzip"] if brotli else ["gzip"]
+    return accept_encodings.best_match(supported)
@@ -0,0 +1,184 @@
+# enrichment.py
+import json
+import logging
+import re
+import time
+from datetime import datetime, timezone
+from flask import current_app
+from redis.exceptions import RedisError
+from sqlalchemy import and_, or_, update
+from .extensions import db, redis_client
+from .models import Movie
+from .services import fetch_page, get_base_url, record_metadata_version
+from .upstream import UpstreamUnavailable
+
+ENRICHMENT_LOCK = "enrichment:lock"
+RUNTIME_PATTERN = re.compile(r"(\d+)\s*mins")
+YEAR_PATTERN = re.compile(r"\((\d{4})\)\s*$")
+
+
+def enrich_movies(limit=None):
+    """Fills in year, poster and runtime for films that are missing or stale.
+
+    Films are selected from the global movie table, so each page is fetched once
+    no matter how many users have the film. Only one runner works at a time across
+    all processes; returns the number of films processed.
+    """
+    config = current_app.config
+    lock = acquire_enrichment_lock(config["ENRICHMENT_LOCK_TIMEOUT"])
+    if lock is False:
+        logging.info("Enrichment already running elsewhere, skipping")
+        return 0
+    try:
+        movies = find_movies_to_enrich(limit or config["ENRICHMENT_MAX_PER_RUN"])
+        logging.info(f"Enriching {len(movies)} movies...")
+        interval = 1.0 / config["ENRICHMENT_RATE"]
+        updates = []
+        processed = 0
+        for index, movie in enumerate(movies):
+            if index:
+                time.sleep(interval)
+            try:
+                metadata = fetch_film_metadata(movie)
+            except UpstreamUnavailable as e:
+                logging.warning(f"Stopping enrichment, Letterboxd unavailable: {e}")
+                break
+            # A failed fetch only records the attempt; values never found on the
+            # page are left alone, so a bad refresh cannot erase good metadata
+            found = {
+                key: value for key, value in (metadata or {}).items() if value is not None
+            }
+            updates.append(
+                {"id": movie.id, **found, "enriched_at": datetime.now(timezone.utc)}
+            )
+            processed += 1
+            if len(updates) >= config["ENRICHMENT_BATCH_SIZE"]:
+                write_metadata(updates)
+                updates = []
+        write_metadata(updates)
+        return processed
+    finally:
+        if lock:
+            release_enrichment_lock(lock)
+
+
+def find_movies_to_enrich(limit):
+    """Returns films never enriched, past the TTL, or due a retry after a failed fetch."""
+    config = current_app.config
+    now = datetime.now(timezone.utc)
+    failed = and_(Movie.year.is_(None), Movie.poster_url.is_(None))
+    return (
+        Movie.query.filter(
+            or_(
+                Movie.enriched_at.is_(None),
+                Movie.enriched_at < now - config["ENRICHMENT_TTL"],
+                and_(failed, Movie.enriched_at < now - config["ENRICHMENT_RETRY_AFTER"]),
+            )
+        )
+        .order_by(Movie.enriched_at.isnot(None), Movie.enriched_at, Movie.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def fetch_film_metadata(movie):
+    """Scrapes a film's page; missing values are None, and None if the fetch failed."""
+    soup = fetch_page(get_film_url(movie))
+    if not soup:
+        logging.error(f"Failed to fetch metadata for movie [{movie.id}]")
+        return None
+    return parse_film_page(soup)
+
+
+def parse_film_page(soup):
+    """Extracts year, poster and runtime from a film page."""
+    metadata = {"year": None, "poster_url": None, "runtime": None}
+    linked_data = parse_linked_data(soup)
+    if linked_data:
+        metadata["poster_url"] = linked_data.get("image")
+        for event in linked_data.get("releasedEvent") or []:
+            metadata["year"] = parse_year(event.get("startDate"))
+
+    if metadata["year"] is None:
+        title = soup.find("meta", property="og:title")
+        match = YEAR_PATTERN.search(title.get("content", "")) if title else None
+        metadata["year"] = int(match.group(1)) if match else None
+    if metadata["poster_url"] is None:
+        image = soup.find("meta", property="og:image")
+        metadata["poster_url"] = image.get("content") if image else None
+
+    footer = soup.find("p", class_="text-footer")
+    match = RUNTIME_PATTERN.search(footer.get_text(" ")) if footer else None
+    metadata["runtime"] = int(match.group(1)) if match else None
+    return metadata
+
+
+def parse_linked_data(soup):
+    """Returns the page's JSON-LD object, which Letterboxd wraps in CDATA comments."""
+    script = soup.find("script", type="application/ld+json")
+    if not script or not script.string:
+        return None
+    text = script.string
+    text = text[text.find("{") : text.rfind("}") + 1]
+    try:
+        return json.loads(text)
+    except ValueError:
+        logging.error("Invalid JSON-LD on film page")
+        return None
+
+
+def parse_year(value):
+    try:
+        return int(str(value)[:4])
+    except (TypeError, ValueError):
+        return None
+
+
+def write_metadata(updates):
+    """Writes a batch of metadata as one bulk UPDATE by primary key.
+
+    Rows may hold only some columns. When any row carries metadata, bumps the
+    metadata version so cached watchlist pages and comparisons that embed the
+    old values are revalidated.
+    """
+    if not updates:
+        return
+    db.session.execute(update(Movie), updates)
+    db.session.commit()
+    if any(set(row) - {"id", "enriched_at"} for row in updates):
+        record_metadata_version()
+    logging.info(f"Enriched {len(updates)} movies")
+
+
+def get_film_url(movie):
+    return f"{get_base_url()}/film/{film_slug(movie)}/"
+
+
+def film_slug(movie):
+    """Rebuilds the Letterboxd slug from the title-cased slug stored by format_title."""
+    return "-".join(movie.slug.lower().split(" "))
+
+
+def acquire_enrichment_lock(timeout):
+    """Returns the lock, False if another runner holds it, or None without Redis."""
+    try:
+        lock = redis_client.lock(ENRICHMENT_LOCK, timeout=timeout)
+        return lock if lock.acquire(blocking=False) else False
+    except RedisError as e:
+        logging.warning(f"Enrichment lock unavailable, running unlocked: {e}")
+        return None
+
+
+def release_enrichment_lock(lock):
+    try:
+        lock.release()
+    except RedisError as e:
+        logging.warning(f"Failed to release enrichment lock: {e}")
+
+
+def run_enrichment_loop(idle_seconds=60):
+    """Runs enrichment forever, idling when nothing needs work."""
+    while True:
+        if not enrich_movies():
+            time.sleep(idle_seconds)
+
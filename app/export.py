@@ -0,0 +1,137 @@
+# export.py
+import csv
+import hmac
+import io
+import logging
+import zlib
+from flask import Response, current_app, jsonify, request, stream_with_context
+from sqlalchemy import select
+from .extensions import db
+from .models import Movie, User, UserMovie
+from .services import get_date
+
+EXPORT_FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+EXPORT_COLUMNS = [
+    "username",
+    "movie_id",
+    "title",
+    "slug",
+    "year",
+    "runtime",
+    "poster_url",
+    "added_at",
+]
+# gzip container (not raw deflate or zlib) so the output is a regular .gz file
+GZIP_WBITS = 31
+
+
+def export_response():
+    """Streams the given users' watchlists as CSV or JSON Lines, optionally gzipped.
+
+    Needs EXPORT_TOKEN in the EXPORT_HEADER header and ?username=..., repeated
+    up to EXPORT_MAX_USERS times. Full exports are left to the
+    export-watchlists command.
+    """
+    if not is_export_authorized():
+        logging.warning("Unauthorized export attempt")
+        return jsonify(error="Forbidden"), 403
+    usernames = request.args.getlist("username")
+    max_users = current_app.config["EXPORT_MAX_USERS"]
+    if not usernames or len(usernames) > max_users:
+        return jsonify(error=f"username should be given 1 to {max_users} times"), 400
+    export_format = request.args.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return jsonify(error=f"format should be one of {sorted(EXPORT_FORMATS)}"), 400
+    compress = request.args.get("compress")
+    if compress not in (None, "gzip"):
+        return jsonify(error="compress should be gzip"), 400
+
+    filename = f"watchlists.{export_format}"
+    mimetype = EXPORT_FORMATS[export_format]
+    chunks = export_chunks(usernames, export_format)
+    if compress:
+        filename += ".gz"
+        mimetype = "application/gzip"
+        chunks = gzip_chunks(chunks)
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_rows(usernames=None):
+    """Yields (username, movie..., added_at) rows from a server-side cursor.
+
+    Rows are plain tuples fetched EXPORT_BATCH_SIZE at a time; no ORM objects
+    are built, so memory does not grow with the export.
+    """
+    statement = (
+        select(
+            User.username,
+            Movie.id,
+            Movie.title,
+            Movie.slug,
+            Movie.year,
+            Movie.runtime,
+            Movie.poster_url,
+            UserMovie.added_at,
+        )
+        .join(UserMovie, UserMovie.user_id == User.id)
+        .join(Movie, Movie.id == UserMovie.movie_id)
+        .where(UserMovie.generation == User.active_generation)
+        .order_by(User.username, UserMovie.added_at, UserMovie.movie_id)
+        .execution_options(yield_per=current_app.config["EXPORT_BATCH_SIZE"])
+    )
+    if usernames is not None:
+        statement = statement.where(User.username.in_(usernames))
+    result = db.session.execute(statement)
+    try:
+        for row in result:
+            yield row
+    finally:
+        result.close()
+
+
+def is_export_authorized():
+    """Checks the export header against EXPORT_TOKEN (not the profiling token)."""
+    token = current_app.config["EXPORT_TOKEN"]
+    supplied = request.headers.get(current_app.config["EXPORT_HEADER"], "")
+    # Bytes: compare_digest rejects non-ASCII str, and any client sets this header
+    return bool(token) and hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def export_chunks(usernames, export_format):
+    """Encodes export rows into byte chunks of about EXPORT_CHUNK_SIZE."""
+    chunk_size = current_app.config["EXPORT_CHUNK_SIZE"]
+    buffer = io.StringIO()
+    if export_format == "csv":
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    for row in export_rows(usernames):
+        username, movie_id, *movie, added_at = row
+        values = [username, str(movie_id), *movie, get_date(added_at)]
+        if export_format == "csv":
+            writer.writerow(values)
+        else:
+            buffer.write(current_app.json.dumps(dict(zip(EXPORT_COLUMNS, values))))
+            buffer.write("\n")
+        count += 1
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+    logging.info(f"Exported {count} watchlist rows as {export_format}")
+
+
+def gzip_chunks(chunks):
+    """Compresses a stream of byte chunks into a single gzip stream."""
+    compressor = zlib.compressobj(
+        current_app.config["COMPRESSION_GZIP_LEVEL"], zlib.DEFLATED, GZIP_WBITS
+    )
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
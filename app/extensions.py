@@ -3,11 +3,38 @@ import os
 from flask_sqlalchemy import SQLAlchemy
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-import redis
+from werkzeug.local import LocalProxy
 
 # Setup Redis for Flask-Limiter
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-redis_client = redis.Redis.from_url(redis_url)
+
+_redis_client = None
+_redis_pid = None
+
+
+def get_redis_client():
+    """Returns the Redis client, creating it on first use in this process."""
+    global _redis_client, _redis_pid
+    if _redis_client is None or _redis_pid != os.getpid():
+        import redis
+
+        _redis_client = redis.Redis.from_url(redis_url)
+        _redis_pid = os.getpid()
+    return _redis_client
+
+
+def reset_redis_client():
+    """Drops the Redis client so the next use opens fresh connections (after fork)."""
+    global _redis_client, _redis_pid
+    if _redis_client is not None and _redis_pid == os.getpid():
+        _redis_client.close()
+    _redis_client = None
+    _redis_pid = None
+
+
+# Connections are created lazily so importing the app (or preloading it in the
+# gunicorn master) never opens a socket that forked workers would share.
+redis_client = LocalProxy(get_redis_client)
 
 # Initialize Flask-Limiter
 limiter = Limiter(
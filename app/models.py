@@ -1,26 +1,141 @@
 # models.py
 from datetime import datetime, timezone
+from sqlalchemy import DDL, event, func, literal_column
+from sqlalchemy import false as sa_false
 from .extensions import db
 
 
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     added_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
     synced_at = db.Column(db.DateTime, nullable=True)
-    movies = db.relationship("UserMovie", back_populates="user")
+    # Watchlist snapshot readers see; a sync builds active_generation + 1 and
+    # switches to it in the same transaction that records its changes.
+    active_generation = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # False until a sync reaches the last watchlist page (or when it hit SYNC_MAX_PAGES)
+    watchlist_complete = db.Column(
+        db.Boolean, nullable=False, default=False, server_default=sa_false()
+    )
+    # Chunked sync progress: next page URL to scrape, or None when no sync is pending
+    sync_cursor = db.Column(db.String(512), nullable=True)
+    sync_pages = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    sync_started_at = db.Column(db.DateTime, nullable=True)
+    # Sync lock lease, only taken while Redis (which normally holds the lock) is down
+    sync_locked_until = db.Column(db.DateTime, nullable=True)
+    movies = db.relationship(
+        "UserMovie",
+        primaryjoin="and_(User.id == UserMovie.user_id, "
+        "User.active_generation == UserMovie.generation)",
+        viewonly=True,
+    )
 
 
 class Movie(db.Model):
-    id = db.Column(db.String(255), primary_key=True)
+    # Letterboxd's numeric data-film-id; the API still renders it as a string
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
     title = db.Column(db.String(255), nullable=False)
     slug = db.Column(db.String(255), nullable=False)
+    year = db.Column(db.Integer, nullable=True)
+    poster_url = db.Column(db.String(512), nullable=True)
+    runtime = db.Column(db.Integer, nullable=True)
+    enriched_at = db.Column(db.DateTime, nullable=True, index=True)
     users = db.relationship("UserMovie", back_populates="movie")
+    # Full-text index for title search; SQLite uses the movie_fts table below
+    __table_args__ = (
+        db.Index(
+            "ix_movie_title_fts",
+            func.to_tsvector(literal_column("'simple_unaccent'"), title),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
 
 
 class UserMovie(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
-    movie_id = db.Column(db.String(255), db.ForeignKey("movie.id"), primary_key=True)
-    added_at = db.Column(db.DateTime, default=db.func.current_timestamp())
-    user = db.relationship("User", back_populates="movies")
+    generation = db.Column(db.Integer, primary_key=True, default=0, server_default="0")
+    movie_id = db.Column(db.Integer, db.ForeignKey("movie.id"), primary_key=True)
+    added_at = db.Column(db.DateTime, default=utcnow)
+    user = db.relationship("User")
     movie = db.relationship("Movie", back_populates="users")
+    # The primary key serves per-user reads; this covers per-film lookups
+    # (who saved a film, shared-film joins) without touching the table
+    __table_args__ = (
+        db.Index("ix_user_movie_movie_user", "movie_id", "user_id", "generation"),
+    )
+
+
+class UserMovieChange(db.Model):
+    """Append-only log of watchlist additions and removals, ordered by seq."""
+
+    seq = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    movie_id = db.Column(db.Integer, db.ForeignKey("movie.id"), nullable=False)
+    change = db.Column(db.String(10), nullable=False)
+    created_at = db.Column(db.DateTime, default=utcnow)
+    __table_args__ = (db.Index("ix_user_movie_change_user_seq", "user_id", "seq"),)
+
+
+class SimilarityBucket(db.Model):
+    """MinHash LSH index: one bucket per (user, band) of the user's signature."""
+
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    band = db.Column(db.SmallInteger, primary_key=True)
+    bucket = db.Column(db.BigInteger, nullable=False)
+    __table_args__ = (db.Index("ix_similarity_bucket_band_bucket", "band", "bucket"),)
+
+
+# SQLite (tests) searches titles through an FTS5 table kept in step by triggers
+MOVIE_FTS_CREATE = [
+    "CREATE VIRTUAL TABLE movie_fts USING fts5("
+    "movie_id UNINDEXED, title, tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER movie_fts_insert AFTER INSERT ON movie BEGIN "
+    "INSERT INTO movie_fts (movie_id, title) VALUES (new.id, new.title); END",
+    "CREATE TRIGGER movie_fts_delete AFTER DELETE ON movie BEGIN "
+    "DELETE FROM movie_fts WHERE movie_id = old.id; END",
+    "CREATE TRIGGER movie_fts_update AFTER UPDATE OF id, title ON movie BEGIN "
+    "DELETE FROM movie_fts WHERE movie_id = old.id; "
+    "INSERT INTO movie_fts (movie_id, title) VALUES (new.id, new.title); END",
+]
+MOVIE_FTS_DROP = [
+    "DROP TRIGGER IF EXISTS movie_fts_insert",
+    "DROP TRIGGER IF EXISTS movie_fts_delete",
+    "DROP TRIGGER IF EXISTS movie_fts_update",
+    "DROP TABLE IF EXISTS movie_fts",
+]
+
+# PostgreSQL matches titles through a text search configuration that, like
+# remove_diacritics above, folds accents ("amelie" finds "Amélie")
+MOVIE_UNACCENT_CREATE = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "DO $$ BEGIN "
+    "IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'simple_unaccent') "
+    "THEN CREATE TEXT SEARCH CONFIGURATION simple_unaccent (COPY = simple); "
+    "ALTER TEXT SEARCH CONFIGURATION simple_unaccent "
+    "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple; "
+    "END IF; END $$",
+]
+MOVIE_UNACCENT_DROP = ["DROP TEXT SEARCH CONFIGURATION IF EXISTS simple_unaccent"]
+
+for statement in MOVIE_FTS_CREATE:
+    event.listen(
+        Movie.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
+for statement in MOVIE_FTS_DROP:
+    event.listen(
+        Movie.__table__, "before_drop", DDL(statement).execute_if(dialect="sqlite")
+    )
+for statement in MOVIE_UNACCENT_CREATE:
+    event.listen(
+        Movie.__table__,
+        "before_create",
+        DDL(statement).execute_if(dialect="postgresql"),
+    )
+for statement in MOVIE_UNACCENT_DROP:
+    event.listen(
+        Movie.__table__, "after_drop", DDL(statement).execute_if(dialect="postgresql")
+    )
@@ -0,0 +1,174 @@
+# profiling.py
+import cProfile
+import hmac
+import io
+import logging
+import marshal
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from flask import current_app, g, jsonify, request, send_file
+
+PROFILES_EXTENSION = "profiles"
+# Admin routes carry the token but are never profiled themselves
+UNPROFILED_PATHS = ("/api/admin/", "/api/export")
+
+
+class ProfileBuffer:
+    """Bounded, per-worker ring buffer of recent request profiles."""
+
+    def __init__(self, size):
+        self.profiles = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def add(self, profile):
+        with self.lock:
+            self.profiles.append(profile)
+
+    def list(self):
+        with self.lock:
+            return [summary(profile) for profile in reversed(self.profiles)]
+
+    def get(self, profile_id):
+        with self.lock:
+            for profile in self.profiles:
+                if profile["id"] == profile_id:
+                    return profile
+        return None
+
+
+def init_profiling(app):
+    """Registers profiling hooks only when enabled, so disabled profiling costs nothing."""
+    if not app.config["PROFILING_TOKEN"] and app.config["PROFILING_SAMPLE_RATE"] <= 0:
+        return
+    app.extensions[PROFILES_EXTENSION] = ProfileBuffer(app.config["PROFILING_BUFFER_SIZE"])
+    # cProfile hooks are process-wide on newer Pythons; profile one request at a time
+    app.extensions["profiling_lock"] = threading.Lock()
+    app.before_request(start_profiling)
+    app.after_request(record_status)
+    app.teardown_request(stop_profiling)
+    logging.info("Request profiling enabled")
+
+
+def get_profile_buffer():
+    """Returns this worker's profile buffer, or None when profiling is disabled."""
+    return current_app.extensions.get(PROFILES_EXTENSION)
+
+
+def is_authorized():
+    """Checks the protected profiling header against PROFILING_TOKEN."""
+    token = current_app.config["PROFILING_TOKEN"]
+    supplied = request.headers.get(current_app.config["PROFILING_HEADER"], "")
+    # Bytes: compare_digest rejects non-ASCII str, and any client sets this header
+    return bool(token) and hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def start_profiling():
+    if request.path.startswith(UNPROFILED_PATHS):
+        return
+    if is_authorized():
+        reason = "header"
+    elif random.random() < current_app.config["PROFILING_SAMPLE_RATE"]:
+        reason = "sample"
+    else:
+        return
+    lock = current_app.extensions["profiling_lock"]
+    if not lock.acquire(blocking=False):
+        logging.debug("Another request is being profiled, skipping")
+        return
+    g.profile = {"reason": reason, "started": time.perf_counter()}
+    g.profiler = cProfile.Profile()
+    g.profiler.enable()
+
+
+def record_status(response):
+    if "profile" in g:
+        g.profile["status"] = response.status_code
+    return response
+
+
+def stop_profiling(exc=None):
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return
+    profiler.disable()
+    current_app.extensions["profiling_lock"].release()
+    profiler.create_stats()
+    profile = g.pop("profile")
+    profile.update(
+        id=uuid.uuid4().hex[:12],
+        method=request.method,
+        path=request.full_path.rstrip("?"),
+        duration=time.perf_counter() - profile.pop("started"),
+        created_at=datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        error=type(exc).__name__ if exc else None,
+        data=marshal.dumps(profiler.stats),
+    )
+    get_profile_buffer().add(profile)
+    logging.info(f"Profiled {profile['method']} {profile['path']} as {profile['id']}")
+
+
+def list_profiles_response():
+    """Lists this worker's retained profiles, newest first."""
+    error = check_admin_access()
+    if error:
+        return error
+    return jsonify({"profiles": get_profile_buffer().list()}), 200
+
+
+def download_profile_response(profile_id):
+    """Sends a profile as a pstats file, or as a text report with ?format=text."""
+    error = check_admin_access()
+    if error:
+        return error
+    profile = get_profile_buffer().get(profile_id)
+    if profile is None:
+        return jsonify(error="Profile not found"), 404
+    if request.args.get("format") == "text":
+        sort = request.args.get("sort", "cumulative")
+        try:
+            return profile_text(profile, sort=sort), 200, {"Content-Type": "text/plain"}
+        except KeyError:
+            return jsonify(error=f"Invalid sort key: {sort}"), 400
+    return send_file(
+        io.BytesIO(profile["data"]),
+        mimetype="application/octet-stream",
+        as_attachment=True,
+        download_name=f"{profile_id}.prof",
+    )
+
+
+def check_admin_access():
+    """Returns an error response unless profiling is on and the token matches."""
+    if get_profile_buffer() is None:
+        return jsonify(error="Profiling is disabled"), 404
+    if not is_authorized():
+        logging.warning("Unauthorized profile access attempt")
+        return jsonify(error="Forbidden"), 403
+    return None
+
+
+def summary(profile):
+    return {key: value for key, value in profile.items() if key != "data"}
+
+
+def profile_text(profile, sort="cumulative", limit=50):
+    """Renders a stored profile as a pstats report."""
+    stream = io.StringIO()
+    stats = pstats.Stats(StoredProfile(profile["data"]), stream=stream)
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+class StoredProfile:
+    """Adapts marshalled profiler stats to the interface pstats.Stats loads from."""
+
+    def __init__(self, data):
+        self.stats = marshal.loads(data)
+
+    def create_stats(self):
+        pass
@@ -0,0 +1,85 @@
+# querycount.py
+import threading
+from contextlib import contextmanager
+from flask import g
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+QUERY_COUNT_HEADER = "X-Query-Count"
+
+_active = threading.local()
+
+
+class QueryCounter:
+    """Collects the SQL statements executed while it is active."""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _counters():
+    if not hasattr(_active, "counters"):
+        _active.counters = []
+    return _active.counters
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    for counter in _counters():
+        counter.statements.append(statement)
+
+
+@contextmanager
+def count_queries():
+    """Counts statements executed on this thread inside the block."""
+    counter = QueryCounter()
+    _counters().append(counter)
+    try:
+        yield counter
+    finally:
+        _counters().remove(counter)
+
+
+@contextmanager
+def assert_max_queries(budget):
+    """Fails if the block executes more than `budget` SQL statements."""
+    with count_queries() as counter:
+        yield counter
+    if counter.count > budget:
+        listing = "\n".join(
+            f"  {i}. {statement}" for i, statement in enumerate(counter.statements, 1)
+        )
+        raise QueryBudgetExceeded(
+            f"{counter.count} queries executed, budget is {budget}:\n{listing}"
+        )
+
+
+def init_query_counter(app):
+    """Adds an X-Query-Count header to responses in debug mode (or QUERY_COUNT_HEADER)."""
+    if not (app.debug or app.config["QUERY_COUNT_HEADER"]):
+        return
+
+    @app.before_request
+    def start_query_count():
+        g.query_counter = QueryCounter()
+        _counters().append(g.query_counter)
+
+    @app.after_request
+    def add_query_count_header(response):
+        if "query_counter" in g:
+            response.headers[QUERY_COUNT_HEADER] = str(g.query_counter.count)
+        return response
+
+    @app.teardown_request
+    def stop_query_count(exc=None):
+        counter = g.pop("query_counter", None)
+        if counter in _counters():
+            _counters().remove(counter)
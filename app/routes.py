@@ -1,13 +1,19 @@
 # routes.py
-from http.client import HTTPException
 import logging
 from flask import Blueprint, jsonify
 from .services import (
+    handle_changes_request,
     handle_request,
 )
 from http import HTTPStatus
+from .compare import handle_compare_request
+from .export import export_response
 from .extensions import limiter
-from werkzeug.exceptions import BadRequest
+from .watchlists import watchlist_page_response
+from .profiling import download_profile_response, list_profiles_response
+from .search import handle_movie_search_request
+from .similarity import similar_users_response
+from werkzeug.exceptions import BadRequest, HTTPException
 
 
 routes_blueprint = Blueprint("routes", __name__)
@@ -48,10 +54,65 @@ def sync_users():
     return handle_request(sync=True)
 
 
+@routes_blueprint.route("/api/compare", methods=["POST"])
+@limiter.limit("300 per minute")
+def compare_watchlists():
+    """Films shared between users' watchlists, grouped by how many share them."""
+    return handle_compare_request()
+
+
+@routes_blueprint.route("/api/movies/search", methods=["POST"])
+@limiter.limit("300 per minute")
+def search_movies():
+    """Ranked prefix search over film titles."""
+    return handle_movie_search_request()
+
+
+@routes_blueprint.route("/api/changes", methods=["POST"])
+@limiter.limit("300 per minute")
+def watchlist_changes():
+    """Watchlist additions and removals since a sequence number."""
+    return handle_changes_request()
+
+
+@routes_blueprint.route("/api/users/<username>/movies", methods=["GET"])
+@limiter.limit("300 per minute")
+def user_movies(username):
+    """Page through a user's saved watchlist."""
+    return watchlist_page_response(username)
+
+
+@routes_blueprint.route("/api/users/<username>/similar", methods=["GET"])
+@limiter.limit("300 per minute")
+def similar_users(username):
+    """Tracked users with the most similar watchlists."""
+    return similar_users_response(username)
+
+
+@routes_blueprint.route("/api/export", methods=["GET"])
+@limiter.limit("6 per minute")
+def export_watchlists():
+    """Stream watchlists as CSV or JSON Lines."""
+    return export_response()
+
+
+@routes_blueprint.route("/api/admin/profiles", methods=["GET"])
+def list_profiles():
+    """Recent request profiles retained by this worker."""
+    return list_profiles_response()
+
+
+@routes_blueprint.route("/api/admin/profiles/<profile_id>", methods=["GET"])
+def download_profile(profile_id):
+    """Download one retained profile."""
+    return download_profile_response(profile_id)
+
+
 @routes_blueprint.errorhandler(HTTPException)
 def handle_http_exception(e):
+    # Keeps the exception's status and headers (e.g. Allow on a 405)
     response = e.get_response()
-    response.json = {"error": str(e.description), "code": e.code}
+    response.set_data(jsonify(error=str(e.description), code=e.code).get_data())
     response.content_type = "application/json"
     return response
 
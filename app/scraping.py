@@ -0,0 +1,209 @@
+# scraping.py
+import asyncio
+import codecs
+import json
+import logging
+import time
+from html.parser import HTMLParser
+from typing import NamedTuple
+from .upstream import upstream_get, upstream_get_async
+
+FILM = "film"
+NEXT_PAGE = "next_page"
+# Emitted once the whole page was read; without it the page is incomplete
+PAGE_DONE = "page_done"
+# Bump when the ScrapedFilm fields change so stale payloads are rejected
+# 2: film ids are integers
+FILMS_FORMAT_VERSION = 2
+
+
+class ScrapedFilm(NamedTuple):
+    """A film as listed on a watchlist page; plain data, independent of the ORM."""
+
+    id: int
+    name: str
+    slug: str
+
+
+def film_from_attrs(attrs):
+    """Builds a ScrapedFilm from film-poster attributes; None without a numeric id."""
+    film_id = attrs.get("data-film-id")
+    if not film_id or not film_id.isdigit():
+        logging.error(f"Film poster without a numeric id: {film_id!r}")
+        return None
+    return ScrapedFilm(
+        int(film_id),
+        attrs.get("data-film-name") or "N/A",
+        attrs.get("data-film-slug") or "",
+    )
+
+
+def parse_films(soup):
+    """Extracts ScrapedFilms from a parsed page, so the tree can be dropped."""
+    films = []
+    for li in soup.find_all("li", class_="poster-container"):
+        poster = li.find("div", {"class": "film-poster"})
+        if not poster:
+            logging.error("Movie poster not found")
+            continue
+        film = film_from_attrs(poster.attrs)
+        if film:
+            films.append(film)
+    return films
+
+
+def encode_films(films):
+    """Serializes films compactly for caches and queues: versioned JSON of rows."""
+    return json.dumps(
+        {"v": FILMS_FORMAT_VERSION, "films": [list(film) for film in films]},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode()
+
+
+def decode_films(payload):
+    """Inverse of encode_films; raises ValueError for other formats or versions."""
+    data = json.loads(payload)
+    if not isinstance(data, dict) or data.get("v") != FILMS_FORMAT_VERSION:
+        raise ValueError("Unsupported scraped films payload")
+    try:
+        films = [ScrapedFilm(*row) for row in data["films"]]
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Malformed scraped films payload: {e}") from e
+    for film in films:
+        valid_id = isinstance(film.id, int) and not isinstance(film.id, bool)
+        if not valid_id or not all(
+            isinstance(value, str) for value in (film.name, film.slug)
+        ):
+            raise ValueError(f"Malformed scraped film: {film!r}")
+    return films
+
+
+class WatchlistParser(HTMLParser):
+    """Incremental watchlist parser: emits films and the next-page link as seen.
+
+    No tree is built; each event is handed out by pop_events and then forgotten.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.events = []
+        self.in_poster_container = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in ("li", "div", "a"):
+            return
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        if tag == "li" and "poster-container" in classes:
+            self.in_poster_container = True
+        elif tag == "div" and "film-poster" in classes and self.in_poster_container:
+            self.in_poster_container = False
+            film = film_from_attrs(attrs)
+            if film:
+                self.events.append((FILM, film))
+        elif tag == "a" and "next" in classes and attrs.get("href"):
+            self.events.append((NEXT_PAGE, attrs["href"]))
+
+    def pop_events(self):
+        events, self.events = self.events, []
+        return events
+
+
+def stream_page(url, chunk_size=16384, max_attempts=3, delay=1):
+    """Yields (FILM, ScrapedFilm) and (NEXT_PAGE, href) events while a page downloads.
+
+    Ends with (PAGE_DONE, None) only if the whole body was read.
+    """
+    response = open_stream(url, max_attempts=max_attempts, delay=delay)
+    if response is None:
+        return
+    import requests
+
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    parser = WatchlistParser()
+    try:
+        for chunk in response.iter_content(chunk_size):
+            parser.feed(decoder.decode(chunk))
+            yield from parser.pop_events()
+        parser.feed(decoder.decode(b"", final=True))
+        parser.close()
+        yield from parser.pop_events()
+        yield PAGE_DONE, None
+    except requests.RequestException as e:
+        # No PAGE_DONE: the caller retries the whole page later.
+        logging.error("Stream interrupted. URL: [%s] Error: [%s]", url, e)
+    finally:
+        response.close()
+
+
+def open_stream(url, max_attempts=3, delay=1):
+    """Opens a streaming response, with retry logic for robustness."""
+    import requests
+
+    for attempt in range(max_attempts):
+        try:
+            response = upstream_get(url, stream=True)
+            response.raise_for_status()
+            return response
+        except requests.RequestException as e:
+            logging.error("Request failed. URL: [%s] Error: [%s]", url, e)
+            if attempt < max_attempts - 1:
+                logging.info("Retrying... Attempt %d of %d", attempt + 1, max_attempts)
+                # After a 429 the upstream guard decides how long to wait
+                if getattr(e.response, "status_code", None) != 429:
+                    time.sleep(delay)
+            else:
+                logging.info("Final attempt failed. No more retries.")
+    logging.error("Failed to open stream after %d attempts.", max_attempts)
+    return None
+
+
+async def stream_page_async(client, url, max_attempts=3, delay=1):
+    """stream_page over an httpx.AsyncClient: the download is awaited, not waited on."""
+    import httpx
+
+    response = await open_stream_async(client, url, max_attempts=max_attempts, delay=delay)
+    if response is None:
+        return
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    parser = WatchlistParser()
+    try:
+        async for chunk in response.aiter_bytes():
+            parser.feed(decoder.decode(chunk))
+            for event in parser.pop_events():
+                yield event
+        parser.feed(decoder.decode(b"", final=True))
+        parser.close()
+        for event in parser.pop_events():
+            yield event
+        yield PAGE_DONE, None
+    except httpx.HTTPError as e:
+        logging.error("Stream interrupted. URL: [%s] Error: [%s]", url, e)
+    finally:
+        await response.aclose()
+
+
+async def open_stream_async(client, url, max_attempts=3, delay=1):
+    """open_stream for an httpx.AsyncClient."""
+    import httpx
+
+    for attempt in range(max_attempts):
+        response = None
+        try:
+            response = await upstream_get_async(client, url, stream=True)
+            response.raise_for_status()
+            return response
+        except httpx.HTTPError as e:
+            if response is not None:
+                await response.aclose()
+            logging.error("Request failed. URL: [%s] Error: [%s]", url, e)
+            if attempt < max_attempts - 1:
+                logging.info("Retrying... Attempt %d of %d", attempt + 1, max_attempts)
+                # After a 429 the upstream guard decides how long to wait
+                if getattr(response, "status_code", None) != 429:
+                    await asyncio.sleep(delay)
+            else:
+                logging.info("Final attempt failed. No more retries.")
+    logging.error("Failed to open stream after %d attempts.", max_attempts)
+    return None
@@ -0,0 +1,104 @@
+# search.py
+import logging
+import re
+from flask import jsonify
+from sqlalchemy import func, literal_column, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.exceptions import BadRequest
+from .extensions import db
+from .models import Movie, User, UserMovie
+from .services import get_int, parse_request_data
+from .watchlists import movie_details
+
+TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+MAX_TERMS = 8
+
+SQLITE_SEARCH = text(
+    "SELECT movie.* FROM movie_fts JOIN movie ON movie.id = movie_fts.movie_id "
+    "WHERE movie_fts MATCH :query ORDER BY movie_fts.rank, movie.title LIMIT :limit"
+)
+
+
+def handle_movie_search_request():
+    """Ranked title search; optionally lists which of the given users saved each film."""
+    try:
+        data = parse_request_data()
+        terms = search_terms(data.get("query"))
+        limit = get_int(data, "limit", default=20, minimum=1, maximum=100)
+        usernames = data.get("usernames") or []
+        if not isinstance(usernames, list) or not all(
+            isinstance(name, str) for name in usernames
+        ):
+            raise BadRequest("usernames should be a list of strings")
+        movies = search_movies(terms, limit=limit)
+        results = [movie_details(movie) for movie in movies]
+        if usernames:
+            saved = users_with_movies([movie.id for movie in movies], usernames)
+            for movie, result in zip(movies, results):
+                result["users"] = saved.get(movie.id, [])
+        return jsonify({"query": data["query"], "movies": results}), 200
+    except (BadRequest, SQLAlchemyError) as e:
+        logging.error(f"Error in handle_movie_search_request: {e}", exc_info=True)
+        raise
+
+
+def search_terms(query):
+    """Splits a query into word terms; each one is matched as a prefix."""
+    if not isinstance(query, str):
+        raise BadRequest("query should be a string")
+    terms = [term.lower() for term in TERM_PATTERN.findall(query)][:MAX_TERMS]
+    if not terms:
+        raise BadRequest("query should contain at least one word")
+    return terms
+
+
+def search_movies(terms, limit=20):
+    """Films whose titles contain every term as a word prefix, best match first."""
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        # Must match the ix_movie_title_fts expression for the GIN index to be used
+        config = literal_column("'simple_unaccent'")
+        vector = func.to_tsvector(config, Movie.title)
+        query = func.to_tsquery(config, " & ".join(f"{term}:*" for term in terms))
+        statement = (
+            select(Movie)
+            .where(vector.op("@@")(query))
+            .order_by(func.ts_rank(vector, query).desc(), Movie.title)
+            .limit(limit)
+        )
+    elif dialect == "sqlite":
+        match = " ".join(f'"{term}"*' for term in terms)
+        statement = (
+            select(Movie)
+            .from_statement(SQLITE_SEARCH)
+            .params(query=match, limit=limit)
+        )
+    else:
+        logging.warning(f"No title index for {dialect}, scanning with ILIKE")
+        statement = (
+            select(Movie)
+            .where(*(Movie.title.ilike(f"%{term}%") for term in terms))
+            .order_by(Movie.title)
+            .limit(limit)
+        )
+    return db.session.execute(statement).scalars().all()
+
+
+def users_with_movies(movie_ids, usernames):
+    """Maps movie id to the given users whose active watchlist holds it."""
+    if not movie_ids:
+        return {}
+    rows = (
+        db.session.query(UserMovie.movie_id, User.username)
+        .join(User, User.id == UserMovie.user_id)
+        .filter(
+            User.username.in_(usernames),
+            UserMovie.generation == User.active_generation,
+            UserMovie.movie_id.in_(movie_ids),
+        )
+        .order_by(User.username)
+    )
+    saved = {}
+    for movie_id, username in rows:
+        saved.setdefault(movie_id, []).append(username)
+    return saved
@@ -1,86 +1,202 @@
 # services.py
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+import math
 import time
-from bs4 import BeautifulSoup
-from flask import request, jsonify
-import requests
+from flask import current_app, request, jsonify
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from .models import User, Movie, UserMovie
-from .extensions import db
+from .changes import get_changes, get_movie_ids, record_changes
+from .similarity import index_user
+from .scraping import FILM, NEXT_PAGE, PAGE_DONE, parse_films, stream_page
+from .upstream import UpstreamUnavailable, upstream_get
+from .extensions import db, redis_client
 import logging
+from redis.exceptions import RedisError
 from werkzeug.exceptions import BadRequest
 from sqlalchemy.exc import SQLAlchemyError, NoResultFound
 
 base_url = "https://letterboxd.com"
 
+SYNC_VERSION_KEY = "sync_version:{username}"
+# Bounds how long a missed cache update can serve a stale version
+SYNC_VERSION_TTL = 3600
+SYNC_LOCK_KEY = "sync:lock:{user_id}"
+# Latest film enrichment; watchlist pages and comparisons embed film metadata
+METADATA_VERSION_KEY = "metadata_version"
+
+
+class UpstreamWork:
+    """Letterboxd calls the ASGI server awaits on its event loop (see asgi.py).
+
+    The server dispatches the request twice. The admission pass runs the rate
+    limits and validation and records the usernames; after the upstream calls,
+    the second pass builds the response from the results held here.
+    """
+
+    def __init__(self):
+        self.usernames = None
+        # Profile URL -> exists; find_user only fetches profiles missing here
+        self.profiles = {}
+        # Username -> None once synced, or the exception that stopped its sync
+        self.syncs = {}
+
+    @property
+    def admitted(self):
+        return self.usernames is not None
+
+    def synced(self, user):
+        """handle_user's view of a sync run by the server: the user, or its error."""
+        error = self.syncs[user.username]
+        if error is not None:
+            raise error
+        return user
+
+
+upstream_work = ContextVar("upstream_work", default=None)
+
+_cleanup_executor = None
+
 
 def fetch_page(url, max_attempts=3, delay=1):
-    """Fetches page content, with retry logic for robustness."""
+    """Fetches page content, with retry logic for robustness.
+
+    Raises UpstreamUnavailable without retrying while Letterboxd is throttling us
+    or the circuit breaker is open.
+    """
+    # Imported lazily: parsing and HTTP libraries are only needed by scrape calls.
+    import requests
+    from bs4 import BeautifulSoup
+
     for attempt in range(max_attempts):
         try:
-            response = requests.get(url)
+            response = upstream_get(url)
             response.raise_for_status()
             return BeautifulSoup(response.content, "html.parser")
         except requests.RequestException as e:
             logging.error("Request failed. URL: [%s] Error: [%s]", url, e)
             if attempt < max_attempts - 1:
                 logging.info("Retrying... Attempt %d of %d", attempt + 1, max_attempts)
-                time.sleep(delay)
+                # After a 429 the upstream guard decides how long to wait
+                if getattr(e.response, "status_code", None) != 429:
+                    time.sleep(delay)
             else:
                 logging.info("Final attempt failed. No more retries.")
     logging.error("Failed to fetch page after %d attempts.", max_attempts)
     return None
 
 
-def update_user_movies(user, max_pages=10):
-    """Updates movies for a user by scraping a web page."""
-    page_index = 1
-    current_page = get_url(user.username, list_type="watchlist")
-    while current_page and page_index <= max_pages:
-        logging.info("Fetching page %d", page_index)
-        soup = fetch_page(current_page)
-        if not soup:
+def update_user_movies(user, generation, max_pages):
+    """Scrapes up to max_pages pages, from user.sync_cursor, into a pending generation.
+
+    Each page commits its rows together with the advanced cursor, so no
+    transaction spans the scrape and an interrupted sync resumes at the first
+    page not saved. Returns the number of pages saved.
+    """
+    streaming = current_app.config["SCRAPE_STREAMING"]
+    seen = get_movie_ids(user, generation) if user.sync_pages else set()
+    pages = 0
+    while user.sync_cursor and pages < max_pages:
+        logging.info("Fetching page %d", user.sync_pages + 1)
+        if streaming:
+            films, next_page = stream_films(user.sync_cursor)
+        else:
+            films, next_page = scrape_films(user.sync_cursor)
+        if films is None:
+            logging.warning(f"Page failed, sync of {user.username} will resume there")
             break
-        process_movies(user=user, soup=soup)
-        current_page = get_next_page(soup)
-        page_index += 1
-
-
-def process_movies(soup, user, max_movies=50):
-    """Processes each movie found on a page."""
-    for li in soup.find_all("li", class_="poster-container")[:max_movies]:
-        process_movie(li, user)
-
-
-def process_movie(li, user):
-    """Processes an individual movie and adds it to the database if necessary."""
-    movie_poster = li.find("div", {"class": "film-poster"})
-    if not movie_poster:
-        logging.error("Movie poster not found")
+        save_page(user, generation, films, next_page, seen)
+        pages += 1
+    return pages
+
+
+def save_page(user, generation, films, next_page, seen):
+    """Saves a scraped page and moves the cursor past it in one commit."""
+    save_films(films, user, generation, seen)
+    user.sync_cursor = next_page
+    user.sync_pages += 1
+    db.session.commit()
+
+
+def scrape_films(url):
+    """Returns (films, next page URL), or (None, None) if the page failed."""
+    soup = fetch_page(url)
+    if not soup:
+        return None, None
+    # Only plain records outlive the parse tree
+    return parse_films(soup), get_next_page(soup)
+
+
+def stream_films(url):
+    """Collects films while the page streams in; (None, None) if it was cut short."""
+    films = []
+    next_page = None
+    for kind, value in stream_page(url):
+        if kind == FILM:
+            films.append(value)
+        elif kind == NEXT_PAGE:
+            next_page = f"{get_base_url()}{value}"
+        elif kind == PAGE_DONE:
+            return films, next_page
+    return None, None
+
+
+def save_films(films, user, generation, seen):
+    """Bulk-inserts unknown films, then links the page's films to the generation.
+
+    `seen` holds ids already saved by this sync; a film listed twice (pages
+    shift while a watchlist is scraped) is only linked once.
+    """
+    new = []
+    for film in films:
+        if film.id not in seen:
+            seen.add(film.id)
+            new.append(film)
+    if not new:
         return
-    movie_id = movie_poster.get("data-film-id")
-    movie = Movie.query.get(movie_id)
-    if not movie:
-        movie = Movie(
-            id=movie_id,
-            title=movie_poster.get("data-film-name") or "N/A",
-            slug=format_title(movie_poster.get("data-film-slug")),
-        )
-        db.session.add(movie)
-        logging.info("New movie added: [%s]", movie.title)
-    db.session.add(UserMovie(user_id=user.id, movie_id=movie.id))
+    films = new
+    db.session.execute(
+        insert_ignoring_duplicates(Movie),
+        [
+            {"id": film.id, "title": film.name, "slug": format_title(film.slug)}
+            for film in films
+        ],
+    )
+    db.session.execute(
+        insert(UserMovie),
+        [
+            {"user_id": user.id, "movie_id": film.id, "generation": generation}
+            for film in films
+        ],
+    )
+    logging.info(f"Saved {len(films)} films for {user.username}")
+
+
+def insert_ignoring_duplicates(model):
+    """INSERT that skips rows whose primary key already exists."""
+    if db.engine.dialect.name == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    return sqlite.insert(model).on_conflict_do_nothing()
 
 
 def get_next_page(soup):
     """Finds and returns the URL of the next page to scrape, if it exists."""
     next_page_link = soup.find("a", class_="next")
     if next_page_link:
-        return f"{base_url}{next_page_link['href']}"
+        return f"{get_base_url()}{next_page_link['href']}"
     return None
 
 
 def get_url(username, list_type="watchlist"):
     """Generates a URL for a user's page."""
-    return f"{base_url}/{username}/{list_type}/"
+    return f"{get_base_url()}/{username}/{list_type}/"
+
+
+def get_base_url():
+    """Returns the Letterboxd origin, overridable with LETTERBOXD_URL (e.g. a stub)."""
+    return current_app.config.get("LETTERBOXD_URL", base_url)
 
 
 def check_session(session, caller="check_session"):
@@ -107,6 +223,11 @@ def handle_request(suggest=False, find=False, add=False, sync=False):
     try:
         data = parse_request_data()
         usernames = get_usernames(data)
+        work = upstream_work.get()
+        if work is not None and not work.admitted:
+            # ASGI admission pass: the server makes the Letterboxd calls next
+            work.usernames = usernames
+            return "", 202
         results = process_usernames(
             usernames, suggest=suggest, find=find, add=add, sync=sync
         )
@@ -120,6 +241,45 @@ def handle_request(suggest=False, find=False, add=False, sync=False):
         raise
 
 
+def handle_changes_request():
+    """Returns watchlist changes recorded after the requested sequence number."""
+    try:
+        data = parse_request_data()
+        usernames = get_usernames(data)
+        since = get_int(data, "since", default=0, minimum=0)
+        limit = get_int(data, "limit", default=1000, minimum=1, maximum=5000)
+        users, changes, has_more = get_changes(usernames, since=since, limit=limit)
+        results = {
+            username: request_data(
+                data=[] if user else None, error=None if user else "User not found"
+            )
+            for username, user in users.items()
+        }
+        for change, username in changes:
+            results[username]["data"].append(change_details(change))
+        latest = changes[-1][0].seq if changes else since
+        return (
+            jsonify(
+                {"since": since, "latest": latest, "has_more": has_more, "users": results}
+            ),
+            200,
+        )
+    except (BadRequest, SQLAlchemyError) as e:
+        logging.error(f"Error in handle_changes_request: {e}", exc_info=True)
+        raise
+
+
+def get_int(data, key, default, minimum=None, maximum=None):
+    """Read an optional integer field from the request, clamped to maximum."""
+    value = data.get(key, default)
+    if not isinstance(value, int) or isinstance(value, bool):
+        logging.error(f"Invalid {key}: {value}")
+        raise BadRequest(f"{key} should be an integer")
+    if minimum is not None and value < minimum:
+        raise BadRequest(f"{key} should be at least {minimum}")
+    return min(value, maximum) if maximum is not None else value
+
+
 def parse_request_data():
     """Attempt to parse request data as JSON or raise an error."""
     try:
@@ -134,11 +294,15 @@ def parse_request_data():
 
 
 def get_usernames(data):
-    """Ensure usernames forms a list of strings."""
+    """Ensure usernames forms a list of at most MAX_USERNAMES strings."""
     usernames = data.get("usernames")
     if not usernames or not isinstance(usernames, list):
         logging.error("Invalid username list provided or list is empty")
         raise BadRequest("Usernames should be a list of strings")
+    maximum = current_app.config["MAX_USERNAMES"]
+    if len(usernames) > maximum:
+        logging.error(f"Too many usernames: {len(usernames)}")
+        raise BadRequest(f"At most {maximum} usernames per request")
     for name in usernames:
         if not isinstance(name, str):
             logging.error(f"Invalid username format: {name}")
@@ -187,11 +351,23 @@ def handle_user(username, suggest=False, find=False, add=False, sync=False):
             user = add_user(username)
             added = True
         if user and sync:
-            user = sync_user(user)
-            synced = True
+            work = upstream_work.get()
+            if work is not None and user.username in work.syncs:
+                user = work.synced(user)
+            else:
+                user = sync_user(user)
+            # A chunk that left pages to scrape has not published anything yet
+            synced = user.sync_cursor is None
     except NoResultFound as e:
         logging.error(f"User not found processing user {username}: {e}")
         error = "User not found"
+    except SyncInProgress:
+        logging.warning(f"Sync already running for user {username}")
+        error = "Sync already in progress"
+    except UpstreamUnavailable as e:
+        logging.warning(f"Letterboxd unavailable processing user {username}: {e}")
+        retry = math.ceil(e.retry_after)
+        error = f"Letterboxd is unavailable, retry in {retry} seconds"
     except SQLAlchemyError as e:
         logging.error(f"Database error processing user {username}: {e}")
         raise BadRequest("Database error") from e
@@ -216,7 +392,10 @@ def find_user(username):
     """Verifies if a user exists on the external source."""
     logging.debug(f"Verifying user {username}...")
     try:
-        response = fetch_page(get_url(username))
+        url = get_url(username)
+        work = upstream_work.get()
+        found = work.profiles.get(url) if work else None
+        response = found if found is not None else fetch_page(url)
         if not response:
             logging.error(f"User {username} not found on external source")
             return False
@@ -241,19 +420,318 @@ def add_user(username):
         raise
 
 
+class SyncInProgress(Exception):
+    """Another worker is already syncing this user."""
+
+
 def sync_user(user):
-    """Sync a user's details with an external account."""
+    """Sync a user's details with an external account, one bounded chunk per call.
+
+    Each call scrapes at most SYNC_PAGES_PER_CHUNK pages into a new watchlist
+    generation next to the active one, resuming a recent unfinished sync from
+    its saved cursor. Readers keep seeing the old snapshot until the last page
+    is saved and one commit switches generations; user.sync_cursor stays set
+    while pages remain.
+    """
     logging.info(f"Syncing user {user.username}...")
+    lock = acquire_sync_lock(user)
+    if lock is False:
+        raise SyncInProgress(user.username)
     try:
-        UserMovie.query.filter_by(user_id=user.id).delete()
-        update_user_movies(user=user)
-        user.synced_at = datetime.now(timezone.utc)
-        db.session.commit()
+        generation, max_pages = begin_chunk(user)
+        update_user_movies(user, generation, max_pages)
+        end_chunk(user, generation)
         return user
     except SQLAlchemyError as e:
         db.session.rollback()
         logging.error(f"Error syncing user {user.username}: {e}")
         raise
+    finally:
+        if lock:
+            release_sync_lock(lock)
+
+
+def begin_chunk(user):
+    """Starts or resumes the pending generation; returns it and the chunk's page budget."""
+    config = current_app.config
+    generation = user.active_generation + 1
+    if can_resume_sync(user):
+        logging.info(f"Resuming sync of {user.username} after page {user.sync_pages}")
+    else:
+        start_sync(user)
+    remaining = config["SYNC_MAX_PAGES"] - user.sync_pages
+    return generation, min(config["SYNC_PAGES_PER_CHUNK"], remaining)
+
+
+def end_chunk(user, generation):
+    """Publishes the pending generation once its last page (or the page cap) is reached."""
+    if user.sync_cursor is None:
+        publish_generation(user, generation, complete=True)
+    elif user.sync_pages >= current_app.config["SYNC_MAX_PAGES"]:
+        logging.warning(f"{user.username} has over {user.sync_pages} pages")
+        publish_generation(user, generation, complete=False)
+
+
+class SyncChunk:
+    """A sync_user chunk run one database step at a time (see asgi.py).
+
+    Every step loads the user in its own session, so nothing is held while the
+    caller awaits the next page.
+    """
+
+    def __init__(self, user, lock):
+        self.user_id = user.id
+        self.lock = lock
+        self.generation, self.max_pages = begin_chunk(user)
+        self.cursor = user.sync_cursor
+        self.pages = 0
+        self.seen = get_movie_ids(user, self.generation) if user.sync_pages else set()
+
+    @classmethod
+    def open(cls, username):
+        """Locks the user and begins a chunk; None for unknown users."""
+        user = User.query.filter_by(username=username).one_or_none()
+        if user is None:
+            return None
+        logging.info(f"Syncing user {username}...")
+        lock = acquire_sync_lock(user)
+        if lock is False:
+            raise SyncInProgress(username)
+        try:
+            return cls(user, lock)
+        except Exception:
+            db.session.rollback()
+            release_sync_lock(lock)
+            raise
+
+    def save_page(self, films, next_page):
+        user = db.session.get(User, self.user_id)
+        save_page(user, self.generation, films, next_page, self.seen)
+        self.cursor = next_page
+        self.pages += 1
+
+    def end(self):
+        end_chunk(db.session.get(User, self.user_id), self.generation)
+
+    def release(self):
+        release_sync_lock(self.lock)
+
+
+def can_resume_sync(user):
+    """True if an unfinished sync started recently enough to continue."""
+    if user.sync_cursor is None or user.sync_started_at is None:
+        return False
+    window = current_app.config["SYNC_RESUME_WINDOW"]
+    return datetime.now(timezone.utc) - as_utc(user.sync_started_at) < window
+
+
+def as_utc(date):
+    """SQLite drops the timezone of stored datetimes; they are all UTC."""
+    return date.replace(tzinfo=timezone.utc) if date.tzinfo is None else date
+
+
+def start_sync(user):
+    """Begins a new pending generation at the first watchlist page."""
+    # Rows left behind by an abandoned sync of an unpublished generation
+    UserMovie.query.filter(
+        UserMovie.user_id == user.id, UserMovie.generation > user.active_generation
+    ).delete()
+    user.sync_cursor = get_url(user.username, list_type="watchlist")
+    user.sync_pages = 0
+    user.sync_started_at = datetime.now(timezone.utc)
+    db.session.commit()
+
+
+def publish_generation(user, generation, complete):
+    """Re-indexes similarity, records the changes and activates the pending generation."""
+    active = user.active_generation
+    movie_ids = get_movie_ids(user, generation)
+    index_user(user, movie_ids)
+    record_changes(user, get_movie_ids(user, active), movie_ids)
+    user.active_generation = generation
+    user.watchlist_complete = complete
+    user.sync_cursor = None
+    user.sync_pages = 0
+    user.synced_at = datetime.now(timezone.utc)
+    db.session.commit()
+    record_sync_version(user)
+    schedule_generation_cleanup(user.id)
+
+
+def acquire_sync_lock(user):
+    """Returns the lock, or False if another worker holds it.
+
+    Falls back to a lease on the user row while Redis is unavailable.
+    """
+    timeout = current_app.config["SYNC_LOCK_TIMEOUT"]
+    try:
+        # Not thread-local: the ASGI server releases it from another pool thread
+        lock = redis_client.lock(
+            SYNC_LOCK_KEY.format(user_id=user.id), timeout=timeout, thread_local=False
+        )
+        return lock if lock.acquire(blocking=False) else False
+    except RedisError as e:
+        logging.warning(f"Sync lock unavailable, locking in the database: {e}")
+        return acquire_sync_lease(user, timeout)
+
+
+class SyncLease:
+    """Database fallback for the sync lock, held in user.sync_locked_until.
+
+    A sync commits after every page, which would release a plain row lock, so
+    the row lock only guards claiming and releasing the lease.
+    """
+
+    def __init__(self, user_id, until):
+        self.user_id = user_id
+        self.until = until
+
+    def release(self):
+        # Leaves a lease that expired and was claimed by another sync alone
+        db.session.execute(
+            update(User)
+            .where(User.id == self.user_id, User.sync_locked_until == self.until)
+            .values(sync_locked_until=None)
+        )
+        db.session.commit()
+
+
+def acquire_sync_lease(user, timeout):
+    """Returns a SyncLease, or False while another sync's lease is unexpired."""
+    now = datetime.now(timezone.utc)
+    locked_until = db.session.execute(
+        select(User.sync_locked_until).where(User.id == user.id).with_for_update()
+    ).scalar_one()
+    if locked_until is not None and as_utc(locked_until) > now:
+        db.session.rollback()
+        return False
+    until = now + timedelta(seconds=timeout)
+    db.session.execute(
+        update(User).where(User.id == user.id).values(sync_locked_until=until)
+    )
+    db.session.commit()
+    return SyncLease(user.id, until)
+
+
+def release_sync_lock(lock):
+    try:
+        lock.release()
+    except RedisError as e:
+        logging.warning(f"Failed to release sync lock: {e}")
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logging.warning(f"Failed to release sync lease: {e}")
+
+
+def schedule_generation_cleanup(user_id):
+    """Deletes superseded generations after the sync, off the request thread."""
+    global _cleanup_executor
+    app = current_app._get_current_object()
+    if not app.config["SYNC_CLEANUP_IN_BACKGROUND"]:
+        prune_generations(user_id)
+        return
+    if _cleanup_executor is None:
+        # Created on first use so no thread exists before gunicorn forks
+        _cleanup_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="generation-cleanup"
+        )
+    _cleanup_executor.submit(run_generation_cleanup, app, user_id)
+
+
+def run_generation_cleanup(app, user_id):
+    with app.app_context():
+        try:
+            prune_generations(user_id)
+        except SQLAlchemyError as e:
+            logging.error(f"Generation cleanup failed for user {user_id}: {e}")
+
+
+def prune_generations(user_id=None):
+    """Deletes watchlist rows older than each user's previous generation.
+
+    The generation just replaced is kept: a reader that loaded
+    active_generation before the switch may still be reading its rows, and
+    the next sync's cleanup removes it. Newer, unpublished generations may
+    belong to a sync in progress and are left alone. Returns the number of
+    rows deleted.
+    """
+    active = (
+        select(User.active_generation)
+        .where(User.id == UserMovie.user_id)
+        .scalar_subquery()
+    )
+    statement = delete(UserMovie).where(UserMovie.generation < active - 1)
+    if user_id is not None:
+        statement = statement.where(UserMovie.user_id == user_id)
+    try:
+        deleted = db.session.execute(statement).rowcount
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+    logging.info(f"Pruned {deleted} rows from old watchlist generations")
+    return deleted
+
+
+def get_sync_version(username):
+    """Returns the user's sync version, reading Redis first so 304s skip the database.
+
+    Returns None if the user does not exist.
+    """
+    key = SYNC_VERSION_KEY.format(username=username)
+    try:
+        version = redis_client.get(key)
+        if version is not None:
+            return version.decode()
+    except RedisError as e:
+        logging.warning(f"Sync version cache unavailable: {e}")
+    user = User.query.filter_by(username=username).one_or_none()
+    if user is None:
+        return None
+    # nx: never overwrite a version published by a sync that finished meanwhile
+    return record_sync_version(user, nx=True)
+
+
+def record_sync_version(user, nx=False):
+    """Publishes the user's current sync version; call after each committed sync."""
+    version = sync_version(user)
+    try:
+        redis_client.set(
+            SYNC_VERSION_KEY.format(username=user.username),
+            version,
+            ex=SYNC_VERSION_TTL,
+            nx=nx,
+        )
+    except RedisError as e:
+        logging.warning(f"Failed to record sync version for {user.username}: {e}")
+    return version
+
+
+def sync_version(user):
+    """Changes whenever a sync commits, so it can key anything derived from a watchlist."""
+    return user.synced_at.isoformat() if user.synced_at else "never"
+
+
+def get_metadata_version():
+    """Returns the film metadata version, read from Redis first so 304s skip the DB."""
+    try:
+        version = redis_client.get(METADATA_VERSION_KEY)
+        if version is not None:
+            return version.decode()
+    except RedisError as e:
+        logging.warning(f"Metadata version cache unavailable: {e}")
+    return record_metadata_version(nx=True)
+
+
+def record_metadata_version(nx=False):
+    """Publishes the latest enrichment time; call after each committed metadata write."""
+    enriched_at = db.session.query(func.max(Movie.enriched_at)).scalar()
+    version = enriched_at.isoformat() if enriched_at else "never"
+    try:
+        redis_client.set(METADATA_VERSION_KEY, version, ex=SYNC_VERSION_TTL, nx=nx)
+    except RedisError as e:
+        logging.warning(f"Failed to record metadata version: {e}")
+    return version
 
 
 def autocomplete(username):
@@ -278,12 +756,24 @@ def user_data(user, suggestions, searched, added, synced):
     }
 
 
-def user_details(user):
+def user_details(user, movie_count=None):
     return {
         "username": user.username,
         "added_at": get_date(user.added_at),
         "synced_at": get_date(user.synced_at),
-        "movie_count": len(user.movies),
+        "movie_count": len(user.movies) if movie_count is None else movie_count,
+        "watchlist_complete": user.watchlist_complete,
+        "sync_in_progress": user.sync_cursor is not None,
+        "sync_pages_done": user.sync_pages,
+    }
+
+
+def change_details(change):
+    return {
+        "seq": change.seq,
+        "movie_id": str(change.movie_id),
+        "change": change.change,
+        "created_at": get_date(change.created_at),
     }
 
 
@@ -0,0 +1,194 @@
+# similarity.py
+import hashlib
+import logging
+import random
+from functools import lru_cache
+from flask import current_app, jsonify, request
+from sqlalchemy import and_, func, insert
+from sqlalchemy.orm import aliased
+from werkzeug.exceptions import BadRequest
+from .changes import get_movie_ids
+from .extensions import db
+from .models import SimilarityBucket, User, UserMovie
+
+# MinHash permutations are h(x) = (a * x + b) mod p over 64-bit film hashes.
+# The seed is fixed so signatures from different syncs and workers agree.
+MERSENNE_PRIME = (1 << 61) - 1
+PERMUTATION_SEED = 1
+
+
+def similar_users_response(username):
+    """Tracked users whose watchlists overlap most with `username`'s."""
+    limit = get_limit(request.args.get("limit"))
+    user = User.query.filter_by(username=username).one_or_none()
+    if user is None:
+        return jsonify(error="User not found"), 404
+    return jsonify({"username": username, "similar": similar_users(user, limit)})
+
+
+def get_limit(value):
+    if value is None:
+        return current_app.config["SIMILAR_DEFAULT_LIMIT"]
+    try:
+        limit = int(value)
+    except ValueError:
+        raise BadRequest("limit must be an integer")
+    if limit < 1:
+        raise BadRequest("limit must be positive")
+    return min(limit, current_app.config["SIMILAR_CANDIDATES"])
+
+
+def similar_users(user, limit):
+    """Ranks LSH candidates by exact Jaccard similarity of their active watchlists.
+
+    Only users sharing a band bucket are scored, so the cost depends on the
+    candidate list (at most SIMILAR_CANDIDATES), not on the number of users.
+    """
+    candidates = candidate_ids(user, current_app.config["SIMILAR_CANDIDATES"])
+    if not candidates:
+        return []
+    shared = shared_counts(user, candidates)
+    sizes = watchlist_sizes([user.id] + candidates)
+    own_size = sizes.pop(user.id)[1]
+    ranked = []
+    for other, size in sizes.values():
+        overlap = shared.get(other.id, 0)
+        if overlap:
+            ranked.append(
+                {
+                    "username": other.username,
+                    "similarity": round(overlap / (own_size + size - overlap), 4),
+                    "shared_movies": overlap,
+                    "movie_count": size,
+                }
+            )
+    ranked.sort(key=lambda item: (-item["similarity"], item["username"]))
+    return ranked[:limit]
+
+
+def candidate_ids(user, limit):
+    """Ids of users sharing at least one band bucket, most shared bands first."""
+    mine = aliased(SimilarityBucket)
+    theirs = aliased(SimilarityBucket)
+    bands = func.count().label("bands")
+    rows = (
+        db.session.query(theirs.user_id, bands)
+        .select_from(mine)
+        .join(theirs, and_(theirs.band == mine.band, theirs.bucket == mine.bucket))
+        .filter(mine.user_id == user.id, theirs.user_id != user.id)
+        .group_by(theirs.user_id)
+        .order_by(bands.desc(), theirs.user_id)
+        .limit(limit)
+    )
+    return [user_id for user_id, _ in rows]
+
+
+def shared_counts(user, user_ids):
+    """Maps each user id to the number of films shared with `user`."""
+    mine = aliased(UserMovie)
+    theirs = aliased(UserMovie)
+    rows = (
+        db.session.query(theirs.user_id, func.count())
+        .select_from(mine)
+        .join(theirs, theirs.movie_id == mine.movie_id)
+        .join(User, User.id == theirs.user_id)
+        .filter(
+            mine.user_id == user.id,
+            mine.generation == user.active_generation,
+            theirs.user_id.in_(user_ids),
+            theirs.generation == User.active_generation,
+        )
+        .group_by(theirs.user_id)
+    )
+    return dict(rows.all())
+
+
+def watchlist_sizes(user_ids):
+    """Maps user id to (User, active watchlist size)."""
+    rows = (
+        db.session.query(User, func.count(UserMovie.movie_id))
+        .outerjoin(
+            UserMovie,
+            and_(
+                UserMovie.user_id == User.id,
+                UserMovie.generation == User.active_generation,
+            ),
+        )
+        .filter(User.id.in_(user_ids))
+        .group_by(User.id)
+    )
+    return {other.id: (other, size) for other, size in rows}
+
+
+def index_user(user, movie_ids):
+    """Replaces the user's LSH buckets; the caller commits.
+
+    sync_user calls this in the transaction that publishes the watchlist, so
+    the index never describes a snapshot readers cannot see.
+    """
+    SimilarityBucket.query.filter_by(user_id=user.id).delete()
+    if not movie_ids:
+        return
+    config = current_app.config
+    bands = config["SIMILAR_BANDS"]
+    signature = minhash(movie_ids, bands * config["SIMILAR_ROWS"])
+    db.session.execute(
+        insert(SimilarityBucket),
+        [
+            {"user_id": user.id, "band": band, "bucket": bucket}
+            for band, bucket in enumerate(band_buckets(signature, bands))
+        ],
+    )
+
+
+def rebuild_index():
+    """Re-indexes every user from their active watchlist; returns the count."""
+    count = 0
+    for user in User.query.order_by(User.id).all():
+        index_user(user, get_movie_ids(user))
+        db.session.commit()
+        count += 1
+    logging.info(f"Rebuilt similarity buckets for {count} users")
+    return count
+
+
+def minhash(movie_ids, count):
+    """MinHash signature: per permutation, the smallest permuted film hash."""
+    hashes = [film_hash(movie_id) for movie_id in movie_ids]
+    return [
+        min((a * value + b) % MERSENNE_PRIME for value in hashes)
+        for a, b in permutations(count)
+    ]
+
+
+@lru_cache(maxsize=None)
+def permutations(count):
+    rng = random.Random(PERMUTATION_SEED)
+    return [
+        (rng.randrange(1, MERSENNE_PRIME), rng.randrange(MERSENNE_PRIME))
+        for _ in range(count)
+    ]
+
+
+def film_hash(movie_id):
+    digest = hashlib.blake2b(str(movie_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def band_buckets(signature, bands):
+    """Hashes each band of rows; users agreeing on a whole band share its bucket."""
+    rows = len(signature) // bands
+    buckets = []
+    for band in range(bands):
+        values = signature[band * rows : (band + 1) * rows]
+        digest = hashlib.blake2b(
+            ",".join(map(str, values)).encode(), digest_size=8
+        ).digest()
+        # Signed, to fit a BIGINT column
+        buckets.append(int.from_bytes(digest, "big", signed=True))
+    return buckets
+
+
+def estimate_similarity(first, second):
+    """Jaccard estimate from two signatures: the fraction of agreeing rows."""
+    return sum(a == b for a, b in zip(first, second)) / len(first)
@@ -0,0 +1,314 @@
+# upstream.py
+import asyncio
+import logging
+import time
+import uuid
+from email.utils import parsedate_to_datetime
+from flask import current_app
+from redis.exceptions import RedisError
+from .extensions import redis_client
+
+# Shared by every worker: requests in flight (lease id -> expiry), the AIMD
+# concurrency limit, and circuit breaker state.
+LEASES_KEY = "upstream:leases"
+LIMIT_KEY = "upstream:limit"
+DECREASED_KEY = "upstream:decreased"
+BLOCKED_UNTIL_KEY = "upstream:blocked_until"
+FAILURES_KEY = "upstream:failures"
+OPEN_KEY = "upstream:open"
+PROBE_KEY = "upstream:probe"
+
+# Seconds between polls while every slot is taken
+POLL_INTERVAL = 0.05
+# Consecutive failures are forgotten after this many seconds without one
+FAILURE_MEMORY = 300
+# At most one multiplicative decrease per this many milliseconds, so a burst
+# of failures from requests already in flight counts as one congestion signal
+DECREASE_GAP_MS = 1000
+
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+local blocked_until = tonumber(redis.call('GET', KEYS[3]) or '0')
+if blocked_until > now then
+    return {'blocked', tostring(blocked_until - now)}
+end
+local open_ms = redis.call('PTTL', KEYS[4])
+if open_ms > 0 then
+    return {'open', tostring(open_ms / 1000)}
+end
+if tonumber(redis.call('GET', KEYS[5]) or '0') >= tonumber(ARGV[5]) then
+    -- Half-open: a single probe request decides whether the breaker closes
+    if not redis.call('SET', KEYS[6], ARGV[2], 'NX', 'PX', ARGV[6]) then
+        return {'probing', tostring(ARGV[6] / 1000)}
+    end
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[2])
+    return {'probe', '0'}
+end
+local limit = tonumber(redis.call('GET', KEYS[2]) or ARGV[4])
+if redis.call('ZCARD', KEYS[1]) >= math.floor(limit) then
+    return {'busy', '0'}
+end
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[2])
+return {'ok', '0'}
+"""
+
+INCREASE_SCRIPT = """
+local limit = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+limit = math.min(tonumber(ARGV[2]), limit + 1 / limit)
+redis.call('SET', KEYS[1], tostring(limit))
+return tostring(limit)
+"""
+
+DECREASE_SCRIPT = """
+local limit = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+if redis.call('SET', KEYS[2], '1', 'NX', 'PX', ARGV[4]) then
+    limit = math.max(tonumber(ARGV[2]), limit * tonumber(ARGV[3]))
+    redis.call('SET', KEYS[1], tostring(limit))
+end
+return tostring(limit)
+"""
+
+
+class UpstreamUnavailable(Exception):
+    """Letterboxd is throttling us or unhealthy; retry after `retry_after` seconds."""
+
+    def __init__(self, reason, retry_after=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def upstream_get(url, **kwargs):
+    """requests.get through the guard shared by all workers.
+
+    Waits up to UPSTREAM_ACQUIRE_TIMEOUT for a concurrency slot and raises
+    UpstreamUnavailable instead of calling out while Letterboxd is throttling us
+    or the breaker is open. The slot covers the request until its headers
+    arrive; streamed bodies are read after it is released.
+    """
+    import requests
+
+    config = current_app.config
+    kwargs.setdefault("timeout", config["UPSTREAM_REQUEST_TIMEOUT"])
+    if not config["UPSTREAM_GUARD"]:
+        return requests.get(url, **kwargs)
+    lease = acquire_slot()
+    try:
+        response = requests.get(url, **kwargs)
+    except requests.RequestException:
+        record_failure()
+        raise
+    finally:
+        release_slot(lease)
+    observe(response)
+    return response
+
+
+async def upstream_get_async(client, url, stream=False, **kwargs):
+    """upstream_get for an httpx.AsyncClient; waiting for a slot or the response holds no thread.
+
+    With stream=True the body is left unread; close the response with aclose().
+    """
+    import httpx
+
+    request = client.build_request("GET", url, **kwargs)
+    if not current_app.config["UPSTREAM_GUARD"]:
+        return await client.send(request, stream=stream)
+    lease = await acquire_slot_async()
+    try:
+        response = await client.send(request, stream=stream)
+    except httpx.TransportError:
+        await asyncio.to_thread(record_failure)
+        raise
+    finally:
+        await asyncio.to_thread(release_slot, lease)
+    await asyncio.to_thread(observe, response)
+    return response
+
+
+def acquire_slot():
+    """Returns a lease id, or None when Redis is down (requests go unguarded)."""
+    lease = uuid.uuid4().hex
+    deadline = time.monotonic() + current_app.config["UPSTREAM_ACQUIRE_TIMEOUT"]
+    try:
+        while True:
+            wait = try_acquire(lease, deadline)
+            if not wait:
+                return lease
+            time.sleep(wait)
+    except RedisError as e:
+        logging.warning(f"Upstream guard unavailable, requesting unguarded: {e}")
+        return None
+
+
+async def acquire_slot_async():
+    """acquire_slot that sleeps on the event loop between attempts."""
+    lease = uuid.uuid4().hex
+    deadline = time.monotonic() + current_app.config["UPSTREAM_ACQUIRE_TIMEOUT"]
+    try:
+        while True:
+            wait = await asyncio.to_thread(try_acquire, lease, deadline)
+            if not wait:
+                return lease
+            await asyncio.sleep(wait)
+    except RedisError as e:
+        logging.warning(f"Upstream guard unavailable, requesting unguarded: {e}")
+        return None
+
+
+def try_acquire(lease, deadline):
+    """One attempt at a slot: 0 once `lease` holds one, else seconds to wait.
+
+    Raises UpstreamUnavailable if the wait would run past `deadline`.
+    """
+    config = current_app.config
+    state, wait = redis_client.eval(
+        ACQUIRE_SCRIPT,
+        6,
+        LEASES_KEY,
+        LIMIT_KEY,
+        BLOCKED_UNTIL_KEY,
+        OPEN_KEY,
+        FAILURES_KEY,
+        PROBE_KEY,
+        time.time(),
+        lease,
+        config["UPSTREAM_LEASE_TIMEOUT"],
+        config["UPSTREAM_INITIAL_CONCURRENCY"],
+        config["UPSTREAM_BREAKER_THRESHOLD"],
+        config["UPSTREAM_LEASE_TIMEOUT"] * 1000,
+    )
+    state, wait = state.decode(), float(wait)
+    if state in ("ok", "probe"):
+        return 0
+    if state == "busy":
+        wait = POLL_INTERVAL
+    if wait > deadline - time.monotonic():
+        logging.warning(f"Upstream {state}, failing fast (retry in {wait:.1f}s)")
+        raise UpstreamUnavailable(state, retry_after=max(wait, POLL_INTERVAL))
+    return wait
+
+
+def release_slot(lease):
+    if lease is None:
+        return
+    try:
+        redis_client.zrem(LEASES_KEY, lease)
+    except RedisError as e:
+        logging.warning(f"Failed to release upstream slot: {e}")
+
+
+def observe(response):
+    """Feeds a response's status into the shared concurrency limit and breaker."""
+    status = response.status_code
+    if status == 429 or (status == 503 and "Retry-After" in response.headers):
+        record_throttle(parse_retry_after(response.headers.get("Retry-After")))
+    elif status >= 500:
+        record_failure()
+    else:
+        record_success()
+
+
+def record_success():
+    """Additive increase: about one more slot per limit's worth of successes."""
+    config = current_app.config
+    try:
+        pipeline = redis_client.pipeline()
+        pipeline.eval(
+            INCREASE_SCRIPT,
+            1,
+            LIMIT_KEY,
+            config["UPSTREAM_INITIAL_CONCURRENCY"],
+            config["UPSTREAM_MAX_CONCURRENCY"],
+        )
+        pipeline.delete(FAILURES_KEY, PROBE_KEY)
+        pipeline.execute()
+    except RedisError as e:
+        logging.warning(f"Failed to record upstream success: {e}")
+
+
+def record_throttle(retry_after):
+    """Upstream asked us to back off: pause every worker and cut concurrency."""
+    until = time.time() + retry_after
+    logging.warning(f"Upstream throttled us, pausing for {retry_after:.0f}s")
+    try:
+        blocked_until = float(redis_client.get(BLOCKED_UNTIL_KEY) or 0)
+        if until > blocked_until:
+            redis_client.set(BLOCKED_UNTIL_KEY, until, ex=int(retry_after) + 1)
+    except RedisError as e:
+        logging.warning(f"Failed to record upstream throttle: {e}")
+    record_failure()
+
+
+def record_failure():
+    """Multiplicative decrease; opens the breaker after consecutive failures."""
+    config = current_app.config
+    try:
+        pipeline = redis_client.pipeline()
+        pipeline.eval(
+            DECREASE_SCRIPT,
+            2,
+            LIMIT_KEY,
+            DECREASED_KEY,
+            config["UPSTREAM_INITIAL_CONCURRENCY"],
+            config["UPSTREAM_MIN_CONCURRENCY"],
+            config["UPSTREAM_DECREASE_FACTOR"],
+            DECREASE_GAP_MS,
+        )
+        pipeline.incr(FAILURES_KEY)
+        pipeline.expire(FAILURES_KEY, FAILURE_MEMORY)
+        limit, failures = pipeline.execute()[:2]
+        if failures >= config["UPSTREAM_BREAKER_THRESHOLD"]:
+            cooldown = config["UPSTREAM_BREAKER_COOLDOWN"]
+            pipeline = redis_client.pipeline()
+            pipeline.set(OPEN_KEY, 1, ex=cooldown)
+            pipeline.delete(PROBE_KEY)
+            pipeline.execute()
+            logging.error(
+                f"Upstream breaker open for {cooldown}s after {failures} failures"
+            )
+        else:
+            logging.info(
+                f"Upstream failure {failures}, concurrency limit {limit.decode()}"
+            )
+    except RedisError as e:
+        logging.warning(f"Failed to record upstream failure: {e}")
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date)."""
+    default = current_app.config["UPSTREAM_DEFAULT_RETRY_AFTER"]
+    if not value:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return default
+    return min(max(seconds, 0), current_app.config["UPSTREAM_MAX_RETRY_AFTER"])
+
+
+def upstream_status():
+    """Current shared state, for logs and the CLI."""
+    try:
+        now = time.time()
+        pipeline = redis_client.pipeline()
+        pipeline.get(LIMIT_KEY)
+        pipeline.zcount(LEASES_KEY, now, "+inf")
+        pipeline.get(FAILURES_KEY)
+        pipeline.pttl(OPEN_KEY)
+        pipeline.get(BLOCKED_UNTIL_KEY)
+        limit, in_flight, failures, open_ms, blocked_until = pipeline.execute()
+    except RedisError as e:
+        logging.warning(f"Upstream status unavailable: {e}")
+        return None
+    return {
+        "limit": float(limit or current_app.config["UPSTREAM_INITIAL_CONCURRENCY"]),
+        "in_flight": in_flight,
+        "failures": int(failures or 0),
+        "open_for": max(open_ms, 0) / 1000,
+        "blocked_for": max(float(blocked_until or 0) - now, 0),
+    }
@@ -0,0 +1,124 @@
+# watchlists.py
+import base64
+import hashlib
+import json
+import logging
+from datetime import datetime
+from flask import current_app, jsonify, make_response, request
+from sqlalchemy import and_, or_
+from werkzeug.exceptions import BadRequest, Gone
+from .extensions import db
+from .models import Movie, User, UserMovie
+from .services import get_date, get_metadata_version, get_sync_version
+
+
+def watchlist_page_response(username):
+    """Returns one keyset page of a user's watchlist, or 304 if the client is current."""
+    cursor = request.args.get("cursor")
+    limit = get_page_size(request.args.get("limit"))
+    version = get_sync_version(username)
+    if version is None:
+        return jsonify(error="User not found"), 404
+
+    metadata_version = get_metadata_version()
+    etag = watchlist_etag(username, version, metadata_version, cursor, limit)
+    if request.if_none_match.contains_weak(etag):
+        response = make_response("", 304)
+    else:
+        user = User.query.filter_by(username=username).one()
+        movies, next_cursor = get_watchlist_page(user, cursor=cursor, limit=limit)
+        response = jsonify(
+            {
+                "username": user.username,
+                "synced_at": get_date(user.synced_at),
+                "movies": movies,
+                "next_cursor": next_cursor,
+            }
+        )
+    response.set_etag(etag, weak=True)
+    response.cache_control.no_cache = True
+    return response
+
+
+def get_page_size(value):
+    """Parse the requested page size, clamped to the configured maximum."""
+    if value is None:
+        return current_app.config["WATCHLIST_PAGE_SIZE"]
+    try:
+        limit = int(value)
+    except ValueError:
+        raise BadRequest("limit must be an integer")
+    if limit < 1:
+        raise BadRequest("limit must be positive")
+    return min(limit, current_app.config["WATCHLIST_MAX_PAGE_SIZE"])
+
+
+def get_watchlist_page(user, cursor=None, limit=100):
+    """Returns up to `limit` movies after `cursor`, ordered by (added_at, movie_id).
+
+    A cursor stays on the generation its first page came from, so a sync
+    published mid-way never mixes snapshots. That generation is readable until
+    the next sync prunes it; after that the cursor is Gone and the client
+    starts over.
+    """
+    generation = user.active_generation
+    if cursor:
+        added_at, movie_id, generation = decode_cursor(cursor)
+        if not user.active_generation - 1 <= generation <= user.active_generation:
+            logging.info(f"Cursor for pruned generation {generation} of {user.username}")
+            raise Gone("The watchlist changed, restart from the first page")
+    query = (
+        db.session.query(UserMovie.added_at, Movie)
+        .join(Movie, Movie.id == UserMovie.movie_id)
+        .filter(
+            UserMovie.user_id == user.id,
+            UserMovie.generation == generation,
+        )
+    )
+    if cursor:
+        query = query.filter(
+            or_(
+                UserMovie.added_at > added_at,
+                and_(UserMovie.added_at == added_at, UserMovie.movie_id > movie_id),
+            )
+        )
+    rows = query.order_by(UserMovie.added_at, UserMovie.movie_id).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_added_at, last_movie = rows[-1]
+        next_cursor = encode_cursor(last_added_at, last_movie.id, generation)
+    return [movie_details(movie, added_at) for added_at, movie in rows], next_cursor
+
+
+def movie_details(movie, added_at=None):
+    return {
+        "id": str(movie.id),
+        "title": movie.title,
+        "slug": movie.slug,
+        "year": movie.year,
+        "poster_url": movie.poster_url,
+        "runtime": movie.runtime,
+        "added_at": get_date(added_at),
+    }
+
+
+def encode_cursor(added_at, movie_id, generation):
+    """Opaque cursor holding the sort key of the last row on a page and its generation."""
+    raw = json.dumps([added_at.isoformat(), movie_id, generation]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        added_at, movie_id, generation = json.loads(raw)
+        return datetime.fromisoformat(added_at), int(movie_id), int(generation)
+    except (ValueError, TypeError):
+        logging.error(f"Invalid cursor: {cursor}")
+        raise BadRequest("Invalid cursor")
+
+
+def watchlist_etag(username, version, metadata_version, cursor, limit):
+    key = f"{username}|{version}|{metadata_version}|{cursor or ''}|{limit}"
+    return hashlib.sha1(key.encode()).hexdigest()
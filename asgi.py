@@ -0,0 +1,6 @@
+# asgi.py
+"""ASGI entry point: uvicorn asgi:app --workers 2"""
+from app.asgi import create_asgi_app
+from run import app as flask_app
+
+app = create_asgi_app(flask_app)
@@ -0,0 +1,108 @@
+# bench_encoding.py
+"""Serialization time and bytes on the wire for large API payloads.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_encoding --films 5000 --users 200
+"""
+import argparse
+import gzip
+import time
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from app.encoding import ORJSONProvider, brotli, orjson
+
+
+def usernames_payload(users):
+    """Shape of process_usernames results for a large batch of usernames."""
+    return {
+        f"user{i}": {
+            "error": None,
+            "data": {
+                "added": False,
+                "synced": True,
+                "searched": True,
+                "suggestions": [f"user{i}{j}" for j in range(10)],
+                "user": {
+                    "username": f"user{i}",
+                    "added_at": "2024-04-24 05:42:14",
+                    "synced_at": "2024-05-01 12:00:00",
+                    "movie_count": 1000 + i,
+                },
+            },
+        }
+        for i in range(users)
+    }
+
+
+def comparison_payload(films, users):
+    """Shape of a multi-user comparison: films grouped by overlap degree."""
+    usernames = [f"user{i}" for i in range(users)]
+    movies = {}
+    for i in range(films):
+        degree = 2 + i % (min(users, 6) - 1)
+        movies.setdefault(degree, []).append(
+            {
+                "id": str(10000 + i),
+                "title": f"Film Title Number {i}",
+                "slug": f"Film Title Number {i}",
+                "users": usernames[:degree],
+            }
+        )
+    return {
+        "movies": movies,
+        "user_details": {
+            name: {"exists": True, "movie_count": films, "last_updated": None}
+            for name in usernames
+        },
+    }
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - began)
+    return min(timings)
+
+
+def report(name, payload, providers, repeat):
+    print(f"\n{name}")
+    for label, provider in providers:
+        body = provider.dumps(payload, separators=(",", ":")).encode()
+        seconds = best_of(lambda: provider.dumps(payload, separators=(",", ":")), repeat)
+        sizes = [f"raw {len(body):>9,d} B", f"gzip {len(gzip.compress(body, 6)):>8,d} B"]
+        if brotli:
+            sizes.append(f"br {len(brotli.compress(body, quality=4)):>8,d} B")
+        print(f"  {label:<8} {seconds * 1000:8.2f} ms  " + "  ".join(sizes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--films", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    providers = [("json", DefaultJSONProvider(app))]
+    if orjson:
+        providers.append(("orjson", ORJSONProvider(app)))
+
+    report(
+        f"process_usernames ({args.users} users)",
+        usernames_payload(args.users),
+        providers,
+        args.repeat,
+    )
+    report(
+        f"comparison ({args.films} films, 8 users)",
+        comparison_payload(args.films, 8),
+        providers,
+        args.repeat,
+    )
+
+
+if __name__ == "__main__":
+    main()
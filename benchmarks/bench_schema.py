@@ -0,0 +1,139 @@
+# bench_schema.py
+"""Storage and join speed of string vs. integer film ids in movie/user_movie.
+
+Builds the schema before the integer id migration, with integer ids only,
+and after it (with the covering per-film index) in SQLite files holding the
+same synthetic watchlists. Reports table and index sizes,
+then times the shared-film self-join behind /api/compare and similar users,
+and the per-film lookup behind search's `usernames` option.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_schema --users 2000 --films 300
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+SCHEMAS = {
+    "string ids": """
+        CREATE TABLE movie (id VARCHAR(255) NOT NULL PRIMARY KEY, title VARCHAR(255));
+        CREATE TABLE user_movie (
+            user_id INTEGER NOT NULL, generation INTEGER NOT NULL,
+            movie_id VARCHAR(255) NOT NULL REFERENCES movie (id), added_at DATETIME,
+            PRIMARY KEY (user_id, generation, movie_id));
+    """,
+    "integer ids": """
+        CREATE TABLE movie (id INTEGER NOT NULL PRIMARY KEY, title VARCHAR(255));
+        CREATE TABLE user_movie (
+            user_id INTEGER NOT NULL, generation INTEGER NOT NULL,
+            movie_id INTEGER NOT NULL REFERENCES movie (id), added_at DATETIME,
+            PRIMARY KEY (user_id, generation, movie_id));
+    """,
+}
+# The migrated schema: integer ids plus the covering per-film index
+SCHEMAS["integer ids + film index"] = SCHEMAS["integer ids"] + """
+    CREATE INDEX ix_user_movie_movie_user ON user_movie (movie_id, user_id, generation);
+"""
+
+SHARED_FILMS = """
+    SELECT theirs.user_id, count(*) FROM user_movie AS mine
+    JOIN user_movie AS theirs ON theirs.movie_id = mine.movie_id
+    WHERE mine.user_id = ? AND mine.generation = 0
+      AND theirs.user_id IN ({others}) AND theirs.generation = 0
+    GROUP BY theirs.user_id
+"""
+USERS_WITH_FILM = """
+    SELECT user_id FROM user_movie WHERE movie_id = ? AND generation = 0
+"""
+
+
+def watchlists(users, films, pool, seed=1):
+    # Letterboxd-like ids: six or seven digits, popular films saved more often
+    rng = random.Random(seed)
+    catalog = rng.sample(range(10_000, 1_500_000), pool)
+    weights = [1 / (rank + 10) for rank in range(pool)]
+    return catalog, [set(rng.choices(catalog, weights, k=films)) for _ in range(users)]
+
+
+def build(path, schema, catalog, lists, as_text):
+    convert = str if as_text else int
+    connection = sqlite3.connect(path)
+    connection.executescript(schema)
+    connection.executemany(
+        "INSERT INTO movie VALUES (?, ?)",
+        ((convert(film), f"Film {film}") for film in catalog),
+    )
+    connection.executemany(
+        "INSERT INTO user_movie VALUES (?, 0, ?, '2024-05-01 12:00:00')",
+        ((user, convert(film)) for user, films in enumerate(lists) for film in films),
+    )
+    connection.commit()
+    connection.execute("VACUUM")
+    return connection
+
+
+def sizes(connection):
+    try:
+        rows = connection.execute(
+            "SELECT name, sum(pgsize) FROM dbstat GROUP BY name ORDER BY name"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        rows = []  # SQLite built without dbstat: report the file size only
+    page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+    pages = connection.execute("PRAGMA page_count").fetchone()[0]
+    objects = [(name, size) for name, size in rows if name != "sqlite_schema"]
+    return objects, page_size * pages
+
+
+def timed(connection, statement, params_list):
+    began = time.perf_counter()
+    for params in params_list:
+        others = ",".join("?" * (len(params) - 1))
+        connection.execute(statement.format(others=others), params).fetchall()
+    return (time.perf_counter() - began) / len(params_list)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--films", type=int, default=300, help="films per watchlist")
+    parser.add_argument("--pool", type=int, default=50000, help="distinct films")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    catalog, lists = watchlists(args.users, args.films, args.pool)
+    rng = random.Random(2)
+    compares = [
+        [user] + rng.sample(range(args.users), 20)
+        for user in rng.sample(range(args.users), args.queries)
+    ]
+    film_lookups = [(film,) for film in rng.sample(catalog[:5000], args.queries)]
+    rows = sum(len(films) for films in lists)
+    print(f"{args.users} users, {rows} user_movie rows, {args.pool} films")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, schema in SCHEMAS.items():
+            as_text = label == "string ids"
+            connection = build(
+                os.path.join(directory, f"{label}.db"), schema, catalog, lists, as_text
+            )
+            convert = str if as_text else int
+            objects, total = sizes(connection)
+            print(f"\n{label}: {total / 1024 / 1024:.1f} MiB")
+            for name, size in objects:
+                print(f"  {name:<32} {size / 1024 / 1024:8.2f} MiB")
+            shared = timed(connection, SHARED_FILMS, compares)
+            lookup = timed(
+                connection,
+                USERS_WITH_FILM,
+                [(convert(film),) for (film,) in film_lookups],
+            )
+            print(f"  shared films, 1 vs 20 users  {shared * 1000:8.2f} ms")
+            print(f"  users with a film            {lookup * 1000:8.3f} ms")
+            connection.close()
+
+
+if __name__ == "__main__":
+    main()
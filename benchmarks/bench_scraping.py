@@ -0,0 +1,105 @@
+# bench_scraping.py
+"""Peak memory and time to first film: BeautifulSoup vs. streaming watchlist parsing.
+
+Also reports what a parsed page keeps alive: the soup tree, or ScrapedFilm
+records and their serialized form.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_scraping --films 5000
+"""
+import argparse
+import time
+import tracemalloc
+from bs4 import BeautifulSoup
+from app.scraping import FILM, WatchlistParser, encode_films, parse_films
+
+CHUNK_SIZE = 16384
+
+
+def synthetic_page(films):
+    # Pad each poster with markup similar to a real page so the tree has some weight
+    posters = "".join(
+        f'<li class="poster-container"><div class="really-lazy-load poster film-poster"'
+        f' data-film-id="{i}" data-film-name="Film {i}" data-film-slug="film-{i}">'
+        f'<img src="https://s.ltrbxd.com/empty-poster.png" alt="Film {i}" width="70"'
+        f' height="105"><span class="frame"><span class="frame-title"></span></span>'
+        f"</div></li>"
+        for i in range(films)
+    )
+    return (
+        f'<html><body><ul class="poster-list">{posters}</ul>'
+        f'<a class="next" href="/user/watchlist/page/2/">Older</a></body></html>'
+    ).encode()
+
+
+def with_soup(body):
+    began = time.perf_counter()
+    soup = BeautifulSoup(body, "html.parser")
+    first = None
+    ids = []
+    for li in soup.find_all("li", class_="poster-container"):
+        ids.append(li.find("div", {"class": "film-poster"}).get("data-film-id"))
+        first = first or time.perf_counter() - began
+    return first, len(ids)
+
+
+def with_stream(body):
+    began = time.perf_counter()
+    parser = WatchlistParser()
+    first = None
+    ids = []
+    for i in range(0, len(body), CHUNK_SIZE):
+        parser.feed(body[i : i + CHUNK_SIZE].decode())
+        for kind, film in parser.pop_events():
+            if kind == FILM:
+                ids.append(film.id)
+                first = first or time.perf_counter() - began
+    parser.close()
+    return first, len(ids)
+
+
+def measure(label, func, body):
+    tracemalloc.start()
+    began = time.perf_counter()
+    first, count = func(body)
+    total = time.perf_counter() - began
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(
+        f"  {label:<7} films {count:>6}  first film {first * 1000:8.2f} ms"
+        f"  total {total * 1000:8.1f} ms  peak {peak / 1024 / 1024:7.2f} MiB"
+    )
+
+
+def retained(label, build):
+    tracemalloc.start()
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"  {label:<22} {size / 1024:10.1f} KiB")
+    return kept
+
+
+def footprint(body):
+    soup = retained("soup tree", lambda: BeautifulSoup(body, "html.parser"))
+    films = retained("ScrapedFilm records", lambda: parse_films(soup))
+    del soup
+    payload = encode_films(films)
+    print(f"  {'encode_films payload':<22} {len(payload) / 1024:10.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--films", type=int, default=5000)
+    args = parser.parse_args()
+    body = synthetic_page(args.films)
+    print(f"page size {len(body) / 1024:.0f} KiB, {args.films} films")
+    measure("soup", with_soup, body)
+    measure("stream", with_stream, body)
+    print("retained after parsing")
+    footprint(body)
+
+
+if __name__ == "__main__":
+    main()
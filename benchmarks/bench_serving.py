@@ -0,0 +1,45 @@
+# bench_serving.py
+"""Gthread gunicorn workers vs. the ASGI server under many concurrent /api/find calls.
+
+Runs the load test harness twice with the same find-only traffic against a
+slow stub Letterboxd. Sync workers can only have workers x threads lookups
+waiting at once; the ASGI server waits on all of them from its event loop.
+The upstream guard is raised to --upstream-concurrency so it is not the cap.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_serving --rate 40 --stub-latency 1.0
+"""
+import argparse
+from loadtest.harness import main as run_harness
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=40.0, help="find requests/second")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--stub-latency", type=float, default=1.0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--upstream-concurrency", type=int, default=1000)
+    parser.add_argument("--database", default="sqlite:////tmp/reelview_bench_serving.db")
+    args = parser.parse_args()
+    common = [
+        "--duration", str(args.duration),
+        "--rate", "search=0",
+        "--rate", f"find={args.rate}",
+        "--rate", "sync=0",
+        "--stub-latency", str(args.stub_latency),
+        "--stub-jitter", "0",
+        "--workers", str(args.workers),
+        "--upstream-concurrency", str(args.upstream_concurrency),
+        "--database", args.database,
+    ]
+    print(f"gunicorn gthread, {args.workers} workers x {args.threads} threads")
+    run_harness(["--gunicorn", "--threads", str(args.threads)] + common)
+    print(f"\nuvicorn asgi.py, {args.workers} workers")
+    run_harness(["--asgi"] + common)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,91 @@
 # config.py
 import os
 import logging
-from app.models import *
-from app.extensions import db
+from datetime import timedelta
 
 
 class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     CORS_ORIGINS = []
+    # Set explicitly: the shared limiter keeps the last app's value otherwise
+    RATELIMIT_ENABLED = True
+    LETTERBOXD_URL = os.getenv("LETTERBOXD_URL", "https://letterboxd.com")
+    # Usernames accepted per request; each may cost Letterboxd calls
+    MAX_USERNAMES = 50
+    # Responses smaller than this (bytes) are sent uncompressed
+    COMPRESSION_MIN_SIZE = 1024
+    COMPRESSION_GZIP_LEVEL = 6
+    COMPRESSION_BROTLI_QUALITY = 4
+    # Parse watchlist pages incrementally while they download (see app/scraping.py)
+    SCRAPE_STREAMING = os.getenv("SCRAPE_STREAMING", "false").lower() == "true"
+    WATCHLIST_PAGE_SIZE = 100
+    WATCHLIST_MAX_PAGE_SIZE = 500
+    # Watchlist export: rows fetched per cursor batch, bytes per streamed chunk.
+    # /api/export needs EXPORT_TOKEN (see below) and at most EXPORT_MAX_USERS
+    # usernames; the export-watchlists command has no limit.
+    EXPORT_BATCH_SIZE = 1000
+    EXPORT_CHUNK_SIZE = 64 * 1024
+    EXPORT_MAX_USERS = 50
+    # Film metadata enrichment: film pages fetched per second, rows per UPDATE
+    ENRICHMENT_RATE = 1.0
+    ENRICHMENT_BATCH_SIZE = 50
+    ENRICHMENT_MAX_PER_RUN = 500
+    ENRICHMENT_TTL = timedelta(days=30)
+    ENRICHMENT_RETRY_AFTER = timedelta(hours=6)
+    ENRICHMENT_LOCK_TIMEOUT = 900
+    # Seconds a sync may hold its per-user lock; old generations are deleted by a
+    # background thread after each sync (or inline when disabled)
+    SYNC_LOCK_TIMEOUT = 600
+    SYNC_CLEANUP_IN_BACKGROUND = True
+    # Chunked sync: pages scraped per /api/sync call; an unfinished sync resumes
+    # from its cursor within SYNC_RESUME_WINDOW, otherwise it starts over
+    SYNC_PAGES_PER_CHUNK = 10
+    SYNC_MAX_PAGES = 1000
+    SYNC_RESUME_WINDOW = timedelta(hours=1)
+    # Comparison cache: results live in Redis for COMPARE_CACHE_TTL seconds and
+    # least recently used entries are evicted once the total exceeds the budget
+    COMPARE_CACHE_TTL = 24 * 3600
+    COMPARE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    COMPARE_CACHE_MAX_ENTRY_BYTES = 4 * 1024 * 1024
+    # Upstream guard shared by all workers through Redis (see app/upstream.py):
+    # AIMD concurrency limit, Retry-After pauses and a circuit breaker
+    UPSTREAM_GUARD = True
+    UPSTREAM_REQUEST_TIMEOUT = 10
+    UPSTREAM_INITIAL_CONCURRENCY = 4
+    UPSTREAM_MIN_CONCURRENCY = 1
+    UPSTREAM_MAX_CONCURRENCY = 16
+    UPSTREAM_DECREASE_FACTOR = 0.5
+    UPSTREAM_ACQUIRE_TIMEOUT = 5
+    UPSTREAM_LEASE_TIMEOUT = 60
+    UPSTREAM_DEFAULT_RETRY_AFTER = 10
+    UPSTREAM_MAX_RETRY_AFTER = 600
+    UPSTREAM_BREAKER_THRESHOLD = 5
+    UPSTREAM_BREAKER_COOLDOWN = 30
+    # Similar users: MinHash signatures of SIMILAR_BANDS x SIMILAR_ROWS values.
+    # Users become candidates at roughly (1 / bands) ** (1 / rows) Jaccard
+    # similarity (about 0.13 here); at most SIMILAR_CANDIDATES are scored exactly.
+    SIMILAR_BANDS = 64
+    SIMILAR_ROWS = 2
+    SIMILAR_CANDIDATES = 100
+    SIMILAR_DEFAULT_LIMIT = 10
+    # ASGI serving (asgi.py): Flask views and sync database steps run on
+    # ASGI_THREADS threads per worker, while /api/find and /api/sync await
+    # Letterboxd on the event loop over a shared connection pool
+    ASGI_THREADS = int(os.getenv("ASGI_THREADS", "16"))
+    ASGI_UPSTREAM_CONNECTIONS = int(os.getenv("ASGI_UPSTREAM_CONNECTIONS", "100"))
+    # Request profiling: requests carrying PROFILING_HEADER set to PROFILING_TOKEN
+    # are profiled, plus a random PROFILING_SAMPLE_RATE fraction of all requests.
+    # With no token and a zero rate, no profiling hooks are installed at all.
+    PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+    PROFILING_HEADER = "X-Profile-Token"
+    # Watchlist export: EXPORT_HEADER must carry EXPORT_TOKEN, a separate secret
+    # from PROFILING_TOKEN; without it /api/export always answers 403
+    EXPORT_TOKEN = os.getenv("EXPORT_TOKEN")
+    EXPORT_HEADER = "X-Export-Token"
+    PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+    PROFILING_BUFFER_SIZE = 20
+    # Report statements per request in an X-Query-Count header (always on in debug)
+    QUERY_COUNT_HEADER = False
 
     @classmethod
     def init_app(cls, app):
@@ -58,7 +136,11 @@ class DevelopmentConfig(Config):
 class TestingConfig(Config):
     DEBUG = False
     TESTING = True
-    CONFIF_NAME = "Testing"
+    CONFIG_NAME = "Testing"
     LOG_LEVEL = logging.CRITICAL
     CORS_ORIGINS = ["http://localhost:3000"]
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    # The in-memory database is a single connection; keep cleanup on the request thread
+    SYNC_CLEANUP_IN_BACKGROUND = False
+    # Shared breaker state would leak between tests; test_upstream enables it
+    UPSTREAM_GUARD = False
@@ -0,0 +1,45 @@
+# gunicorn.conf.py
+import logging
+import os
+import time
+
+# Serving profile
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+# Scrape calls spend most of their time waiting on Letterboxd, so threaded
+# workers keep serving other requests while one thread is blocked on the network.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+# Import the app once in the master; workers fork with the code already loaded.
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "20"))
+keepalive = 5
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+accesslog = "-"
+
+_boot_started = time.perf_counter()
+
+
+def when_ready(server):
+    """Logs master cold-start time (config load + app preload)."""
+    server.log.info("Server ready in %.3fs", time.perf_counter() - _boot_started)
+
+
+def post_fork(server, worker):
+    """Drops connections inherited from the master so each worker opens its own."""
+    from app.extensions import db, reset_redis_client
+
+    reset_redis_client()
+    app = worker.app.wsgi()
+    with app.app_context():
+        # close=False leaves the parent's sockets alone; the pool just forgets them.
+        db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    """Logs time from master start until this worker can accept requests."""
+    logging.getLogger("gunicorn.error").info(
+        "Worker %s ready %.3fs after boot", worker.pid, time.perf_counter() - _boot_started
+    )
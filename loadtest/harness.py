@@ -0,0 +1,306 @@
+# harness.py
+"""End-to-end load test: mixed search/find/sync traffic against a stubbed Letterboxd.
+
+Starts the stub server and the app (in-process, under gunicorn with the
+production config, or under uvicorn through asgi.py), seeds users, drives each endpoint at a fixed open-loop rate
+and reports throughput, latency percentiles and errors per endpoint.
+
+    python -m loadtest.harness --duration 30 --rate search=50 --rate sync=2
+    python -m loadtest.harness --gunicorn --workers 2 --threads 8 \\
+        --database postgresql://localhost/reelview_load
+    python -m loadtest.harness --asgi --workers 2 --rate find=200
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from loadtest.stub_letterboxd import StubSettings, start_stub_server
+
+DEFAULT_RATES = {"search": 20.0, "find": 2.0, "sync": 1.0}
+ENDPOINTS = {"search": "/api/search", "find": "/api/find", "sync": "/api/sync"}
+SEEDED_USERS = 500
+
+
+def create_loadtest_app(database_url=None, letterboxd_url=None, upstream_concurrency=None):
+    """App factory for load tests; defaults come from the environment (for gunicorn)."""
+    from app import create_app
+    from config import TestingConfig
+
+    concurrency = upstream_concurrency or os.getenv("LOADTEST_UPSTREAM_CONCURRENCY")
+
+    class LoadTestConfig(TestingConfig):
+        CONFIG_NAME = "LoadTest"
+        LOG_LEVEL = logging.WARNING
+        RATELIMIT_ENABLED = False
+        # Exercise the production upstream guard against the stub's 429s and 5xxs
+        UPSTREAM_GUARD = True
+        SQLALCHEMY_DATABASE_URI = database_url or os.environ["LOADTEST_DATABASE_URL"]
+        LETTERBOXD_URL = letterboxd_url or os.environ["LETTERBOXD_URL"]
+        if concurrency:
+            UPSTREAM_INITIAL_CONCURRENCY = UPSTREAM_MAX_CONCURRENCY = int(concurrency)
+
+    return create_app(LoadTestConfig)
+
+
+def create_loadtest_asgi_app():
+    """ASGI factory for uvicorn; settings come from the environment."""
+    from app.asgi import create_asgi_app
+
+    return create_asgi_app(create_loadtest_app())
+
+
+def seed_database(app, count=SEEDED_USERS):
+    """Creates tables and the user pool that search and sync traffic draw from."""
+    from app.extensions import db
+    from app.models import User
+
+    with app.app_context():
+        db.create_all()
+        existing = {name for (name,) in db.session.query(User.username)}
+        db.session.add_all(
+            User(username=name) for name in seeded_usernames(count) if name not in existing
+        )
+        db.session.commit()
+
+
+def seeded_usernames(count=SEEDED_USERS):
+    return [f"loaduser{i:04d}" for i in range(count)]
+
+
+def request_body(kind, counter):
+    """Builds the JSON body for one request of the given traffic kind."""
+    if kind == "search":
+        return {"usernames": [f"loaduser{random.randrange(SEEDED_USERS // 10):03d}"]}
+    if kind == "find":
+        prefix = "missing" if random.random() < 0.1 else "found"
+        return {"usernames": [f"{prefix}{counter}_{random.randrange(10**6)}"]}
+    return {"usernames": [f"loaduser{random.randrange(SEEDED_USERS):04d}"]}
+
+
+class EndpointStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.sent = 0
+
+    def record(self, latency, status=None, error=None):
+        with self.lock:
+            self.latencies.append(latency)
+            if status is not None:
+                self.statuses[status] += 1
+            if error is not None:
+                self.errors[error] += 1
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies)
+        ok = sum(count for status, count in self.statuses.items() if status < 400)
+        return {
+            "sent": self.sent,
+            "completed": len(latencies),
+            "throughput": round(ok / elapsed, 2) if elapsed else 0.0,
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+            "errors": dict(self.errors),
+        }
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def run_load(app_url, rates, duration, timeout=30.0, max_in_flight=512):
+    """Issues requests open-loop at the given per-endpoint rates; returns summaries."""
+    stats = defaultdict(EndpointStats)
+    local = threading.local()
+    executor = ThreadPoolExecutor(max_workers=max_in_flight)
+
+    def send(kind, body):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        began = time.perf_counter()
+        try:
+            response = session.post(app_url + ENDPOINTS[kind], json=body, timeout=timeout)
+            stats[kind].record(time.perf_counter() - began, status=response.status_code)
+        except requests.RequestException as e:
+            stats[kind].record(time.perf_counter() - began, error=type(e).__name__)
+
+    def schedule(kind, rate):
+        # Open loop: send times are fixed in advance, so slow responses do not
+        # lower the offered load (avoids coordinated omission).
+        interval = 1.0 / rate
+        began = time.perf_counter()
+        count = 0
+        while True:
+            due = began + count * interval
+            if due - began >= duration:
+                break
+            time.sleep(max(0.0, due - time.perf_counter()))
+            stats[kind].sent += 1
+            executor.submit(send, kind, request_body(kind, count))
+            count += 1
+
+    began = time.perf_counter()
+    schedulers = [
+        threading.Thread(target=schedule, args=(kind, rate), daemon=True)
+        for kind, rate in rates.items()
+        if rate > 0
+    ]
+    for thread in schedulers:
+        thread.start()
+    for thread in schedulers:
+        thread.join()
+    executor.shutdown(wait=True)
+    elapsed = time.perf_counter() - began
+    return {kind: stats[kind].summary(elapsed) for kind in rates if rates[kind] > 0}
+
+
+def start_app(args, app, env):
+    """Starts the app in a thread (werkzeug) or as a gunicorn/uvicorn subprocess; returns (url, stop)."""
+    if args.asgi:
+        port = args.port or 8902
+        process = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn",
+                "--factory", "loadtest.harness:create_loadtest_asgi_app",
+                "--host", "127.0.0.1",
+                "--port", str(port),
+                "--workers", str(args.workers),
+                "--no-access-log",
+                "--log-level", "warning",
+            ],
+            env=env,
+        )
+        wait_until_up(f"http://127.0.0.1:{port}/api/")
+        return f"http://127.0.0.1:{port}", process.terminate
+    if args.gunicorn:
+        port = args.port or 8901
+        process = subprocess.Popen(
+            [
+                sys.executable, "-m", "gunicorn",
+                "--config", "gunicorn.conf.py",
+                "--bind", f"127.0.0.1:{port}",
+                "--workers", str(args.workers),
+                "--threads", str(args.threads),
+                "--access-logfile", "/dev/null",
+                "loadtest.harness:create_loadtest_app()",
+            ],
+            env=env,
+        )
+        wait_until_up(f"http://127.0.0.1:{port}/api/")
+        return f"http://127.0.0.1:{port}", process.terminate
+
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", args.port or 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server.shutdown
+
+
+def wait_until_up(url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"App did not start at {url}")
+
+
+def parse_rates(values):
+    rates = dict(DEFAULT_RATES)
+    for value in values or []:
+        kind, _, rate = value.partition("=")
+        if kind not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint: {kind}")
+        rates[kind] = float(rate)
+    return rates
+
+
+def format_ms(seconds):
+    return f"{seconds * 1000:6.0f}ms" if seconds is not None else "      -"
+
+
+def print_report(report):
+    header = f"{'endpoint':<8} {'sent':>6} {'done':>6} {'ok/s':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7}  statuses / errors"
+    print(header)
+    print("-" * len(header))
+    for kind, summary in report.items():
+        print(
+            f"{kind:<8} {summary['sent']:>6} {summary['completed']:>6} {summary['throughput']:>7}"
+            f" {format_ms(summary['p50'])} {format_ms(summary['p95'])}"
+            f" {format_ms(summary['p99'])} {format_ms(summary['max'])}"
+            f"  {summary['statuses']} {summary['errors'] or ''}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--rate", action="append", help="endpoint=requests/second")
+    parser.add_argument("--database", default="sqlite:////tmp/reelview_loadtest.db")
+    parser.add_argument("--stub-latency", type=float, default=0.2)
+    parser.add_argument("--stub-jitter", type=float, default=0.1)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--stub-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--stub-pages", type=int, default=3)
+    parser.add_argument("--gunicorn", action="store_true")
+    parser.add_argument("--asgi", action="store_true", help="serve asgi.py under uvicorn")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument(
+        "--upstream-concurrency", type=int, help="fixed upstream guard limit"
+    )
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    stub, stub_url = start_stub_server(
+        StubSettings(
+            latency=args.stub_latency,
+            jitter=args.stub_jitter,
+            error_rate=args.stub_error_rate,
+            throttle_rate=args.stub_throttle_rate,
+            pages=args.stub_pages,
+        )
+    )
+    env = dict(os.environ, LOADTEST_DATABASE_URL=args.database, LETTERBOXD_URL=stub_url)
+    if args.upstream_concurrency:
+        env["LOADTEST_UPSTREAM_CONCURRENCY"] = str(args.upstream_concurrency)
+    app = create_loadtest_app(args.database, stub_url, args.upstream_concurrency)
+    seed_database(app)
+    app_url, stop = start_app(args, app, env)
+    try:
+        report = run_load(app_url, parse_rates(args.rate), args.duration)
+    finally:
+        stop()
+        stub.shutdown()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
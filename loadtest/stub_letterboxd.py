@@ -0,0 +1,141 @@
+# stub_letterboxd.py
+"""Stub Letterboxd server with configurable latency and error rates.
+
+Serves watchlist pages (/<username>/watchlist/, /<username>/watchlist/page/N/)
+and film pages (/film/<slug>/). Usernames starting with "missing" return 404.
+
+    python -m loadtest.stub_letterboxd --port 8900 --latency 0.3 --error-rate 0.05
+"""
+import argparse
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WATCHLIST_PATH = re.compile(r"^/([^/]+)/watchlist/(?:page/(\d+)/)?$")
+FILM_PATH = re.compile(r"^/film/([^/]+)/$")
+
+
+class StubSettings:
+    def __init__(
+        self,
+        latency=0.2,
+        jitter=0.1,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        pages=3,
+        films_per_page=28,
+        film_pool=5000,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.pages = pages
+        self.films_per_page = films_per_page
+        self.film_pool = film_pool
+
+
+def watchlist_page(settings, username, page):
+    """Deterministic watchlist page: the same user always has the same films."""
+    seed = zlib.crc32(username.encode())
+    start = page * settings.films_per_page
+    posters = []
+    for index in range(start, start + settings.films_per_page):
+        film_id = 1 + (seed + index * 7919) % settings.film_pool
+        posters.append(
+            f'<li class="poster-container"><div class="film-poster"'
+            f' data-film-id="{film_id}" data-film-name="Film {film_id}"'
+            f' data-film-slug="film-{film_id}"></div></li>'
+        )
+    link = ""
+    if page + 1 < settings.pages:
+        link = f'<a class="next" href="/{username}/watchlist/page/{page + 2}/">Older</a>'
+    return (
+        f'<html><body><ul class="poster-list">{"".join(posters)}</ul>'
+        f"{link}</body></html>"
+    )
+
+
+def film_page(slug):
+    film_id = slug.rsplit("-", 1)[-1]
+    return (
+        f'<html><head><meta property="og:title" content="Film {film_id} (2001)">'
+        f'<meta property="og:image" content="https://stub/{film_id}.jpg"></head>'
+        f'<body><p class="text-footer">{90 + int(film_id) % 60}&nbsp;mins</p></body></html>'
+    )
+
+
+def make_handler(settings):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(max(0.0, random.gauss(settings.latency, settings.jitter)))
+            roll = random.random()
+            if roll < settings.throttle_rate:
+                return self.respond(429, "Too Many Requests", {"Retry-After": "1"})
+            if roll < settings.throttle_rate + settings.error_rate:
+                return self.respond(503, "Service Unavailable")
+
+            match = WATCHLIST_PATH.match(self.path)
+            if match:
+                username, page = match.group(1), int(match.group(2) or 1) - 1
+                if username.startswith("missing") or page >= settings.pages:
+                    return self.respond(404, "Not Found")
+                return self.respond(200, watchlist_page(settings, username, page))
+            match = FILM_PATH.match(self.path)
+            if match:
+                return self.respond(200, film_page(match.group(1)))
+            return self.respond(404, "Not Found")
+
+        def respond(self, status, body, headers=None):
+            payload = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub_server(settings, host="127.0.0.1", port=0):
+    """Starts the stub in a daemon thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer((host, port), make_handler(settings))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--pages", type=int, default=3)
+    args = parser.parse_args()
+    settings = StubSettings(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        pages=args.pages,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(settings))
+    print(f"Stub Letterboxd listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
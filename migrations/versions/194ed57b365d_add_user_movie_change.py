@@ -0,0 +1,38 @@
+"""add user_movie_change
+
+Revision ID: 194ed57b365d
+Revises: 779f060854b4
+Create Date: 2024-05-16 18:03:47.215560
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '194ed57b365d'
+down_revision = '779f060854b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_movie_change',
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('movie_id', sa.String(length=255), nullable=False),
+    sa.Column('change', sa.String(length=10), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['movie_id'], ['movie.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('seq')
+    )
+    with op.batch_alter_table('user_movie_change', schema=None) as batch_op:
+        batch_op.create_index('ix_user_movie_change_user_seq', ['user_id', 'seq'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_movie_change', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_movie_change_user_seq')
+
+    op.drop_table('user_movie_change')
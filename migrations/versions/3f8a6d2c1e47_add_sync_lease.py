@@ -0,0 +1,26 @@
+"""add sync lease
+
+Revision ID: 3f8a6d2c1e47
+Revises: 7b3e5f0a9c12
+Create Date: 2024-06-03 11:26:09.481734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8a6d2c1e47'
+down_revision = '7b3e5f0a9c12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sync_locked_until', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('sync_locked_until')
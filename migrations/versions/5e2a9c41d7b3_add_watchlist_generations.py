@@ -0,0 +1,48 @@
+"""add watchlist generations
+
+Revision ID: 5e2a9c41d7b3
+Revises: 194ed57b365d
+Create Date: 2024-05-20 10:12:31.408217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2a9c41d7b3'
+down_revision = '194ed57b365d'
+branch_labels = None
+depends_on = None
+
+
+def is_sqlite():
+    # SQLite rebuilds the table in batch mode; its primary key has no name to drop
+    return op.get_context().dialect.name == 'sqlite'
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('active_generation', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('user_movie', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('generation', sa.Integer(), server_default='0', nullable=False))
+        if not is_sqlite():
+            batch_op.drop_constraint('user_movie_pkey', type_='primary')
+        batch_op.create_primary_key('user_movie_pkey', ['user_id', 'generation', 'movie_id'])
+
+
+def downgrade():
+    # Keep only the snapshot readers currently see
+    op.execute(
+        'DELETE FROM user_movie WHERE generation <> '
+        '(SELECT active_generation FROM "user" WHERE "user".id = user_movie.user_id)'
+    )
+    with op.batch_alter_table('user_movie', schema=None) as batch_op:
+        if not is_sqlite():
+            batch_op.drop_constraint('user_movie_pkey', type_='primary')
+        batch_op.create_primary_key('user_movie_pkey', ['user_id', 'movie_id'])
+        batch_op.drop_column('generation')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('active_generation')
@@ -0,0 +1,53 @@
+"""unaccent title search
+
+Revision ID: 6c2d9e4b8f13
+Revises: 3f8a6d2c1e47
+Create Date: 2024-06-04 15:08:52.730146
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c2d9e4b8f13'
+down_revision = '3f8a6d2c1e47'
+branch_labels = None
+depends_on = None
+
+# Folds accents like SQLite's remove_diacritics, which movie_fts already uses
+UNACCENT_CREATE = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE TEXT SEARCH CONFIGURATION simple_unaccent (COPY = simple)",
+    "ALTER TEXT SEARCH CONFIGURATION simple_unaccent "
+    "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple",
+]
+
+
+def upgrade():
+    if op.get_context().dialect.name == 'sqlite':
+        return
+    for statement in UNACCENT_CREATE:
+        op.execute(statement)
+    op.drop_index('ix_movie_title_fts', table_name='movie', postgresql_using='gin')
+    op.create_index(
+        'ix_movie_title_fts',
+        'movie',
+        [sa.text("to_tsvector('simple_unaccent', title)")],
+        unique=False,
+        postgresql_using='gin',
+    )
+
+
+def downgrade():
+    if op.get_context().dialect.name == 'sqlite':
+        return
+    op.drop_index('ix_movie_title_fts', table_name='movie', postgresql_using='gin')
+    op.create_index(
+        'ix_movie_title_fts',
+        'movie',
+        [sa.text("to_tsvector('simple', title)")],
+        unique=False,
+        postgresql_using='gin',
+    )
+    op.execute("DROP TEXT SEARCH CONFIGURATION simple_unaccent")
@@ -0,0 +1,34 @@
+"""add movie metadata
+
+Revision ID: 779f060854b4
+Revises: b9fcaf160c3c
+Create Date: 2024-05-14 10:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '779f060854b4'
+down_revision = 'b9fcaf160c3c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('movie', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('year', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('poster_url', sa.String(length=512), nullable=True))
+        batch_op.add_column(sa.Column('runtime', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('enriched_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_movie_enriched_at'), ['enriched_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('movie', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_movie_enriched_at'))
+        batch_op.drop_column('enriched_at')
+        batch_op.drop_column('runtime')
+        batch_op.drop_column('poster_url')
+        batch_op.drop_column('year')
@@ -0,0 +1,89 @@
+"""integer movie ids
+
+Revision ID: 7b3e5f0a9c12
+Revises: e4a7c2d91b58
+Create Date: 2024-05-29 16:40:22.951207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b3e5f0a9c12'
+down_revision = 'e4a7c2d91b58'
+branch_labels = None
+depends_on = None
+
+# Referencing tables first, so deleting bad ids never orphans a row
+MOVIE_ID_COLUMNS = [
+    ('user_movie_change', 'movie_id'),
+    ('user_movie', 'movie_id'),
+    ('movie', 'id'),
+]
+FOREIGN_KEYS = [
+    ('user_movie_change_movie_id_fkey', 'user_movie_change'),
+    ('user_movie_movie_id_fkey', 'user_movie'),
+]
+
+# Rebuilding the movie table on SQLite drops its FTS triggers (see c83f1e6a2b94)
+SQLITE_TRIGGERS = [
+    "CREATE TRIGGER movie_fts_insert AFTER INSERT ON movie BEGIN "
+    "INSERT INTO movie_fts (movie_id, title) VALUES (new.id, new.title); END",
+    "CREATE TRIGGER movie_fts_delete AFTER DELETE ON movie BEGIN "
+    "DELETE FROM movie_fts WHERE movie_id = old.id; END",
+    "CREATE TRIGGER movie_fts_update AFTER UPDATE OF id, title ON movie BEGIN "
+    "DELETE FROM movie_fts WHERE movie_id = old.id; "
+    "INSERT INTO movie_fts (movie_id, title) VALUES (new.id, new.title); END",
+]
+SQLITE_REINDEX = [
+    "DELETE FROM movie_fts",
+    "INSERT INTO movie_fts (movie_id, title) SELECT id, title FROM movie",
+]
+
+
+def is_sqlite():
+    return op.get_context().dialect.name == 'sqlite'
+
+
+def upgrade():
+    # Letterboxd film ids are numeric; anything else cannot be converted
+    for table, column in MOVIE_ID_COLUMNS:
+        if is_sqlite():
+            condition = f"{column} = '' OR {column} GLOB '*[^0-9]*'"
+        else:
+            condition = f"{column} !~ '^[0-9]+$'"
+        op.execute(f'DELETE FROM {table} WHERE {condition}')
+
+    set_movie_id_type(sa.Integer(), 'integer')
+
+    with op.batch_alter_table('user_movie', schema=None) as batch_op:
+        batch_op.create_index('ix_user_movie_movie_user', ['movie_id', 'user_id', 'generation'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_movie', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_movie_movie_user')
+
+    set_movie_id_type(sa.String(length=255), 'varchar(255)')
+
+
+def set_movie_id_type(type_, cast):
+    if not is_sqlite():
+        for name, table in FOREIGN_KEYS:
+            op.drop_constraint(name, table, type_='foreignkey')
+    for table, column in MOVIE_ID_COLUMNS:
+        # SQLite copies the table over, casting the column
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(
+                column,
+                type_=type_,
+                existing_nullable=False,
+                postgresql_using=f'{column}::{cast}',
+            )
+    if is_sqlite():
+        for statement in SQLITE_TRIGGERS + SQLITE_REINDEX:
+            op.execute(statement)
+    else:
+        for name, table in FOREIGN_KEYS:
+            op.create_foreign_key(name, table, 'movie', ['movie_id'], ['id'])
@@ -0,0 +1,32 @@
+"""add resumable sync
+
+Revision ID: 9d1f4b7e2c60
+Revises: c83f1e6a2b94
+Create Date: 2024-05-24 14:02:47.215390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d1f4b7e2c60'
+down_revision = 'c83f1e6a2b94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('watchlist_complete', sa.Boolean(), server_default=sa.false(), nullable=False))
+        batch_op.add_column(sa.Column('sync_cursor', sa.String(length=512), nullable=True))
+        batch_op.add_column(sa.Column('sync_pages', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('sync_started_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('sync_started_at')
+        batch_op.drop_column('sync_pages')
+        batch_op.drop_column('sync_cursor')
+        batch_op.drop_column('watchlist_complete')
@@ -0,0 +1,58 @@
+"""add movie title search
+
+Revision ID: c83f1e6a2b94
+Revises: 5e2a9c41d7b3
+Create Date: 2024-05-22 09:41:08.663120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c83f1e6a2b94'
+down_revision = '5e2a9c41d7b3'
+branch_labels = None
+depends_on = None
+
+# SQLite has no tsvector; it gets an FTS5 table kept in step by triggers
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE movie_fts USING fts5("
+    "movie_id UNINDEXED, title, tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER movie_fts_insert AFTER INSERT ON movie BEGIN "
+    "INSERT INTO movie_fts (movie_id, title) VALUES (new.id, new.title); END",
+    "CREATE TRIGGER movie_fts_delete AFTER DELETE ON movie BEGIN "
+    "DELETE FROM movie_fts WHERE movie_id = old.id; END",
+    "CREATE TRIGGER movie_fts_update AFTER UPDATE OF id, title ON movie BEGIN "
+    "DELETE FROM movie_fts WHERE movie_id = old.id; "
+    "INSERT INTO movie_fts (movie_id, title) VALUES (new.id, new.title); END",
+    "INSERT INTO movie_fts (movie_id, title) SELECT id, title FROM movie",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS movie_fts_insert",
+    "DROP TRIGGER IF EXISTS movie_fts_delete",
+    "DROP TRIGGER IF EXISTS movie_fts_update",
+    "DROP TABLE IF EXISTS movie_fts",
+]
+
+
+def upgrade():
+    if op.get_context().dialect.name == 'sqlite':
+        for statement in SQLITE_CREATE:
+            op.execute(statement)
+    else:
+        op.create_index(
+            'ix_movie_title_fts',
+            'movie',
+            [sa.text("to_tsvector('simple', title)")],
+            unique=False,
+            postgresql_using='gin',
+        )
+
+
+def downgrade():
+    if op.get_context().dialect.name == 'sqlite':
+        for statement in SQLITE_DROP:
+            op.execute(statement)
+    else:
+        op.drop_index('ix_movie_title_fts', table_name='movie', postgresql_using='gin')
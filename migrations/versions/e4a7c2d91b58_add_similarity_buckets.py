@@ -0,0 +1,36 @@
+"""add similarity buckets
+
+Revision ID: e4a7c2d91b58
+Revises: 9d1f4b7e2c60
+Create Date: 2024-05-27 11:18:05.734912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a7c2d91b58'
+down_revision = '9d1f4b7e2c60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled by each sync; run `flask index-similarity` to index existing users
+    op.create_table('similarity_bucket',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('band', sa.SmallInteger(), nullable=False),
+    sa.Column('bucket', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'band')
+    )
+    with op.batch_alter_table('similarity_bucket', schema=None) as batch_op:
+        batch_op.create_index('ix_similarity_bucket_band_bucket', ['band', 'bucket'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('similarity_bucket', schema=None) as batch_op:
+        batch_op.drop_index('ix_similarity_bucket_band_bucket')
+
+    op.drop_table('similarity_bucket')
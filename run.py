@@ -1,5 +1,10 @@
 # run.py
+import time
+
+_startup_began = time.perf_counter()
+
 import os
+import logging
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -21,6 +26,8 @@ def get_config_class():
 
 
 app = create_app(get_config_class())
+app.config["STARTUP_SECONDS"] = time.perf_counter() - _startup_began
+logging.info(f"App started in {app.config['STARTUP_SECONDS']:.3f}s")
 
 if __name__ == "__main__":
     app.run(debug=app.config["DEBUG"], port=5001)
@@ -1,6 +1,7 @@
 # tests/conftest.py
 import pytest
 from app import create_app
+from app.querycount import assert_max_queries, count_queries
 from config import TestingConfig
 
 
@@ -9,3 +10,16 @@ def client():
     app = create_app(TestingConfig)
     with app.test_client() as client:
         yield client
+
+
+@pytest.fixture
+def query_counter():
+    """Counts SQL statements executed during the test."""
+    with count_queries() as counter:
+        yield counter
+
+
+@pytest.fixture
+def query_budget():
+    """Returns assert_max_queries: `with query_budget(5): ...` fails above 5 statements."""
+    return assert_max_queries
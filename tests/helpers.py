@@ -0,0 +1,22 @@
+# helpers.py
+from bs4 import BeautifulSoup
+
+
+def watchlist_html(films, next_page=None):
+    """Builds a Letterboxd-style watchlist page for (id, name, slug) films."""
+    posters = "".join(
+        f'<li class="poster-container"><div class="film-poster" data-film-id="{id}"'
+        f' data-film-name="{name}" data-film-slug="{slug}"></div></li>'
+        for id, name, slug in films
+    )
+    link = f'<a class="next" href="{next_page}">Older</a>' if next_page else ""
+    return f'<html><body><ul class="poster-list">{posters}</ul>{link}</body></html>'
+
+
+def watchlist_soup(films, next_page=None):
+    return BeautifulSoup(watchlist_html(films, next_page), "html.parser")
+
+
+def films(*ids):
+    """Film tuples with predictable names and slugs."""
+    return [(str(id), f"Film {id}", f"film-{id}") for id in ids]
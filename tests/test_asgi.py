@@ -0,0 +1,159 @@
+# test_asgi.py
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+import httpx
+from flask_testing import TestCase
+from app import create_app
+from app.asgi import create_asgi_app
+from app.changes import get_movie_ids
+from app.extensions import db, limiter
+from app.models import User
+from config import TestingConfig
+from tests.helpers import films, watchlist_html
+
+UPSTREAM_LATENCY = 0.2
+upstream_calls = []
+WATCHLIST_PAGES = {
+    "/alice/watchlist/": watchlist_html(films(1, 2), next_page="/alice/watchlist/page/2/"),
+    "/alice/watchlist/page/2/": watchlist_html(films(3)),
+}
+
+
+async def letterboxd(request):
+    """Stub upstream: profiles exist after a delay; "missing..." ones 404 at once."""
+    upstream_calls.append(request.url.path)
+    if request.url.path.startswith("/missing"):
+        return httpx.Response(404)
+    await asyncio.sleep(UPSTREAM_LATENCY)
+    return httpx.Response(200, text=WATCHLIST_PAGES.get(request.url.path, "<html></html>"))
+
+
+class TestAsgi(TestCase):
+    def create_app(self):
+        return create_app(TestingConfig)
+
+    def setUp(self):
+        limiter.reset()
+        upstream_calls.clear()
+        db.create_all()
+        self.asgi = create_asgi_app(self.app, transport=httpx.MockTransport(letterboxd))
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def post(self, path, body):
+        return self.post_all(path, [body])[0]
+
+    def post_all(self, path, bodies):
+        """Sends the requests concurrently."""
+
+        async def send():
+            transport = httpx.ASGITransport(app=self.asgi)
+            async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+                return await asyncio.gather(
+                    *(client.post(path, json=body) for body in bodies)
+                )
+
+        return asyncio.run(send())
+
+    def test_find_checks_profiles_without_blocking_fetches(self):
+        with patch("app.services.fetch_page", side_effect=AssertionError("blocking fetch")):
+            response = self.post("/api/find", {"usernames": ["alice", "missing_bob"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["alice"]["data"]["added"])
+        self.assertFalse(response.json()["missing_bob"]["data"]["added"])
+        self.assertEqual([user.username for user in User.query.all()], ["alice"])
+
+    def test_profiles_are_checked_concurrently(self):
+        usernames = [f"user{i}" for i in range(10)]
+        began = time.perf_counter()
+        response = self.post("/api/find", {"usernames": usernames})
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.perf_counter() - began, UPSTREAM_LATENCY * 3)
+        self.assertEqual(User.query.count(), 10)
+
+    def test_other_routes_served_by_flask(self):
+        db.session.add(User(username="alice"))
+        db.session.commit()
+        response = self.post("/api/search", {"usernames": ["ali"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["ali"]["data"]["suggestions"], ["alice"])
+        self.assertEqual(self.post("/api/find", {}).status_code, 400)
+
+    def test_views_run_concurrently_on_the_pool(self):
+        threads = set()
+
+        def slow_autocomplete(username):
+            threads.add(threading.current_thread().name)
+            time.sleep(UPSTREAM_LATENCY)
+            return []
+
+        began = time.perf_counter()
+        # Without database reads: the in-memory test database is a single connection
+        with patch("app.services.autocomplete", slow_autocomplete), patch(
+            "app.services.get_user", return_value=None
+        ):
+            responses = self.post_all(
+                "/api/search", [{"usernames": [f"user{i}"]} for i in range(4)]
+            )
+        self.assertEqual([response.status_code for response in responses], [200] * 4)
+        self.assertLess(time.perf_counter() - began, UPSTREAM_LATENCY * 2)
+        self.assertEqual(len(threads), 4)
+        self.assertTrue(all(name.startswith("asgi") for name in threads))
+
+    def test_rate_limited_finds_make_no_upstream_calls(self):
+        # One at a time: the in-memory test database is a single connection
+        statuses = [
+            self.post("/api/find", {"usernames": [f"missing_{i}"]}).status_code
+            for i in range(22)
+        ]
+        # The default limit is 20 per minute; the second pass is not counted
+        self.assertEqual(statuses, [200] * 20 + [429] * 2)
+        self.assertEqual(len(upstream_calls), 20)
+
+    def test_invalid_finds_make_no_upstream_calls(self):
+        too_many = {"usernames": [f"user{i}" for i in range(51)]}
+        for body in (too_many, {"usernames": ["alice", 1]}, {}):
+            self.assertEqual(self.post("/api/find", body).status_code, 400)
+        self.assertEqual(upstream_calls, [])
+
+    def test_sync_awaits_watchlist_pages(self):
+        db.session.add(User(username="alice"))
+        db.session.commit()
+        blocking = AssertionError("blocking fetch")
+        with patch("app.services.fetch_page", side_effect=blocking), patch(
+            "app.services.stream_page", side_effect=blocking
+        ):
+            response = self.post("/api/sync", {"usernames": ["alice", "nobody"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["alice"]["data"]["synced"])
+        self.assertFalse(response.json()["nobody"]["data"]["synced"])
+        user = User.query.filter_by(username="alice").one()
+        self.assertEqual(get_movie_ids(user, user.active_generation), {1, 2, 3})
+
+    def test_sync_holds_no_thread_while_pages_download(self):
+        db.session.add(User(username="alice"))
+        db.session.commit()
+        self.app.config["ASGI_THREADS"] = 1
+        asgi = create_asgi_app(self.app, transport=httpx.MockTransport(letterboxd))
+
+        async def send():
+            transport = httpx.ASGITransport(app=asgi)
+            async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+
+                async def timed(path, body):
+                    response = await client.post(path, json=body)
+                    return response.status_code, time.perf_counter()
+
+                sync = asyncio.create_task(timed("/api/sync", {"usernames": ["alice"]}))
+                await asyncio.sleep(UPSTREAM_LATENCY / 4)
+                search = await timed("/api/search", {"usernames": ["ali"]})
+                return search, await sync
+
+        (search_status, search_done), (sync_status, sync_done) = asyncio.run(send())
+        self.assertEqual((search_status, sync_status), (200, 200))
+        # The only view thread served the search while the sync awaited Letterboxd
+        self.assertLess(search_done, sync_done - UPSTREAM_LATENCY)
@@ -0,0 +1,101 @@
+# test_changes.py
+from unittest.mock import patch
+from flask_testing import TestCase
+from sqlalchemy import event
+from app import create_app
+from app.changes import CHANGE_LOG_LOCK_ID, record_changes
+from app.extensions import db
+from app.models import User
+from app.services import sync_user
+from config import TestingConfig
+from tests.helpers import films, watchlist_soup
+
+
+class TestChanges(TestCase):
+    def create_app(self):
+        app = create_app(TestingConfig)
+        app.config["TESTING"] = True
+        return app
+
+    def setUp(self):
+        db.create_all()
+        db.session.add_all([User(username="alice"), User(username="bob")])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def sync(self, username, *ids):
+        user = User.query.filter_by(username=username).one()
+        with patch("app.services.fetch_page", return_value=watchlist_soup(films(*ids))):
+            sync_user(user)
+
+    def changes(self, usernames, since=0, **kwargs):
+        response = self.client.post(
+            "/api/changes", json={"usernames": usernames, "since": since, **kwargs}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json
+
+    def test_sync_records_additions_and_removals(self):
+        self.sync("alice", 1, 2, 3)
+        first = self.changes(["alice"])
+        self.assertEqual(
+            [(c["movie_id"], c["change"]) for c in first["users"]["alice"]["data"]],
+            [("1", "added"), ("2", "added"), ("3", "added")],
+        )
+
+        self.sync("alice", 2, 3, 4)
+        later = self.changes(["alice"], since=first["latest"])
+        self.assertEqual(
+            [(c["movie_id"], c["change"]) for c in later["users"]["alice"]["data"]],
+            [("4", "added"), ("1", "removed")],
+        )
+        self.assertGreater(later["latest"], first["latest"])
+
+    def test_unchanged_sync_records_nothing(self):
+        self.sync("alice", 1, 2)
+        latest = self.changes(["alice"])["latest"]
+        self.sync("alice", 1, 2)
+        result = self.changes(["alice"], since=latest)
+        self.assertEqual(result["users"]["alice"]["data"], [])
+        self.assertEqual(result["latest"], latest)
+
+    def test_multiple_users_and_limit(self):
+        self.sync("alice", 1, 2)
+        self.sync("bob", 3)
+        result = self.changes(["alice", "bob", "nobody"], limit=2)
+        self.assertTrue(result["has_more"])
+        self.assertEqual(len(result["users"]["alice"]["data"]), 2)
+        self.assertEqual(result["users"]["bob"]["data"], [])
+        self.assertEqual(result["users"]["nobody"]["error"], "User not found")
+
+        rest = self.changes(["alice", "bob"], since=result["latest"])
+        self.assertFalse(rest["has_more"])
+        self.assertEqual(rest["users"]["bob"]["data"][0]["movie_id"], "3")
+
+    def test_invalid_since(self):
+        response = self.client.post(
+            "/api/changes", json={"usernames": ["alice"], "since": "yesterday"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_postgresql_writers_lock_change_log_before_insert(self):
+        # Stand in for PostgreSQL's advisory lock function on SQLite
+        locked = []
+        sqlite = db.session.connection().connection.driver_connection
+        sqlite.create_function("pg_advisory_xact_lock", 1, locked.append)
+        statements = []
+        listener = lambda *args: statements.append(args[2])  # noqa: E731
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            with patch.object(db.engine.dialect, "name", "postgresql"):
+                user = User.query.filter_by(username="alice").one()
+                record_changes(user, set(), {1})
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+        self.assertEqual(locked, [CHANGE_LOG_LOCK_ID])
+        lock = next(i for i, s in enumerate(statements) if "advisory" in s)
+        insert = next(i for i, s in enumerate(statements) if "INSERT" in s)
+        self.assertLess(lock, insert)
@@ -0,0 +1,119 @@
+# test_compare.py
+from unittest.mock import patch
+from flask_testing import TestCase
+import redis
+from sqlalchemy import update
+from app import create_app
+from app import compare
+from app.extensions import db, redis_client
+from app.models import User, UserMovie
+from app.querycount import count_queries
+from app.services import sync_user
+from config import TestingConfig
+from tests.helpers import films, watchlist_soup
+
+
+class TestCompare(TestCase):
+    def create_app(self):
+        return create_app(TestingConfig)
+
+    def setUp(self):
+        for key in redis_client.scan_iter("compare:*"):
+            redis_client.delete(key)
+        db.create_all()
+        for username in ("alice", "bob", "carol"):
+            db.session.add(User(username=username))
+        db.session.commit()
+        self.sync("alice", 1, 2, 3)
+        self.sync("bob", 2, 3, 4)
+        self.sync("carol", 3, 5)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def sync(self, username, *ids):
+        user = User.query.filter_by(username=username).one()
+        with patch("app.services.fetch_page", return_value=watchlist_soup(films(*ids))):
+            sync_user(user)
+
+    def compare(self, *usernames):
+        response = self.client.post("/api/compare", json={"usernames": list(usernames)})
+        self.assertEqual(response.status_code, 200)
+        return response.json
+
+    def shared(self, result):
+        return {
+            degree: [(movie["id"], movie["users"]) for movie in movies]
+            for degree, movies in result["movies"].items()
+        }
+
+    def test_groups_shared_films_by_degree(self):
+        result = self.compare("carol", "alice", "bob", "dave")
+        self.assertEqual(
+            self.shared(result),
+            {"3": [("3", ["alice", "bob", "carol"])], "2": [("2", ["alice", "bob"])]},
+        )
+        self.assertEqual(result["user_details"]["alice"]["movie_count"], 3)
+        self.assertIsNone(result["user_details"]["dave"])
+
+    def test_repeat_comparison_served_from_cache(self):
+        first = self.compare("alice", "bob")
+        with count_queries() as counter:
+            self.assertEqual(self.compare("bob", "alice"), first)
+        # Only the user lookup that yields the cache key
+        self.assertEqual(counter.count, 1)
+
+    def test_sync_invalidates_cached_comparison(self):
+        self.compare("alice", "bob")
+        self.sync("bob", 1, 2)
+        self.assertEqual(
+            self.shared(self.compare("alice", "bob")),
+            {"2": [("1", ["alice", "bob"]), ("2", ["alice", "bob"])]},
+        )
+
+    def test_new_member_reuses_cached_pairs(self):
+        self.compare("alice", "bob")
+        with patch("app.compare.shared_movies", wraps=compare.shared_movies) as shared:
+            self.compare("alice", "bob", "carol")
+        # Both new pairs come from a single query anchored on the newcomer
+        shared.assert_called_once()
+        self.assertEqual(shared.call_args.args[0].username, "carol")
+
+    def test_eviction_keeps_cache_within_budget(self):
+        self.app.config["COMPARE_CACHE_MAX_BYTES"] = 1200
+        for group in (("alice", "bob"), ("alice", "carol"), ("bob", "carol")):
+            self.compare(*group)
+        # Three group results and three pair overlaps were stored
+        self.assertLess(redis_client.zcard(compare.INDEX_KEY), 6)
+        total = int(redis_client.get(compare.TOTAL_KEY))
+        self.assertLessEqual(total, 1200)
+        sizes = redis_client.hvals(compare.SIZES_KEY)
+        self.assertEqual(sum(int(size) for size in sizes), total)
+        # The most recently stored result survives eviction
+        newest = redis_client.zrange(compare.INDEX_KEY, -1, -1)[0].decode()
+        self.assertTrue(newest.startswith("compare:group:"))
+        self.assertIsNotNone(redis_client.get(newest))
+
+    def test_works_without_redis(self):
+        offline = redis.Redis.from_url("redis://localhost:1")
+        with patch.object(compare, "redis_client", offline):
+            result = self.compare("alice", "bob")
+        self.assertEqual(list(result["movies"]), ["2"])
+
+    def test_sync_published_mid_comparison_is_not_mixed_in(self):
+        alice, bob = (
+            User.query.filter_by(username=name).one() for name in ("alice", "bob")
+        )
+        # Another worker publishes bob's next generation after the users were loaded
+        generation = bob.active_generation + 1
+        db.session.add(UserMovie(user_id=bob.id, movie_id=1, generation=generation))
+        db.session.execute(
+            update(User)
+            .where(User.id == bob.id)
+            .values(active_generation=generation)
+            .execution_options(synchronize_session=False)
+        )
+        shared = compare.shared_movies(alice, [bob])
+        self.assertEqual(sorted(shared[bob.id]), [2, 3])
+        self.assertEqual(compare.movie_counts([alice, bob]), {alice.id: 3, bob.id: 3})
@@ -0,0 +1,54 @@
+# test_encoding.py
+import gzip
+import json
+from flask_testing import TestCase
+from app import create_app
+from app.extensions import db
+from config import TestingConfig
+
+MANY_USERNAMES = {"usernames": [f"user{i}" for i in range(40)]}
+
+
+class TestEncoding(TestCase):
+    def create_app(self):
+        app = create_app(TestingConfig)
+        app.config["TESTING"] = True
+        return app
+
+    def setUp(self):
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def test_large_response_gzipped(self):
+        response = self.client.post(
+            "/api/search", json=MANY_USERNAMES, headers={"Accept-Encoding": "gzip"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        body = json.loads(gzip.decompress(response.data))
+        self.assertEqual(set(body), set(MANY_USERNAMES["usernames"]))
+
+    def test_uncompressed_without_accept_encoding(self):
+        response = self.client.post("/api/search", json=MANY_USERNAMES)
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(len(response.get_json()), 40)
+
+    def test_small_response_not_compressed(self):
+        response = self.client.post(
+            "/api/search",
+            json={"usernames": ["evilnik"]},
+            headers={"Accept-Encoding": "gzip, br"},
+        )
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_provider_matches_default_output(self):
+        from flask.json.provider import DefaultJSONProvider
+
+        payload = {"b": [1, 2.5, None, True], "a": {2: "two"}, "c": "é"}
+        default = DefaultJSONProvider(self.app).dumps(payload)
+        # orjson writes non-ASCII as UTF-8 rather than \u escapes; same document
+        self.assertEqual(json.loads(self.app.json.dumps(payload)), json.loads(default))
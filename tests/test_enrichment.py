@@ -0,0 +1,141 @@
+# test_enrichment.py
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from bs4 import BeautifulSoup
+from flask_testing import TestCase
+from app import create_app
+from app.enrichment import enrich_movies, film_slug, parse_film_page
+from app.extensions import db, redis_client
+from app.models import Movie, User, UserMovie
+from app.services import METADATA_VERSION_KEY
+from config import TestingConfig
+
+FILM_PAGE = """
+<html><head>
+<meta property="og:title" content="The Matrix (1999)">
+<meta property="og:image" content="https://a.ltrbxd.com/backdrop.jpg">
+<script type="application/ld+json">
+/* <![CDATA[ */
+{"image": "https://a.ltrbxd.com/poster.jpg", "releasedEvent": [{"startDate": "1999"}]}
+/* ]]> */
+</script>
+</head><body>
+<p class="text-link text-footer">136&nbsp;mins &nbsp; More at IMDb</p>
+</body></html>
+"""
+
+
+class TestEnrichment(TestCase):
+    def create_app(self):
+        app = create_app(TestingConfig)
+        app.config["TESTING"] = True
+        app.config["ENRICHMENT_RATE"] = 1000.0
+        app.config["ENRICHMENT_BATCH_SIZE"] = 2
+        return app
+
+    def setUp(self):
+        redis_client.delete(METADATA_VERSION_KEY)
+        for key in redis_client.scan_iter("compare:*"):
+            redis_client.delete(key)
+        db.create_all()
+        movies = [
+            Movie(id=i, title=f"Film {i}", slug=f"Film Number {i}")
+            for i in range(3)
+        ]
+        users = [User(username="alice"), User(username="bob")]
+        db.session.add_all(movies + users)
+        for user in users:
+            for movie in movies:
+                db.session.add(UserMovie(user=user, movie=movie))
+        db.session.commit()
+
+    def tearDown(self):
+        redis_client.delete(METADATA_VERSION_KEY)
+        db.session.remove()
+        db.drop_all()
+
+    def test_parse_film_page(self):
+        metadata = parse_film_page(BeautifulSoup(FILM_PAGE, "html.parser"))
+        self.assertEqual(
+            metadata,
+            {
+                "year": 1999,
+                "poster_url": "https://a.ltrbxd.com/poster.jpg",
+                "runtime": 136,
+            },
+        )
+
+    def test_film_slug_reverses_format_title(self):
+        movie = Movie(id=1, title="The Matrix", slug="The Matrix Reloaded")
+        self.assertEqual(film_slug(movie), "the-matrix-reloaded")
+
+    @patch("app.enrichment.fetch_page")
+    def test_each_film_fetched_once(self, fetch_page):
+        fetch_page.return_value = BeautifulSoup(FILM_PAGE, "html.parser")
+        self.assertEqual(enrich_movies(), 3)
+        # Two users share every film, but each film page is fetched once
+        self.assertEqual(fetch_page.call_count, 3)
+        movie = db.session.get(Movie, 0)
+        self.assertEqual((movie.year, movie.runtime), (1999, 136))
+        self.assertIsNotNone(movie.enriched_at)
+
+    @patch("app.enrichment.fetch_page")
+    def test_recently_enriched_films_skipped(self, fetch_page):
+        fetch_page.return_value = BeautifulSoup(FILM_PAGE, "html.parser")
+        enrich_movies()
+        fetch_page.reset_mock()
+        self.assertEqual(enrich_movies(), 0)
+        fetch_page.assert_not_called()
+
+        stale = datetime.now(timezone.utc) - timedelta(days=31)
+        db.session.get(Movie, 1).enriched_at = stale
+        db.session.commit()
+        self.assertEqual(enrich_movies(), 1)
+
+    @patch("app.enrichment.fetch_page")
+    def test_watchlist_serves_enriched_fields(self, fetch_page):
+        fetch_page.return_value = BeautifulSoup(FILM_PAGE, "html.parser")
+        enrich_movies()
+        response = self.client.get("/api/users/alice/movies")
+        movie = response.json["movies"][0]
+        self.assertEqual(movie["year"], 1999)
+        self.assertEqual(movie["poster_url"], "https://a.ltrbxd.com/poster.jpg")
+
+    @patch("app.enrichment.fetch_page")
+    def test_enrichment_invalidates_watchlist_etag(self, fetch_page):
+        fetch_page.return_value = BeautifulSoup(FILM_PAGE, "html.parser")
+        etag = self.client.get("/api/users/alice/movies").headers["ETag"]
+        enrich_movies()
+        response = self.client.get(
+            "/api/users/alice/movies", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["movies"][0]["year"], 1999)
+
+    @patch("app.enrichment.fetch_page")
+    def test_enrichment_invalidates_cached_comparison(self, fetch_page):
+        fetch_page.return_value = BeautifulSoup(FILM_PAGE, "html.parser")
+        usernames = {"usernames": ["alice", "bob"]}
+        before = self.client.post("/api/compare", json=usernames).json
+        self.assertIsNone(before["movies"]["2"][0]["year"])
+        enrich_movies()
+        after = self.client.post("/api/compare", json=usernames).json
+        self.assertEqual(after["movies"]["2"][0]["year"], 1999)
+
+    @patch("app.enrichment.fetch_page")
+    def test_failed_refresh_keeps_metadata(self, fetch_page):
+        fetch_page.return_value = BeautifulSoup(FILM_PAGE, "html.parser")
+        enrich_movies()
+        version = redis_client.get(METADATA_VERSION_KEY)
+        stale = datetime.now(timezone.utc) - timedelta(days=31)
+        db.session.get(Movie, 1).enriched_at = stale
+        db.session.commit()
+
+        fetch_page.return_value = None
+        self.assertEqual(enrich_movies(), 1)
+        movie = db.session.get(Movie, 1)
+        self.assertEqual((movie.year, movie.runtime), (1999, 136))
+        self.assertEqual(movie.poster_url, "https://a.ltrbxd.com/poster.jpg")
+        self.assertGreater(movie.enriched_at.replace(tzinfo=timezone.utc), stale)
+        # Nothing visible changed, so cached pages stay valid
+        self.assertEqual(redis_client.get(METADATA_VERSION_KEY), version)
@@ -0,0 +1,109 @@
+# test_export.py
+import csv
+import gzip
+import io
+import json
+from flask_testing import TestCase
+from app import create_app
+from app.extensions import db, limiter
+from app.models import Movie, User, UserMovie
+from config import TestingConfig
+
+TOKEN = "s3cret"
+
+
+class TestExport(TestCase):
+    def create_app(self):
+        app = create_app(TestingConfig)
+        app.config["EXPORT_BATCH_SIZE"] = 2
+        app.config["EXPORT_TOKEN"] = TOKEN
+        return app
+
+    def setUp(self):
+        # /api/export allows 6 requests a minute, fewer than these tests make
+        limiter.reset()
+        db.create_all()
+        db.session.add_all(
+            Movie(id=i, title=f"Film, {i}", slug=f"Film {i}") for i in range(1, 5)
+        )
+        alice = User(username="alice")
+        bob = User(username="bob", active_generation=1)
+        db.session.add_all([alice, bob])
+        db.session.flush()
+        db.session.add_all(
+            [
+                UserMovie(user_id=alice.id, movie_id=1),
+                UserMovie(user_id=alice.id, movie_id=2),
+                UserMovie(user_id=bob.id, movie_id=3, generation=1),
+                # Superseded generation, not exported
+                UserMovie(user_id=bob.id, movie_id=4, generation=0),
+            ]
+        )
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def export(self, query, token=TOKEN):
+        headers = {"X-Export-Token": token}
+        return self.client.get(f"/api/export?{query}", headers=headers)
+
+    def test_csv_export(self):
+        response = self.export("username=alice&username=bob")
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, "text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual(
+            [(row["username"], row["movie_id"]) for row in rows],
+            [("alice", "1"), ("alice", "2"), ("bob", "3")],
+        )
+        self.assertEqual(rows[0]["title"], "Film, 1")
+
+    def test_jsonl_export_for_selected_users(self):
+        response = self.export("format=jsonl&username=bob")
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual([json.loads(line)["movie_id"] for line in lines], ["3"])
+
+    def test_gzip_export_is_a_gzip_file(self):
+        response = self.export("format=jsonl&compress=gzip&username=alice")
+        self.assertEqual(response.mimetype, "application/gzip")
+        self.assertIn("watchlists.jsonl.gz", response.headers["Content-Disposition"])
+        lines = gzip.decompress(response.get_data()).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+
+    def test_output_is_streamed_in_chunks(self):
+        self.app.config["EXPORT_CHUNK_SIZE"] = 1
+        response = self.export("username=alice&username=bob")
+        chunks = list(response.response)
+        # One chunk per row (the header goes out with the first)
+        self.assertEqual(len(chunks), 3)
+
+    def test_unknown_format_is_rejected(self):
+        response = self.export("format=xml&username=alice")
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_requires_export_token(self):
+        self.assertEqual(self.export("username=alice", token="").status_code, 403)
+        self.assertEqual(self.export("username=alice", token="wrong").status_code, 403)
+        self.app.config["EXPORT_TOKEN"] = None
+        self.assertEqual(self.export("username=alice").status_code, 403)
+
+    def test_profiling_token_does_not_unlock_export(self):
+        self.app.config["PROFILING_TOKEN"] = "profiler"
+        response = self.client.get(
+            "/api/export?username=alice", headers={"X-Profile-Token": "profiler"}
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_export_requires_bounded_usernames(self):
+        self.assertEqual(self.export("format=csv").status_code, 400)
+        self.app.config["EXPORT_MAX_USERS"] = 1
+        self.assertEqual(self.export("username=alice&username=bob").status_code, 400)
+
+    def test_cli_export(self):
+        result = self.app.test_cli_runner().invoke(
+            args=["export-watchlists", "alice", "--format", "jsonl"]
+        )
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(len(result.stdout_bytes.splitlines()), 2)
@@ -0,0 +1,219 @@
+# test_generations.py
+from unittest.mock import patch
+from flask_testing import TestCase
+from redis.exceptions import RedisError
+from app import create_app
+from app.changes import get_movie_ids
+from app.extensions import db, limiter, redis_client
+from app.models import User, UserMovie
+from app.services import (
+    SYNC_LOCK_KEY,
+    SYNC_VERSION_KEY,
+    SyncInProgress,
+    SyncLease,
+    acquire_sync_lock,
+    prune_generations,
+    release_sync_lock,
+    sync_user,
+    user_details,
+)
+from config import TestingConfig
+from tests.helpers import films, watchlist_soup
+
+PAGE_2 = "https://letterboxd.com/alice/watchlist/page/2/"
+
+
+class TestGenerations(TestCase):
+    def create_app(self):
+        return create_app(TestingConfig)
+
+    def setUp(self):
+        limiter.reset()
+        redis_client.delete(SYNC_VERSION_KEY.format(username="alice"))
+        db.create_all()
+        db.session.add(User(username="alice"))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def user(self):
+        return User.query.filter_by(username="alice").one()
+
+    def sync(self, *ids):
+        with patch("app.services.fetch_page", return_value=watchlist_soup(films(*ids))):
+            sync_user(self.user())
+
+    def two_pages(self, first, second):
+        """fetch_page stand-in serving two pages; `second` may be a callable."""
+
+        def fetch(url):
+            if url == PAGE_2:
+                return second() if callable(second) else second
+            return watchlist_soup(films(*first), next_page="/alice/watchlist/page/2/")
+
+        return fetch
+
+    def served_ids(self):
+        response = self.client.get("/api/users/alice/movies")
+        return [movie["id"] for movie in response.json["movies"]]
+
+    def test_readers_see_previous_snapshot_during_sync(self):
+        self.sync(1, 2)
+        seen = []
+
+        def page_2():
+            # Page 1 of the new generation is committed by now
+            seen.append(self.served_ids())
+            return watchlist_soup(films(4))
+
+        with patch("app.services.fetch_page", side_effect=self.two_pages([3], page_2)):
+            sync_user(self.user())
+        self.assertEqual(seen, [["1", "2"]])
+        self.assertEqual(self.served_ids(), ["3", "4"])
+        self.assertEqual(self.user().active_generation, 2)
+
+    def test_old_generation_removed_after_sync(self):
+        self.sync(1, 2)
+        self.sync(2, 3)
+        # The replaced generation outlives the switch for in-flight readers
+        rows = UserMovie.query.all()
+        self.assertEqual({row.generation for row in rows}, {1, 2})
+        self.sync(3, 4)
+        rows = UserMovie.query.all()
+        self.assertEqual({row.generation for row in rows}, {2, 3})
+        self.assertEqual(
+            sorted(row.movie_id for row in rows if row.generation == 3), [3, 4]
+        )
+
+    def test_failed_sync_keeps_active_snapshot(self):
+        self.sync(1, 2)
+
+        def fail():
+            raise RuntimeError("connection dropped")
+
+        with patch("app.services.fetch_page", side_effect=self.two_pages([3], fail)):
+            with self.assertRaises(RuntimeError):
+                sync_user(self.user())
+        db.session.rollback()
+        user = self.user()
+        self.assertEqual(user.active_generation, 1)
+        self.assertEqual(get_movie_ids(user), {1, 2})
+        self.assertEqual((user.sync_cursor, user.sync_pages), (PAGE_2, 1))
+
+        # The next sync resumes at the page that failed
+        with patch("app.services.fetch_page", side_effect=self.two_pages([], lambda: watchlist_soup(films(4)))):
+            sync_user(self.user())
+        self.assertEqual(get_movie_ids(self.user()), {3, 4})
+
+    def test_stale_sync_starts_over(self):
+        self.sync(1, 2)
+        with patch("app.services.fetch_page", side_effect=self.two_pages([3], None)):
+            sync_user(self.user())
+        user = self.user()
+        self.assertEqual(user.sync_cursor, PAGE_2)
+        user.sync_started_at -= self.app.config["SYNC_RESUME_WINDOW"]
+        db.session.commit()
+
+        # The abandoned partial generation is discarded
+        self.sync(5)
+        self.assertEqual(get_movie_ids(self.user()), {5})
+        rows = UserMovie.query.filter(UserMovie.generation == 2).all()
+        self.assertEqual([row.movie_id for row in rows], [5])
+
+    def test_large_watchlist_synced_in_chunks(self):
+        self.app.config["SYNC_PAGES_PER_CHUNK"] = 2
+
+        def fetch(url):
+            page = int(url.rstrip("/").split("/")[-1]) if "page" in url else 1
+            next_page = f"/alice/watchlist/page/{page + 1}/" if page < 5 else None
+            return watchlist_soup(films(page * 10, page * 10 + 1), next_page=next_page)
+
+        details = []
+        with patch("app.services.fetch_page", side_effect=fetch):
+            for _ in range(3):
+                sync_user(self.user())
+                details.append(user_details(self.user()))
+        progress = [
+            (d["sync_in_progress"], d["sync_pages_done"], d["watchlist_complete"])
+            for d in details
+        ]
+        self.assertEqual(progress, [(True, 2, False), (True, 4, False), (False, 0, True)])
+        # Readers only see the new watchlist once the last page is saved
+        self.assertEqual([d["movie_count"] for d in details], [0, 0, 10])
+
+    def test_sync_response_reports_unfinished_chunks(self):
+        self.app.config["SYNC_PAGES_PER_CHUNK"] = 1
+        fetch = self.two_pages([1], lambda: watchlist_soup(films(2)))
+        results = []
+        with patch("app.services.fetch_page", side_effect=fetch):
+            for _ in range(2):
+                response = self.client.post("/api/sync", json={"usernames": ["alice"]})
+                results.append(response.json["alice"]["data"])
+        self.assertEqual(
+            [(r["synced"], r["user"]["sync_in_progress"]) for r in results],
+            [(False, True), (True, False)],
+        )
+
+    def test_sync_stops_at_page_cap(self):
+        self.app.config["SYNC_MAX_PAGES"] = 1
+        with patch("app.services.fetch_page", side_effect=self.two_pages([1], lambda: watchlist_soup(films(2)))):
+            sync_user(self.user())
+        user = self.user()
+        self.assertEqual(get_movie_ids(user), {1})
+        self.assertFalse(user.watchlist_complete)
+        self.assertIsNone(user.sync_cursor)
+
+    def test_prune_keeps_previous_and_unpublished_generations(self):
+        self.sync(1)
+        self.sync(1)
+        user = self.user()
+        db.session.add_all(
+            [
+                UserMovie(user_id=user.id, movie_id=1, generation=0),
+                UserMovie(user_id=user.id, movie_id=1, generation=3),
+            ]
+        )
+        db.session.commit()
+        self.assertEqual(prune_generations(), 1)
+        generations = sorted(row.generation for row in UserMovie.query.all())
+        self.assertEqual(generations, [1, 2, 3])
+
+    def test_concurrent_sync_is_rejected(self):
+        user = self.user()
+        lock = redis_client.lock(SYNC_LOCK_KEY.format(user_id=user.id), timeout=10)
+        self.assertTrue(lock.acquire(blocking=False))
+        try:
+            with self.assertRaises(SyncInProgress):
+                sync_user(user)
+            response = self.client.post("/api/sync", json={"usernames": ["alice"]})
+            self.assertEqual(
+                response.json["alice"]["error"], "Sync already in progress"
+            )
+        finally:
+            lock.release()
+
+    def test_database_lease_while_redis_unavailable(self):
+        with patch.object(redis_client, "lock", side_effect=RedisError("down")):
+            lease = acquire_sync_lock(self.user())
+            self.assertIsInstance(lease, SyncLease)
+            self.assertFalse(acquire_sync_lock(self.user()))
+            with self.assertRaises(SyncInProgress):
+                sync_user(self.user())
+            release_sync_lock(lease)
+
+            self.sync(1, 2)
+        self.assertEqual(self.user().active_generation, 1)
+        self.assertIsNone(self.user().sync_locked_until)
+
+    def test_expired_lease_can_be_taken_over(self):
+        with patch.object(redis_client, "lock", side_effect=RedisError("down")):
+            self.app.config["SYNC_LOCK_TIMEOUT"] = -1
+            stale = acquire_sync_lock(self.user())
+            self.app.config["SYNC_LOCK_TIMEOUT"] = 600
+            lease = acquire_sync_lock(self.user())
+            self.assertIsInstance(lease, SyncLease)
+            # Releasing the expired lease leaves the new holder's alone
+            release_sync_lock(stale)
+            self.assertFalse(acquire_sync_lock(self.user()))
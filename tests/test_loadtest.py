@@ -0,0 +1,48 @@
+# test_loadtest.py
+import os
+import tempfile
+import unittest
+import requests
+from loadtest.harness import main, percentile
+from loadtest.stub_letterboxd import StubSettings, start_stub_server
+
+
+class TestLoadTest(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 95), None)
+
+    def test_stub_serves_paged_watchlists(self):
+        server, url = start_stub_server(StubSettings(latency=0, jitter=0, pages=2))
+        try:
+            first = requests.get(f"{url}/someone/watchlist/")
+            self.assertEqual(first.status_code, 200)
+            self.assertIn("/someone/watchlist/page/2/", first.text)
+            last = requests.get(f"{url}/someone/watchlist/page/2/")
+            self.assertNotIn('class="next"', last.text)
+            missing = requests.get(f"{url}/missing_user/watchlist/")
+            self.assertEqual(missing.status_code, 404)
+        finally:
+            server.shutdown()
+
+    def test_short_mixed_run(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = f"sqlite:///{os.path.join(directory, 'load.db')}"
+            report = main(
+                [
+                    "--duration", "1",
+                    "--rate", "search=10",
+                    "--rate", "find=2",
+                    "--rate", "sync=2",
+                    "--stub-latency", "0.01",
+                    "--stub-jitter", "0",
+                    "--database", database,
+                    "--json",
+                ]
+            )
+        self.assertEqual(set(report), {"search", "find", "sync"})
+        self.assertEqual(report["search"]["completed"], report["search"]["sent"])
+        self.assertEqual(report["search"]["statuses"], {"200": report["search"]["sent"]})
+        self.assertIsNotNone(report["sync"]["p99"])
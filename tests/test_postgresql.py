@@ -0,0 +1,171 @@
+# test_postgresql.py
+import os
+import pytest
+from flask_migrate import downgrade, stamp, upgrade
+from flask_testing import TestCase
+from sqlalchemy import make_url, text
+from sqlalchemy.exc import IntegrityError
+from app import create_app
+from app.extensions import db
+from app.models import Movie
+from app.search import search_movies
+from app.services import insert_ignoring_duplicates
+from config import Config, TestingConfig
+
+# These tests drop every table. They only run against TEST_DATABASE_URL (CI sets
+# it for its PostgreSQL service), never DATABASE_URL, which holds the app's own
+# database, and only when the database name says it is a test database.
+POSTGRES_URL = Config.prepare_database_uri("TEST_DATABASE_URL")
+
+
+def is_test_database(url):
+    if not url.startswith("postgresql"):
+        return False
+    return "test" in (make_url(url).database or "")
+
+
+# A pytest mark: flask_testing creates the app before unittest's skip is checked
+requires_postgresql = pytest.mark.skipif(
+    not is_test_database(POSTGRES_URL),
+    reason="TEST_DATABASE_URL is not a PostgreSQL test database",
+)
+
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations")
+# The revision after it recreates every table, so an empty database stamped
+# here upgrades to the current schema
+BASELINE_REVISION = "1d421979ce01"
+INTEGER_IDS_REVISION = "7b3e5f0a9c12"
+BEFORE_INTEGER_IDS = "e4a7c2d91b58"
+MOVIE_ID_COLUMNS = [
+    ("movie", "id"),
+    ("user_movie", "movie_id"),
+    ("user_movie_change", "movie_id"),
+]
+
+
+class PostgresTestingConfig(TestingConfig):
+    SQLALCHEMY_DATABASE_URI = POSTGRES_URL
+
+
+@requires_postgresql
+class TestPostgresSearch(TestCase):
+    def create_app(self):
+        return create_app(PostgresTestingConfig)
+
+    def setUp(self):
+        db.drop_all()
+        db.create_all()
+        titles = {1: "Amélie", 2: "The Thing", 3: "Crème brûlée"}
+        db.session.add_all(
+            Movie(id=id, title=title, slug=title) for id, title in titles.items()
+        )
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def search(self, query):
+        return [movie.id for movie in search_movies(query.split())]
+
+    def test_diacritics_and_case_are_ignored(self):
+        self.assertEqual(self.search("amelie"), [1])
+        self.assertEqual(self.search("amélie"), [1])
+        self.assertEqual(self.search("creme brul"), [3])
+
+    def test_search_uses_title_index(self):
+        db.session.execute(text("SET LOCAL enable_seqscan = off"))
+        search_movies(["amelie"])
+        config = "'simple_unaccent'::regconfig"
+        plan = db.session.execute(
+            text(
+                f"EXPLAIN SELECT id FROM movie WHERE to_tsvector({config}, title) "
+                f"@@ to_tsquery({config}, 'amelie:*')"
+            )
+        ).scalars()
+        self.assertIn("ix_movie_title_fts", "\n".join(plan))
+
+    def test_insert_ignoring_duplicates(self):
+        rows = [
+            {"id": 1, "title": "Changed", "slug": "Changed"},
+            {"id": 4, "title": "New", "slug": "New"},
+        ]
+        db.session.execute(insert_ignoring_duplicates(Movie), rows)
+        db.session.commit()
+        self.assertEqual(db.session.get(Movie, 1).title, "Amélie")
+        self.assertEqual(db.session.get(Movie, 4).title, "New")
+
+
+@requires_postgresql
+class TestPostgresMigrations(TestCase):
+    def create_app(self):
+        return create_app(PostgresTestingConfig)
+
+    def setUp(self):
+        self.reset_schema()
+        stamp(MIGRATIONS, BASELINE_REVISION)
+        upgrade(MIGRATIONS, BEFORE_INTEGER_IDS)
+
+    def tearDown(self):
+        self.reset_schema()
+
+    def reset_schema(self):
+        db.session.remove()
+        with db.engine.begin() as connection:
+            connection.execute(text("DROP SCHEMA public CASCADE"))
+            connection.execute(text("CREATE SCHEMA public"))
+
+    def execute(self, statement):
+        with db.engine.begin() as connection:
+            connection.execute(text(statement))
+
+    def rows(self, query):
+        with db.engine.connect() as connection:
+            return connection.execute(text(query)).all()
+
+    def movie_id_types(self):
+        return {
+            column: self.rows(
+                "SELECT data_type FROM information_schema.columns "
+                f"WHERE table_name = '{table}' AND column_name = '{column}'"
+            )[0][0]
+            for table, column in MOVIE_ID_COLUMNS
+        }
+
+    def test_integer_movie_ids_upgrade_and_downgrade(self):
+        self.execute(
+            "INSERT INTO movie (id, title, slug) VALUES "
+            "('1', 'One', 'one'), ('22', 'Two', 'two'), ('tt-3', 'Bad', 'bad')"
+        )
+        self.execute("""INSERT INTO "user" (id, username) VALUES (1, 'alice')""")
+        self.execute(
+            "INSERT INTO user_movie (user_id, movie_id) VALUES (1, '1'), (1, 'tt-3')"
+        )
+        self.execute(
+            "INSERT INTO user_movie_change (user_id, movie_id, change) "
+            "VALUES (1, '22', 'added'), (1, 'tt-3', 'added')"
+        )
+
+        upgrade(MIGRATIONS, INTEGER_IDS_REVISION)
+        self.assertEqual(set(self.movie_id_types().values()), {"integer"})
+        # Rows with ids that are not Letterboxd's numeric ones are dropped
+        self.assertEqual(self.rows("SELECT id FROM movie ORDER BY id"), [(1,), (22,)])
+        self.assertEqual(self.rows("SELECT movie_id FROM user_movie"), [(1,)])
+        self.assertEqual(self.rows("SELECT movie_id FROM user_movie_change"), [(22,)])
+        with self.assertRaises(IntegrityError):
+            self.execute("INSERT INTO user_movie (user_id, movie_id) VALUES (1, 99)")
+
+        downgrade(MIGRATIONS, BEFORE_INTEGER_IDS)
+        self.assertEqual(set(self.movie_id_types().values()), {"character varying"})
+        self.assertEqual(
+            self.rows("SELECT id FROM movie ORDER BY id"), [("1",), ("22",)]
+        )
+        index = "SELECT 1 FROM pg_indexes WHERE indexname = 'ix_user_movie_movie_user'"
+        self.assertEqual(self.rows(index), [])
+        with self.assertRaises(IntegrityError):
+            self.execute("INSERT INTO user_movie (user_id, movie_id) VALUES (1, '99')")
+
+        upgrade(MIGRATIONS)
+        self.assertEqual(set(self.movie_id_types().values()), {"integer"})
+        self.assertEqual(self.rows("SELECT movie_id FROM user_movie"), [(1,)])
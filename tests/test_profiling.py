@@ -0,0 +1,84 @@
+# test_profiling.py
+import marshal
+from flask_testing import TestCase
+from app import create_app
+from app.extensions import db
+from app.profiling import start_profiling
+from config import TestingConfig
+
+TOKEN = "secret-token"
+
+
+class ProfilingConfig(TestingConfig):
+    PROFILING_TOKEN = TOKEN
+    PROFILING_BUFFER_SIZE = 5
+
+
+class TestProfiling(TestCase):
+    def create_app(self):
+        app = create_app(ProfilingConfig)
+        app.config["TESTING"] = True
+        return app
+
+    def setUp(self):
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def admin_get(self, url, token=TOKEN):
+        return self.client.get(url, headers={"X-Profile-Token": token})
+
+    def test_header_profiles_request(self):
+        self.client.post(
+            "/api/search",
+            json={"usernames": ["evilnik"]},
+            headers={"X-Profile-Token": TOKEN},
+        )
+        profiles = self.admin_get("/api/admin/profiles").json["profiles"]
+        self.assertEqual(len(profiles), 1)
+        self.assertEqual(profiles[0]["path"], "/api/search")
+        self.assertEqual(profiles[0]["status"], 200)
+        self.assertEqual(profiles[0]["reason"], "header")
+
+        download = self.admin_get(f"/api/admin/profiles/{profiles[0]['id']}")
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(marshal.loads(download.data))
+        text = self.admin_get(f"/api/admin/profiles/{profiles[0]['id']}?format=text")
+        self.assertIn("function calls", text.get_data(as_text=True))
+
+    def test_requests_without_header_not_profiled(self):
+        self.client.post("/api/search", json={"usernames": ["evilnik"]})
+        self.client.post(
+            "/api/search",
+            json={"usernames": ["evilnik"]},
+            headers={"X-Profile-Token": "wrong"},
+        )
+        self.assertEqual(self.admin_get("/api/admin/profiles").json["profiles"], [])
+
+    def test_non_ascii_header_rejected(self):
+        response = self.client.get("/api/", headers={"X-Profile-Token": "t\u00f6ken"})
+        self.assertEqual(response.status_code, 200)
+        response = self.admin_get("/api/admin/profiles", token="t\u00f6ken")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.admin_get("/api/admin/profiles").json["profiles"], [])
+
+    def test_buffer_is_bounded(self):
+        for _ in range(8):
+            self.client.get("/api/", headers={"X-Profile-Token": TOKEN})
+        self.assertEqual(len(self.admin_get("/api/admin/profiles").json["profiles"]), 5)
+
+    def test_admin_requires_token(self):
+        self.assertEqual(self.admin_get("/api/admin/profiles", token="").status_code, 403)
+        self.assertEqual(self.admin_get("/api/admin/profiles/unknown").status_code, 404)
+
+
+class TestProfilingDisabled(TestCase):
+    def create_app(self):
+        return create_app(TestingConfig)
+
+    def test_no_hooks_installed(self):
+        self.assertNotIn(start_profiling, self.app.before_request_funcs.get(None, []))
+        response = self.client.get("/api/admin/profiles")
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,78 @@
+# test_query_budgets.py
+from unittest.mock import patch
+import pytest
+from app import create_app
+from app.extensions import db, redis_client
+from app.models import User
+from app.querycount import QueryBudgetExceeded, assert_max_queries
+from app.services import SYNC_VERSION_KEY, sync_user
+from config import TestingConfig
+from tests.helpers import films, watchlist_soup
+
+# Statement budgets per endpoint. Lower them when a query pattern improves;
+# raising one should come with a reason in the commit that does it.
+SEARCH_QUERIES_PER_USERNAME = 3
+WATCHLIST_PAGE_QUERIES = 3
+WATCHLIST_NOT_MODIFIED_QUERIES = 0
+# Includes saving the sync cursor, reloading the user after each commit,
+# replacing the similarity buckets and pruning the old generation
+SYNC_BASE_QUERIES = 15
+# Each page bulk-inserts its films and user_movie rows, whatever their number
+SYNC_QUERIES_PER_FILM = 0
+
+
+class BudgetConfig(TestingConfig):
+    QUERY_COUNT_HEADER = True
+
+
+@pytest.fixture
+def app():
+    app = create_app(BudgetConfig)
+    with app.app_context():
+        redis_client.delete(SYNC_VERSION_KEY.format(username="alice"))
+        db.create_all()
+        db.session.add(User(username="alice"))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def sync(user, film_count):
+    soup = watchlist_soup(films(*range(film_count)))
+    with patch("app.services.fetch_page", return_value=soup):
+        sync_user(user)
+
+
+@pytest.mark.parametrize("usernames", [["alice"], ["alice", "bob", "carol"]])
+def test_search_budget(app, usernames):
+    response = app.test_client().post("/api/search", json={"usernames": usernames})
+    budget = SEARCH_QUERIES_PER_USERNAME * len(usernames)
+    assert int(response.headers["X-Query-Count"]) <= budget
+
+
+def test_watchlist_page_budget(app):
+    sync(User.query.filter_by(username="alice").one(), 20)
+    client = app.test_client()
+    response = client.get("/api/users/alice/movies?limit=5")
+    assert int(response.headers["X-Query-Count"]) <= WATCHLIST_PAGE_QUERIES
+    response = client.get(
+        "/api/users/alice/movies?limit=5",
+        headers={"If-None-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == 304
+    assert int(response.headers["X-Query-Count"]) <= WATCHLIST_NOT_MODIFIED_QUERIES
+
+
+@pytest.mark.parametrize("film_count", [10, 50])
+def test_sync_budget(app, query_budget, film_count):
+    user = User.query.filter_by(username="alice").one()
+    with query_budget(SYNC_BASE_QUERIES + SYNC_QUERIES_PER_FILM * film_count):
+        sync(user, film_count)
+
+
+def test_budget_failure_lists_statements(app, query_counter):
+    with pytest.raises(QueryBudgetExceeded, match="budget is 0"):
+        with assert_max_queries(0):
+            User.query.all()
+    assert query_counter.count == 1
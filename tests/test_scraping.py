@@ -0,0 +1,197 @@
+# test_scraping.py
+import asyncio
+from unittest.mock import MagicMock, patch
+from flask_testing import TestCase
+import httpx
+import requests
+from app import create_app
+from app.extensions import db
+from app.models import Movie, User
+from app.scraping import (
+    FILM,
+    NEXT_PAGE,
+    PAGE_DONE,
+    ScrapedFilm,
+    WatchlistParser,
+    decode_films,
+    encode_films,
+    parse_films,
+    stream_page,
+    stream_page_async,
+)
+from app.services import sync_user
+from config import TestingConfig
+from tests.helpers import films, watchlist_html, watchlist_soup
+
+PAGE = watchlist_html(films(1, 2, 3), next_page="/alice/watchlist/page/2/")
+
+
+def streamed_response(html, chunk_size=7):
+    """Fake streaming response that hands the body out in small chunks."""
+    body = html.encode()
+    response = MagicMock()
+    response.encoding = "utf-8"
+    response.chunks_read = 0
+
+    def iter_content(size):
+        for i in range(0, len(body), chunk_size):
+            response.chunks_read += 1
+            yield body[i : i + chunk_size]
+
+    response.iter_content.side_effect = iter_content
+    return response
+
+
+class TestWatchlistParser(TestCase):
+    def create_app(self):
+        return create_app(TestingConfig)
+
+    def test_events_survive_arbitrary_chunk_boundaries(self):
+        parser = WatchlistParser()
+        events = []
+        for i in range(0, len(PAGE), 5):
+            parser.feed(PAGE[i : i + 5])
+            events += parser.pop_events()
+        parser.close()
+        events += parser.pop_events()
+        self.assertEqual(
+            [film.id for kind, film in events if kind == FILM],
+            [1, 2, 3],
+        )
+        self.assertEqual(events[-1], (NEXT_PAGE, "/alice/watchlist/page/2/"))
+
+    def test_films_yielded_before_page_finishes(self):
+        response = streamed_response(PAGE)
+        with patch("requests.get", return_value=response):
+            events = stream_page("https://letterboxd.com/alice/watchlist/")
+            kind, film = next(events)
+            self.assertEqual((kind, film), (FILM, ScrapedFilm(1, "Film 1", "film-1")))
+            # The first film arrives after only part of the body has been read
+            total_chunks = -(-len(PAGE.encode()) // 7)
+            self.assertLess(response.chunks_read, total_chunks / 2)
+            self.assertEqual(list(events)[-1], (PAGE_DONE, None))
+            self.assertEqual(response.chunks_read, total_chunks)
+        response.close.assert_called_once()
+
+    def test_failed_request_yields_nothing(self):
+        with patch("requests.get", side_effect=requests.ConnectionError("down")):
+            self.assertEqual(list(stream_page("https://x/", delay=0)), [])
+
+    def stream_async(self, handler):
+        async def collect():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                url = "https://letterboxd.com/alice/watchlist/"
+                return [event async for event in stream_page_async(client, url, delay=0)]
+
+        return asyncio.run(collect())
+
+    def test_async_stream_parses_chunked_body(self):
+        async def chunks():
+            body = PAGE.encode()
+            for i in range(0, len(body), 7):
+                yield body[i : i + 7]
+
+        events = self.stream_async(lambda request: httpx.Response(200, content=chunks()))
+        self.assertEqual([film.id for kind, film in events if kind == FILM], [1, 2, 3])
+        self.assertEqual(events[-2:], [(NEXT_PAGE, "/alice/watchlist/page/2/"), (PAGE_DONE, None)])
+
+    def test_async_stream_cut_short_is_not_done(self):
+        async def chunks():
+            yield PAGE.encode()[:100]
+            raise httpx.ReadError("connection reset")
+
+        events = self.stream_async(lambda request: httpx.Response(200, content=chunks()))
+        self.assertNotIn((PAGE_DONE, None), events)
+        self.assertEqual(self.stream_async(lambda request: httpx.Response(404)), [])
+
+
+class TestScrapedFilms(TestCase):
+    def create_app(self):
+        return create_app(TestingConfig)
+
+    def setUp(self):
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def test_parse_films_returns_plain_records(self):
+        parsed = parse_films(watchlist_soup(films(1, 2)))
+        self.assertEqual(
+            parsed,
+            [ScrapedFilm(1, "Film 1", "film-1"), ScrapedFilm(2, "Film 2", "film-2")],
+        )
+
+    def test_posters_without_numeric_ids_are_skipped(self):
+        parsed = parse_films(watchlist_soup(films(1, "x2", "") + films(3)))
+        self.assertEqual([film.id for film in parsed], [1, 3])
+
+    def test_serialization_round_trip(self):
+        records = [ScrapedFilm(1, "Amélie", "amelie"), ScrapedFilm(2, 'A "B"', "a-b")]
+        self.assertEqual(decode_films(encode_films(records)), records)
+        with self.assertRaises(ValueError):
+            decode_films(b'{"v": 0, "films": []}')
+
+    def test_malformed_payloads_raise_value_error(self):
+        for payload in [
+            b"not json",
+            b'{"v": 2}',
+            b'{"v": 2, "films": 5}',
+            b'{"v": 2, "films": [1]}',
+            b'{"v": 2, "films": [[1, "Film"]]}',
+            b'{"v": 2, "films": [["1", "Film", "film"]]}',
+            b'{"v": 2, "films": [[1, null, "film"]]}',
+        ]:
+            with self.subTest(payload=payload), self.assertRaises(ValueError):
+                decode_films(payload)
+
+    def test_sync_keeps_known_films_and_skips_repeats(self):
+        db.session.add(Movie(id=1, title="Known", slug="Known", year=1999))
+        user = User(username="alice")
+        db.session.add(user)
+        db.session.commit()
+        # Film 2 shifted onto page 2 while the watchlist was scraped
+        pages = {
+            "https://letterboxd.com/alice/watchlist/": watchlist_soup(
+                films(1, 2), next_page="/alice/watchlist/page/2/"
+            ),
+            "https://letterboxd.com/alice/watchlist/page/2/": watchlist_soup(films(2, 3)),
+        }
+        with patch("app.services.fetch_page", side_effect=pages.get):
+            sync_user(user)
+        self.assertEqual(
+            sorted(user_movie.movie_id for user_movie in user.movies), [1, 2, 3]
+        )
+        known = db.session.get(Movie, 1)
+        self.assertEqual((known.title, known.year), ("Known", 1999))
+
+
+class TestStreamingSync(TestCase):
+    def create_app(self):
+        app = create_app(TestingConfig)
+        app.config["SCRAPE_STREAMING"] = True
+        return app
+
+    def setUp(self):
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def test_sync_follows_streamed_pages(self):
+        user = User(username="alice")
+        db.session.add(user)
+        db.session.commit()
+        pages = {
+            "https://letterboxd.com/alice/watchlist/": PAGE,
+            "https://letterboxd.com/alice/watchlist/page/2/": watchlist_html(films(4)),
+        }
+        with patch(
+            "requests.get", side_effect=lambda url, **kwargs: streamed_response(pages[url])
+        ):
+            sync_user(user)
+        self.assertEqual(
+            sorted(user_movie.movie_id for user_movie in user.movies), [1, 2, 3, 4]
+        )
@@ -0,0 +1,81 @@
+# test_search.py
+from flask_testing import TestCase
+from app import create_app
+from app.extensions import db
+from app.models import Movie, User, UserMovie
+from config import TestingConfig
+
+TITLES = {
+    1: "The Thing",
+    2: "Things to Come",
+    3: "Thief",
+    4: "Everything Everywhere All at Once",
+    5: "Amélie",
+}
+
+
+class TestMovieSearch(TestCase):
+    def create_app(self):
+        return create_app(TestingConfig)
+
+    def setUp(self):
+        db.create_all()
+        db.session.add_all(
+            Movie(id=id, title=title, slug=title) for id, title in TITLES.items()
+        )
+        alice = User(username="alice")
+        bob = User(username="bob", active_generation=2)
+        db.session.add_all([alice, bob])
+        db.session.flush()
+        db.session.add_all(
+            [
+                UserMovie(user_id=alice.id, movie_id=1),
+                UserMovie(user_id=bob.id, movie_id=1, generation=2),
+                # Superseded generation: not on bob's watchlist any more
+                UserMovie(user_id=bob.id, movie_id=2, generation=1),
+            ]
+        )
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def search(self, query, **kwargs):
+        response = self.client.post(
+            "/api/movies/search", json={"query": query, **kwargs}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json["movies"]
+
+    def test_prefix_matches_whole_words_only(self):
+        ids = sorted(movie["id"] for movie in self.search("thi"))
+        # "Everything" contains "thi" but no word starts with it
+        self.assertEqual(ids, ["1", "2", "3"])
+
+    def test_every_term_must_match(self):
+        self.assertEqual([m["id"] for m in self.search("thing come")], ["2"])
+
+    def test_ranks_closer_matches_first(self):
+        db.session.get(Movie, 3).title = "Thing Thing Thing"
+        db.session.commit()
+        self.assertEqual(self.search("thing")[0]["id"], "3")
+
+    def test_diacritics_and_case_are_ignored(self):
+        self.assertEqual([m["id"] for m in self.search("AMELIE")], ["5"])
+
+    def test_lists_requested_users_with_each_film(self):
+        movies = self.search("thing", usernames=["alice", "bob", "carol"])
+        users = {movie["id"]: movie["users"] for movie in movies}
+        self.assertEqual(users, {"1": ["alice", "bob"], "2": []})
+
+    def test_title_changes_are_indexed(self):
+        db.session.get(Movie, 4).title = "Zardoz"
+        db.session.delete(db.session.get(Movie, 3))
+        db.session.commit()
+        self.assertEqual([m["id"] for m in self.search("zar")], ["4"])
+        self.assertEqual(self.search("thief"), [])
+
+    def test_query_without_words_is_rejected(self):
+        response = self.client.post("/api/movies/search", json={"query": "*:&"})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,83 @@
+# test_similarity.py
+import random
+from unittest.mock import patch
+from flask_testing import TestCase
+from app import create_app
+from app.extensions import db
+from app.models import SimilarityBucket, User
+from app.services import sync_user
+from app.similarity import estimate_similarity, minhash
+from config import TestingConfig
+from tests.helpers import films, watchlist_soup
+
+
+class TestSimilarUsers(TestCase):
+    def create_app(self):
+        return create_app(TestingConfig)
+
+    def setUp(self):
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def sync(self, username, ids):
+        user = User.query.filter_by(username=username).one_or_none()
+        if user is None:
+            user = User(username=username)
+            db.session.add(user)
+            db.session.commit()
+        soup = watchlist_soup(films(*ids))
+        with patch("app.services.fetch_page", return_value=soup):
+            sync_user(user)
+
+    def similar(self, username, **params):
+        return self.client.get(f"/api/users/{username}/similar", query_string=params)
+
+    def test_signatures_estimate_jaccard(self):
+        rng = random.Random(7)
+        pool = [str(i) for i in range(2000)]
+        first = set(rng.sample(pool, 400))
+        second = set(rng.sample(sorted(first), 200)) | set(rng.sample(pool, 200))
+        exact = len(first & second) / len(first | second)
+        estimate = estimate_similarity(minhash(first, 128), minhash(second, 128))
+        self.assertAlmostEqual(estimate, exact, delta=0.1)
+
+    def test_similar_users_ranked_by_exact_jaccard(self):
+        self.sync("alice", range(1, 21))
+        self.sync("bob", range(1, 19))
+        self.sync("carol", range(5, 25))
+        self.sync("dave", range(100, 120))
+        response = self.similar("alice")
+        self.assertEqual(response.status_code, 200)
+        similar = response.json["similar"]
+        self.assertEqual([item["username"] for item in similar], ["bob", "carol"])
+        self.assertEqual(similar[0]["similarity"], 0.9)
+        self.assertEqual(similar[1]["shared_movies"], 16)
+        self.assertEqual(len(self.similar("alice", limit=1).json["similar"]), 1)
+
+    def test_resync_replaces_buckets(self):
+        self.sync("alice", range(1, 21))
+        self.sync("bob", range(1, 21))
+        self.sync("bob", range(200, 220))
+        self.assertEqual(self.similar("alice").json["similar"], [])
+        self.sync("bob", [])
+        bob = User.query.filter_by(username="bob").one()
+        self.assertEqual(SimilarityBucket.query.filter_by(user_id=bob.id).count(), 0)
+
+    def test_unknown_user_and_bad_limit(self):
+        self.assertEqual(self.similar("nobody").status_code, 404)
+        self.sync("alice", [1])
+        self.assertEqual(self.similar("alice", limit="x").status_code, 400)
+
+    def test_rebuild_command(self):
+        self.sync("alice", range(1, 11))
+        self.sync("bob", range(1, 11))
+        SimilarityBucket.query.delete()
+        db.session.commit()
+        result = self.app.test_cli_runner().invoke(args=["index-similarity"])
+        self.assertIn("Indexed 2 users", result.output)
+        self.assertEqual(
+            [item["username"] for item in self.similar("alice").json["similar"]], ["bob"]
+        )
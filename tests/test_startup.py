@@ -0,0 +1,47 @@
+# test_startup.py
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+# Cold-start budget for importing the app and building it with create_app.
+STARTUP_BUDGET_SECONDS = 3.0
+
+STARTUP_SCRIPT = """
+import json, sys, time
+began = time.perf_counter()
+from app import create_app
+from config import TestingConfig
+create_app(TestingConfig)
+print(json.dumps({
+    "seconds": time.perf_counter() - began,
+    "modules": [name for name in ("bs4", "requests", "redis") if name in sys.modules],
+}))
+"""
+
+
+class TestStartup(unittest.TestCase):
+    def measure_startup(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    def test_startup_within_budget(self):
+        result = self.measure_startup()
+        self.assertLess(result["seconds"], STARTUP_BUDGET_SECONDS)
+
+    def test_scraping_modules_imported_lazily(self):
+        result = self.measure_startup()
+        self.assertNotIn("bs4", result["modules"])
+        self.assertNotIn("requests", result["modules"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+# test_upstream.py
+import time
+from unittest.mock import MagicMock, patch
+from flask_testing import TestCase
+import redis
+import requests
+from app import create_app
+from app import upstream
+from app.extensions import db, redis_client
+from app.upstream import UpstreamUnavailable, upstream_get
+from config import TestingConfig
+
+
+class GuardConfig(TestingConfig):
+    UPSTREAM_GUARD = True
+    UPSTREAM_ACQUIRE_TIMEOUT = 0.2
+    UPSTREAM_BREAKER_THRESHOLD = 3
+
+
+def response(status, headers=None):
+    fake = MagicMock(status_code=status, headers=headers or {})
+    if status >= 400:
+        fake.raise_for_status.side_effect = requests.HTTPError(str(status), response=fake)
+    return fake
+
+
+class TestUpstreamGuard(TestCase):
+    def create_app(self):
+        return create_app(GuardConfig)
+
+    def setUp(self):
+        self.clear()
+        db.create_all()
+
+    def tearDown(self):
+        self.clear()
+        db.session.remove()
+        db.drop_all()
+
+    def clear(self):
+        for key in redis_client.scan_iter("upstream:*"):
+            redis_client.delete(key)
+
+    def limit(self):
+        return float(redis_client.get(upstream.LIMIT_KEY))
+
+    def test_retry_after_pauses_every_caller(self):
+        with patch("requests.get", return_value=response(429, {"Retry-After": "30"})):
+            upstream_get("https://letterboxd.com/a/")
+        with patch("requests.get") as get:
+            with self.assertRaises(UpstreamUnavailable) as raised:
+                upstream_get("https://letterboxd.com/b/")
+            get.assert_not_called()
+        self.assertEqual(raised.exception.reason, "blocked")
+        self.assertAlmostEqual(raised.exception.retry_after, 30, delta=1)
+
+    def test_additive_increase_multiplicative_decrease(self):
+        with patch("requests.get", return_value=response(200)):
+            for _ in range(4):
+                upstream_get("https://letterboxd.com/")
+        raised = self.limit()
+        self.assertGreater(raised, 4.5)
+        with patch("requests.get", return_value=response(502)):
+            upstream_get("https://letterboxd.com/")
+            # Failures already in flight count as one congestion signal
+            upstream_get("https://letterboxd.com/")
+        self.assertAlmostEqual(self.limit(), raised / 2)
+
+    def test_concurrency_limit_is_shared(self):
+        redis_client.set(upstream.LIMIT_KEY, 2)
+        # Two requests in flight in other workers
+        far = time.time() + 60
+        redis_client.zadd(upstream.LEASES_KEY, {"worker-1": far, "worker-2": far})
+        with patch("requests.get") as get:
+            with self.assertRaises(UpstreamUnavailable) as raised:
+                upstream_get("https://letterboxd.com/")
+            get.assert_not_called()
+        self.assertEqual(raised.exception.reason, "busy")
+        redis_client.zrem(upstream.LEASES_KEY, "worker-1")
+        with patch("requests.get", return_value=response(200)):
+            upstream_get("https://letterboxd.com/")
+        # The finished request gave its slot back
+        self.assertEqual(redis_client.zcard(upstream.LEASES_KEY), 1)
+
+    def test_breaker_opens_and_probe_closes_it(self):
+        with patch("requests.get", return_value=response(500)):
+            for _ in range(3):
+                upstream_get("https://letterboxd.com/")
+        with patch("requests.get") as get:
+            with self.assertRaises(UpstreamUnavailable) as raised:
+                upstream_get("https://letterboxd.com/")
+            get.assert_not_called()
+        self.assertEqual(raised.exception.reason, "open")
+
+        # Cooldown over: one probe goes out, the rest keep failing fast
+        redis_client.delete(upstream.OPEN_KEY)
+        lease = upstream.acquire_slot()
+        with self.assertRaises(UpstreamUnavailable) as raised:
+            upstream.acquire_slot()
+        self.assertEqual(raised.exception.reason, "probing")
+        upstream.release_slot(lease)
+        upstream.record_success()
+        with patch("requests.get", return_value=response(200)) as get:
+            upstream_get("https://letterboxd.com/")
+            get.assert_called_once()
+
+    def test_requests_go_unguarded_without_redis(self):
+        offline = redis.Redis.from_url("redis://localhost:1")
+        with patch.object(upstream, "redis_client", offline):
+            with patch("requests.get", return_value=response(200)) as get:
+                upstream_get("https://letterboxd.com/")
+            get.assert_called_once()
+
+    def test_parse_retry_after_http_date(self):
+        seconds = upstream.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT")
+        self.assertEqual(seconds, 0)
+        self.assertEqual(upstream.parse_retry_after("120"), 120)
+        self.assertEqual(upstream.parse_retry_after("soon"), 10)
+
+    def test_throttled_find_reports_retry(self):
+        with patch("requests.get", return_value=response(429, {"Retry-After": "45"})):
+            result = self.client.post("/api/find", json={"usernames": ["alice"]})
+        self.assertEqual(
+            result.json["alice"]["error"], "Letterboxd is unavailable, retry in 45 seconds"
+        )
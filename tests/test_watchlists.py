@@ -0,0 +1,122 @@
+# test_watchlists.py
+from datetime import datetime, timedelta
+from flask_testing import TestCase
+from sqlalchemy import event
+from app import create_app
+from app.extensions import db, redis_client
+from app.models import Movie, User, UserMovie
+from app.services import SYNC_VERSION_KEY, prune_generations, record_sync_version
+from config import TestingConfig
+
+
+class TestWatchlists(TestCase):
+    def create_app(self):
+        app = create_app(TestingConfig)
+        app.config["TESTING"] = True
+        return app
+
+    def setUp(self):
+        db.create_all()
+        redis_client.delete(SYNC_VERSION_KEY.format(username="alice"))
+        self.user = User(username="alice", synced_at=datetime(2024, 5, 1, 12, 0))
+        db.session.add(self.user)
+        added_at = datetime(2024, 5, 1, 12, 0)
+        for i in range(5):
+            movie = Movie(id=i, title=f"Film {i}", slug=f"Film {i}")
+            db.session.add(movie)
+            # Two films share a timestamp so the movie_id tie-breaker is exercised
+            db.session.add(
+                UserMovie(
+                    user=self.user,
+                    movie=movie,
+                    added_at=added_at + timedelta(minutes=min(i, 3)),
+                )
+            )
+        db.session.commit()
+
+    def tearDown(self):
+        redis_client.delete(SYNC_VERSION_KEY.format(username="alice"))
+        db.session.remove()
+        db.drop_all()
+
+    def test_pages_cover_watchlist_in_order(self):
+        ids = []
+        cursor = None
+        while True:
+            url = "/api/users/alice/movies?limit=2"
+            if cursor:
+                url += f"&cursor={cursor}"
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.json["movies"]), 2)
+            ids += [movie["id"] for movie in response.json["movies"]]
+            cursor = response.json["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(ids, ["0", "1", "2", "3", "4"])
+
+    def test_not_modified_without_database_reads(self):
+        response = self.client.get("/api/users/alice/movies")
+        etag = response.headers["ETag"]
+
+        statements = []
+        engine = db.engine
+        listener = lambda *args: statements.append(args[2])  # noqa: E731
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            response = self.client.get(
+                "/api/users/alice/movies", headers={"If-None-Match": etag}
+            )
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(statements, [])
+
+    def test_sync_invalidates_etag(self):
+        etag = self.client.get("/api/users/alice/movies").headers["ETag"]
+        self.user.synced_at = datetime(2024, 6, 1, 12, 0)
+        db.session.commit()
+        record_sync_version(self.user)
+        response = self.client.get(
+            "/api/users/alice/movies", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_unknown_user(self):
+        response = self.client.get("/api/users/nobody/movies")
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/users/alice/movies?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 400)
+
+    def publish(self, ids):
+        """Publishes a new generation holding `ids`, as a sync would."""
+        generation = self.user.active_generation + 1
+        for i in ids:
+            db.session.add(
+                UserMovie(user=self.user, movie_id=i, generation=generation)
+            )
+        self.user.active_generation = generation
+        db.session.commit()
+        prune_generations(self.user.id)
+        record_sync_version(self.user)
+
+    def test_cursor_stays_on_its_generation(self):
+        first = self.client.get("/api/users/alice/movies?limit=2").json
+        self.publish([4])
+        second = self.client.get(
+            f"/api/users/alice/movies?limit=2&cursor={first['next_cursor']}"
+        ).json
+        # Page 2 continues the snapshot of page 1, not the new watchlist
+        self.assertEqual([movie["id"] for movie in second["movies"]], ["2", "3"])
+
+        self.publish([3])
+        response = self.client.get(
+            f"/api/users/alice/movies?limit=2&cursor={second['next_cursor']}"
+        )
+        # Generation 0 has been pruned: the client has to start over
+        self.assertEqual(response.status_code, 410)
+        restart = self.client.get("/api/users/alice/movies?limit=2").json
+        self.assertEqual([movie["id"] for movie in restart["movies"]], ["3"])